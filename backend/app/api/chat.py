@@ -1,15 +1,30 @@
-from fastapi import APIRouter, HTTPException, Depends
+import json
+import logging
+import threading
+import time
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlmodel import Session, select
+from starlette.background import BackgroundTask
 
-from ..rag.chain import run_rag
+from ..rag.chain import arun_rag, astream_rag, run_rag_batch
+from ..core.config import settings
+from ..rag.answer_cache import get_answer_cache
+from ..rag.embedder import get_query_cache
+from ..rag.summarizer import summarize_conversation
 # from app.rag.filter import is_noise_chunk  # NEW import (still unused)
 
 from ..dependencies import get_current_user
-from ..core.database import get_session
+from ..core.database import get_session, engine
+from ..core.metrics import REQUESTS_TOTAL, TIME_TO_FIRST_TOKEN, stage_timer, timed_stage
 from ..models.session import ChatSession
 from ..models.message import ChatMessage
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 class ChatFeedbackRequest(BaseModel):
@@ -26,27 +41,29 @@ class ChatRequest(BaseModel):
     session_id: int | None = None
 
 
+class ChatBatchRequest(BaseModel):
+    questions: list[str]
+    k: int = 4
+    max_concurrency: int | None = None
+
+
 class ChatMessageModel(BaseModel):
     role: str  # "user" or "assistant"
     content: str
 
-@router.post("/chat")
-def chat_endpoint(
-    body: ChatRequest,
-    current_user = Depends(get_current_user),
-    db = Depends(get_session),
-):
-    query = body.query.strip()
-    if not query:
-        raise HTTPException(status_code=400, detail="Query cannot be empty.")
-
+@timed_stage("db_start_turn")
+def _start_turn(db, body: ChatRequest, user_id: int, query: str):
+    """Retrieve or create the chat session, store the user message and
+    load history. Runs in the threadpool: SQLModel sessions are blocking.
+    Returns (session_id, history).
+    """
     # Retrieve or create chat session
     if body.session_id:
         session = db.get(ChatSession, body.session_id)
-        if not session or session.user_id != current_user.id:
+        if not session or session.user_id != user_id:
             raise HTTPException(status_code=404, detail="Chat session not found.")
     else:
-        session = ChatSession(user_id=current_user.id)
+        session = ChatSession(user_id=user_id)
         db.add(session)
         db.commit()
         db.refresh(session)
@@ -57,24 +74,102 @@ def chat_endpoint(
     db.commit()
 
     # Build chat history if not provided
-    if not body.chat_history:
-        from sqlmodel import select
+    if not body.chat_history and settings.CONVERSATION_SUMMARY:
+        history = _summary_history(db, session)
+    elif not body.chat_history:
         statement = select(ChatMessage).where(ChatMessage.session_id == session.id).order_by(ChatMessage.id.desc()).limit(10)
         msgs = db.exec(statement).all()
         history = [{"role": m.role, "content": m.content} for m in reversed(msgs)]
     else:
         history = body.chat_history
+    return session.id, history
+
+
+def _summary_history(db, session: ChatSession) -> list:
+    """History for summary mode: the rolling summary, then the messages it
+    does not cover yet (normally just the last SUMMARY_RECENT_TURNS turns
+    and the current question).
+    """
+    statement = select(ChatMessage).where(ChatMessage.session_id == session.id)
+    if session.summary_message_id:
+        statement = statement.where(ChatMessage.id > session.summary_message_id)
+    limit = settings.SUMMARY_RECENT_TURNS * 2 + 1
+    msgs = db.exec(statement.order_by(ChatMessage.id.desc()).limit(limit)).all()
+    history = [{"role": m.role, "content": m.content} for m in reversed(msgs)]
+    if session.summary:
+        history.insert(0, {"role": "summary", "content": session.summary})
+    return history
 
+
+# Striped locks so two turns of one session never fold the same messages twice
+_summary_locks = [threading.Lock() for _ in range(64)]
+
+
+def _update_session_summary(session_id: int):
+    """Background task after each turn: folds every message older than the
+    last SUMMARY_RECENT_TURNS turns into ChatSession.summary. Uses its own
+    DB session; failures are logged and retried on the next turn.
+    """
     try:
-        result = run_rag(query, k=body.k, chat_history=history)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        with _summary_locks[session_id % len(_summary_locks)], Session(engine) as db:
+            session = db.get(ChatSession, session_id)
+            if session is None:
+                return
+            statement = select(ChatMessage).where(ChatMessage.session_id == session_id)
+            if session.summary_message_id:
+                statement = statement.where(ChatMessage.id > session.summary_message_id)
+            msgs = db.exec(statement.order_by(ChatMessage.id)).all()
+            keep = settings.SUMMARY_RECENT_TURNS * 2
+            to_fold = msgs[:-keep] if keep else msgs
+            if not to_fold:
+                return
+            session.summary = summarize_conversation(
+                session.summary, [{"role": m.role, "content": m.content} for m in to_fold])
+            session.summary_message_id = to_fold[-1].id
+            db.add(session)
+            db.commit()
+    except Exception:
+        logger.exception("Conversation summary update failed for session %s", session_id)
+
 
-    # Store assistant response
-    assistant_msg = ChatMessage(session_id=session.id, role="assistant", content=result["answer"])
+@timed_stage("db_store_answer")
+def _store_assistant_message(db, session_id: int, content: str):
+    assistant_msg = ChatMessage(session_id=session_id, role="assistant", content=content)
     db.add(assistant_msg)
     db.commit()
 
+
+@router.post("/chat")
+async def chat_endpoint(
+    body: ChatRequest,
+    background_tasks: BackgroundTasks,
+    current_user = Depends(get_current_user),
+    db = Depends(get_session),
+):
+    """Async chat: DB work is offloaded to the threadpool and retrieval and
+    generation are awaited, so a worker thread is never held for the
+    duration of the Gemini call. In CONVERSATION_SUMMARY mode the session
+    summary is updated after the response is sent.
+    """
+    query = body.query.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
+
+    with stage_timer("chat_request"):
+        session_id, history = await run_in_threadpool(_start_turn, db, body, current_user.id, query)
+
+        try:
+            result = await arun_rag(query, k=body.k, chat_history=history)
+        except Exception as e:
+            REQUESTS_TOTAL.inc(endpoint="chat", status="error")
+            raise HTTPException(status_code=500, detail=str(e))
+
+        # Store assistant response
+        await run_in_threadpool(_store_assistant_message, db, session_id, result["answer"])
+    REQUESTS_TOTAL.inc(endpoint="chat", status="ok")
+    if settings.CONVERSATION_SUMMARY and not body.chat_history:
+        background_tasks.add_task(_update_session_summary, session_id)
+
     # -----------------------------
     # Defensive filtering (IMPORTANT)
     # -----------------------------
@@ -88,5 +183,121 @@ def chat_endpoint(
         "response": result["answer"],
         "sources": clean_sources,
         "retrieved_chunks": len(clean_sources),
-        "session_id": session.id,
+        "session_id": session_id,
+        "usage": result.get("usage"),
+    }
+
+
+def _store_assistant_message_own_session(session_id: int, content: str):
+    # The request-scoped session may already be closed once a streaming
+    # response is being sent, so the final write uses its own session.
+    with Session(engine) as db:
+        _store_assistant_message(db, session_id, content)
+
+
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(
+    body: ChatRequest,
+    current_user = Depends(get_current_user),
+    db = Depends(get_session),
+):
+    """Server-sent-events variant of /chat.
+    Events: `sources` (before generation), `token` (incremental text),
+    `done` (session id, timings) or `error`. The assembled answer is stored
+    as the assistant ChatMessage once the stream finishes.
+    """
+    query = body.query.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
+
+    started = time.perf_counter()
+    session_id, history = await run_in_threadpool(_start_turn, db, body, current_user.id, query)
+
+    async def event_stream():
+        ttft_ms = None
+        try:
+            async for event, payload in astream_rag(query, k=body.k, chat_history=history):
+                if event == "sources":
+                    yield _sse("sources", {**payload, "session_id": session_id})
+                elif event == "token":
+                    if ttft_ms is None:
+                        ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                        logger.info("chat stream session=%s time_to_first_token_ms=%s", session_id, ttft_ms)
+                        TIME_TO_FIRST_TOKEN.observe(ttft_ms / 1000)
+                    yield _sse("token", {"text": payload})
+                elif event == "done":
+                    await run_in_threadpool(_store_assistant_message_own_session, session_id, payload["answer"])
+                    total_ms = round((time.perf_counter() - started) * 1000, 1)
+                    REQUESTS_TOTAL.inc(endpoint="chat_stream", status="ok")
+                    yield _sse("done", {
+                        "session_id": session_id,
+                        "cache_hit": payload["cache_hit"],
+                        "time_to_first_token_ms": ttft_ms,
+                        "total_ms": total_ms,
+                    })
+        except Exception as e:
+            logger.exception("chat stream failed for session %s", session_id)
+            REQUESTS_TOTAL.inc(endpoint="chat_stream", status="error")
+            yield _sse("error", {"detail": str(e), "session_id": session_id})
+
+    summary_task = None
+    if settings.CONVERSATION_SUMMARY and not body.chat_history:
+        summary_task = BackgroundTask(_update_session_summary, session_id)
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=summary_task,
+    )
+
+
+@router.post("/chat/batch")
+def chat_batch_endpoint(
+    body: ChatBatchRequest,
+    current_user = Depends(get_current_user),
+):
+    """Answers many independent questions in one request.
+    Queries are embedded in one batched call and LLM generations run with
+    bounded concurrency. Results keep the input order; failures are reported
+    per item. Batch answers are not stored in any chat session.
+    """
+    questions = [q.strip() for q in body.questions]
+    if not questions:
+        raise HTTPException(status_code=400, detail="At least one question is required.")
+    if any(not q for q in questions):
+        raise HTTPException(status_code=400, detail="Questions cannot be empty.")
+    if len(questions) > settings.BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_QUESTIONS} questions per batch.")
+
+    max_concurrency = min(body.max_concurrency or settings.BATCH_MAX_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+    results = run_rag_batch(questions, k=body.k, max_concurrency=max_concurrency)
+    for r in results:
+        REQUESTS_TOTAL.inc(endpoint="chat_batch", status="error" if r["error"] else "ok")
+    return {
+        "results": [
+            {
+                "question": r["question"],
+                "response": r["answer"],
+                "sources": r["sources"],
+                "retrieved_chunks": r["retrieved_chunks"],
+                "usage": r["usage"],
+                "timing_ms": r["timing_ms"],
+                "error": r["error"],
+            }
+            for r in results
+        ],
+        "failed": sum(1 for r in results if r["error"]),
+    }
+
+
+@router.get("/chat/cache")
+def chat_cache_stats(current_user = Depends(get_current_user)):
+    """Hit/miss statistics for the answer and query-embedding caches."""
+    return {
+        "answer_cache": get_answer_cache().stats(),
+        "query_embedding_cache": get_query_cache().stats(),
     }
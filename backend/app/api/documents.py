@@ -0,0 +1,80 @@
+# backend/app/api/documents.py
+
+"""Document catalog routes.
+Provides:
+- GET /documents         -> every ingested document with hash, page/chunk counts and ingest time
+- POST /documents/upload -> save one PDF and queue ingestion of just that document
+"""
+
+import os
+import uuid
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+
+from ..core.config import settings
+from ..dependencies import get_current_user
+from ..rag.catalog import list_documents
+from ..rag.ingest_jobs import get_job_runner
+from ..rag.ingest_pipeline import ingest_upload
+from ..rag.vectorstore import get_document_names
+
+router = APIRouter()
+
+UPLOAD_BLOCK_SIZE = 1 << 20
+
+
+@router.get("/documents")
+def documents(current_user = Depends(get_current_user)):
+    entries = list_documents()
+    if entries is None:
+        # Corpus ingested before the catalog existed: names only
+        entries = [{"filename": name} for name in get_document_names()]
+    return {"count": len(entries), "documents": entries}
+
+
+@router.post("/documents/upload", status_code=202)
+def upload_document(file: UploadFile = File(...), current_user = Depends(get_current_user)):
+    """
+    Streams the PDF into UPLOAD_STAGING_DIR in 1 MiB blocks, then queues a
+    job that moves it into RAW_DOCS_DIR and ingests only this document. A
+    file with the same name is replaced and only its old chunks are
+    removed. Poll /ingest/jobs/{job_id}.
+    """
+    filename = os.path.basename((file.filename or "").replace("\\", "/")).strip()
+    if not filename or filename.startswith(".") or not filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Upload a .pdf file")
+
+    # Staged outside RAW_DOCS_DIR: a running ingest job may be parsing the
+    # current version, so only the queued job puts the new one in place
+    os.makedirs(settings.UPLOAD_STAGING_DIR, exist_ok=True)
+    staged = settings.UPLOAD_STAGING_DIR / f"{uuid.uuid4().hex}.upload"
+    size = 0
+    try:
+        with open(staged, "wb") as out:
+            for block in iter(lambda: file.file.read(UPLOAD_BLOCK_SIZE), b""):
+                if size == 0 and not block.startswith(b"%PDF-"):
+                    raise HTTPException(status_code=400, detail="File is not a PDF")
+                size += len(block)
+                if size > settings.UPLOAD_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail="File exceeds UPLOAD_MAX_BYTES")
+                out.write(block)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+    except BaseException:
+        if staged.exists():
+            os.remove(staged)
+        raise
+    finally:
+        file.file.close()
+
+    replaced = (settings.RAW_DOCS_DIR / filename).exists()
+    runner = get_job_runner()
+    job = runner.submit("upload", ingest_upload, upload_path=str(staged), filename=filename)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "position": runner.queue_position(job),
+        "filename": filename,
+        "bytes": size,
+        "replaced": replaced,
+    }
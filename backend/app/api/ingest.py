@@ -1,12 +1,40 @@
-from fastapi import APIRouter
+# backend/app/api/ingest.py
+
+"""Ingestion routes.
+Provides:
+- POST /ingest              -> queue a background ingestion job, returns its id
+- GET  /ingest/jobs         -> recent jobs, newest first
+- GET  /ingest/jobs/{id}    -> status, progress, throughput and ETA of one job
+"""
+
+from fastapi import APIRouter, HTTPException
+
+from ..rag.ingest_jobs import get_job_runner
 from ..rag.ingest_pipeline import ingest_documents
 
 router = APIRouter()
 
-@router.post("/ingest", status_code=200)
-def ingest():
-    """Runs the ingestion pipeline:
+
+@router.post("/ingest", status_code=202)
+def ingest(full: bool = False):
+    """Queues the ingestion pipeline:
     PDF -> text -> chunks -> embeddings -> ChromaDB.
+    Only added/changed/removed PDFs are processed unless `full=true`.
+    Jobs run one at a time; poll /ingest/jobs/{job_id} for progress.
     """
-    result = ingest_documents()
-    return result
+    runner = get_job_runner()
+    job = runner.submit("ingest", ingest_documents, full=full)
+    return {"job_id": job.id, "status": job.status, "position": runner.queue_position(job)}
+
+
+@router.get("/ingest/jobs")
+def list_ingest_jobs():
+    return {"jobs": [job.snapshot() for job in get_job_runner().list()]}
+
+
+@router.get("/ingest/jobs/{job_id}")
+def get_ingest_job(job_id: str):
+    job = get_job_runner().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job.snapshot()
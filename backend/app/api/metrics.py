@@ -0,0 +1,42 @@
+# backend/app/api/metrics.py
+
+"""Prometheus metrics route.
+Provides:
+- GET /metrics  -> stage latency histograms, request counters and cache/pool stats
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..core.metrics import registry, render_metrics
+from ..rag.answer_cache import get_answer_cache
+from ..rag.embedder import get_query_cache
+from ..rag.vectorstore import get_pool_stats
+
+router = APIRouter()
+
+
+def _cache_samples():
+    for cache_name, stats in (
+        ("answer", get_answer_cache().stats()),
+        ("query_embedding", get_query_cache().stats()),
+    ):
+        labels = {"cache": cache_name}
+        yield "hr_bot_cache_hits_total", "counter", "Cache hits.", labels, stats["hits"] + stats.get("disk_hits", 0)
+        yield "hr_bot_cache_misses_total", "counter", "Cache misses.", labels, stats["misses"]
+        yield "hr_bot_cache_entries", "gauge", "Entries currently cached.", labels, stats["size"]
+
+
+def _pool_samples():
+    stats = get_pool_stats()
+    yield "hr_bot_pool_reuses_total", "counter", "Pooled Chroma resources reused instead of rebuilt.", {}, stats["reuses"]
+    yield "hr_bot_pool_build_seconds_total", "counter", "Time spent building pooled Chroma resources.", {}, stats["build_seconds"]
+
+
+registry.register_collector(_cache_samples)
+registry.register_collector(_pool_samples)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -18,12 +18,81 @@ class Settings:
     DATA_DIR = BASE_DIR / "data"
 
     RAW_DOCS_DIR = DATA_DIR / "raw_docs"
+    UPLOAD_STAGING_DIR = DATA_DIR / "uploads"  # uploads wait here until their ingest job runs
     PROCESSED_DIR = DATA_DIR / "processed"
     CHROMA_DIR = DATA_DIR / "chroma"
+    FLAT_INDEX_DIR = DATA_DIR / "flat_index"
+    BM25_INDEX_PATH = CHROMA_DIR / "bm25_index.json"
+    DOCUMENT_CATALOG_PATH = CHROMA_DIR / "document_catalog.json"
+    COLLECTION_POINTER_PATH = CHROMA_DIR / "current_collection.json"
+    CORPUS_GENERATION_PATH = CHROMA_DIR / "corpus_generation"
+
+    # PDF parsing: process-pool workers (0 = one per CPU, 1 = in-process) and pages per task
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", "0"))
+    INGEST_PAGES_PER_TASK: int = int(os.getenv("INGEST_PAGES_PER_TASK", "16"))
+    INGEST_QUEUE_SIZE: int = int(os.getenv("INGEST_QUEUE_SIZE", "4"))  # items buffered between pipeline stages
+    INGEST_JOB_HISTORY: int = int(os.getenv("INGEST_JOB_HISTORY", "50"))  # finished jobs kept for /ingest/jobs
+    # Full rebuilds go to a new collection; the replaced one is dropped after this many seconds
+    COLLECTION_GC_GRACE_SECONDS: int = int(os.getenv("COLLECTION_GC_GRACE_SECONDS", "300"))
+    UPLOAD_MAX_BYTES: int = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))  # per PDF upload
+
+    # Ingest embedding: batch size, parallel requests, rate limit (0 = none), retries
+    EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+    EMBED_MAX_CONCURRENCY: int = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+    EMBED_REQUESTS_PER_MINUTE: float = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "0"))
+    EMBED_MAX_RETRIES: int = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+    EMBED_BACKOFF_BASE: float = float(os.getenv("EMBED_BACKOFF_BASE", "1.0"))  # seconds, doubled per retry
+    EMBED_BACKOFF_MAX: float = float(os.getenv("EMBED_BACKOFF_MAX", "60"))
+    # Content-addressed document embeddings (sha256 of model + text); survives collection rebuilds
+    EMBEDDING_STORE_PATH = DATA_DIR / "embedding_store.db"
 
     # Chunking parameters
     CHUNK_SIZE: int = 1000  # Increased from 450 to preserve table structure
     CHUNK_OVERLAP: int = 150  # Increased from 50 for better context preservation
+    # Chunks whose 64-bit SimHash signatures differ in at most this many bits are near-duplicates
+    NEAR_DUPLICATE_DISTANCE: int = int(os.getenv("NEAR_DUPLICATE_DISTANCE", "3"))
+    # "native" (offset-based, same boundaries) or "langchain" (RecursiveCharacterTextSplitter)
+    SPLITTER: str = os.getenv("SPLITTER", "native").lower()
+
+    # Retrieval backend: "chroma" (HNSW) or "flat" (memory-mapped NumPy matrix)
+    RETRIEVAL_BACKEND: str = os.getenv("RETRIEVAL_BACKEND", "chroma").lower()
+    # Retrieval mode: "vector" or "hybrid" (BM25 + vector, reciprocal-rank fusion)
+    RETRIEVAL_MODE: str = os.getenv("RETRIEVAL_MODE", "vector").lower()
+    HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "20"))  # per ranking, before fusion
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+
+    # Route intent-bearing questions to their source documents (metadata filter)
+    RETRIEVAL_ROUTING: bool = os.getenv("RETRIEVAL_ROUTING", "false").lower() in ("1", "true", "yes")
+    ROUTING_MIN_RESULTS: int = int(os.getenv("ROUTING_MIN_RESULTS", "2"))  # fewer filtered hits -> global search
+
+    # Prompt context budget in estimated tokens (chars / 4); 0 = no limit
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "0"))
+
+    # Conversation memory: rolling summary + the last few turns instead of 10 raw messages
+    CONVERSATION_SUMMARY: bool = os.getenv("CONVERSATION_SUMMARY", "false").lower() in ("1", "true", "yes")
+    SUMMARY_RECENT_TURNS: int = int(os.getenv("SUMMARY_RECENT_TURNS", "2"))  # user+assistant pairs kept verbatim
+    SUMMARY_MAX_CHARS: int = int(os.getenv("SUMMARY_MAX_CHARS", "1500"))
+
+    # Multi-concept questions: split into per-concept sub-queries retrieved in parallel
+    QUERY_DECOMPOSITION: bool = os.getenv("QUERY_DECOMPOSITION", "false").lower() in ("1", "true", "yes")
+    SUBQUERY_K: int = int(os.getenv("SUBQUERY_K", "4"))  # chunks retrieved per sub-query
+    SUBQUERY_DOC_QUOTA: int = int(os.getenv("SUBQUERY_DOC_QUOTA", "3"))  # max merged chunks per document
+    SUBQUERY_MAX_CHUNKS: int = int(os.getenv("SUBQUERY_MAX_CHUNKS", "8"))  # max merged chunks overall
+
+    # Batch question answering (/api/chat/batch)
+    BATCH_MAX_QUESTIONS: int = int(os.getenv("BATCH_MAX_QUESTIONS", "100"))
+    BATCH_MAX_CONCURRENCY: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))  # parallel LLM generations
+
+    # Query-embedding cache (in-memory LRU, optional SQLite tier for restarts)
+    QUERY_EMBEDDING_CACHE_SIZE: int = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+    QUERY_EMBEDDING_CACHE_TTL: int = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "86400"))  # seconds, 0 = never expire
+    QUERY_EMBEDDING_CACHE_PATH: str = os.getenv("QUERY_EMBEDDING_CACHE_PATH", "")  # empty = memory only
+
+    # Semantic answer cache in front of run_rag (opt-in)
+    ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+    ANSWER_CACHE_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+    ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+    ANSWER_CACHE_TTL: int = int(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds, 0 = never expire
 
 
 settings = Settings()
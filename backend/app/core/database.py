@@ -4,6 +4,7 @@
 Uses SQLModel (SQLAlchemy) with SQLite for development.
 """
 
+from sqlalchemy import inspect, text
 from sqlmodel import SQLModel, create_engine, Session
 from pathlib import Path
 import os
@@ -15,11 +16,29 @@ from .config import settings
 DB_PATH = settings.BASE_DIR / "data" / "hr_bot.db"
 DB_URL = f"sqlite:///{DB_PATH}"
 
-engine = create_engine(DB_URL, echo=False)
+# Async endpoints hand the request's session to threadpool workers, so the
+# SQLite connection may be used from a different thread than it was opened on.
+engine = create_engine(DB_URL, echo=False, connect_args={"check_same_thread": False})
 
 def init_db():
-    """Create tables if they don't exist."""
+    """Create tables if they don't exist and add columns introduced since."""
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+
+def _add_missing_columns():
+    """create_all never alters existing tables, so nullable columns added to
+    a model after its table was created are added here with ALTER TABLE."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                ddl_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {ddl_type}'))
 
 def get_session():
     """Provide a new DB session. Caller should close it when done."""
@@ -1,23 +1,60 @@
+import threading
+
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from .config import settings
 
 
+# Process-wide model clients. Both wrappers are stateless per call and safe to
+# share across request threads, so each worker builds them once.
+_lock = threading.Lock()
+_llm = None
+_embedding_model = None
+
+
 def get_llm():
     """
-    Returns the Google Gemini LLM for generating responses.
+    Returns the shared Google Gemini LLM for generating responses.
     """
-    return ChatGoogleGenerativeAI(
-        model=settings.GOOGLE_LLM_MODEL,
-        api_key=settings.GOOGLE_API_KEY,
-        temperature=0.3   # safer for HR domain
-    )
+    global _llm
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                _llm = ChatGoogleGenerativeAI(
+                    model=settings.GOOGLE_LLM_MODEL,
+                    api_key=settings.GOOGLE_API_KEY,
+                    temperature=0.3   # safer for HR domain
+                )
+    return _llm
 
 
 def get_embedding_model():
     """
-    Returns the Google embedding model for vector database storage.
+    Returns the shared Google embedding model for vector database storage.
+    """
+    global _embedding_model
+    if _embedding_model is None:
+        with _lock:
+            if _embedding_model is None:
+                _embedding_model = GoogleGenerativeAIEmbeddings(
+                    model=settings.GOOGLE_EMBEDDING_MODEL,
+                    api_key=settings.GOOGLE_API_KEY
+                )
+    return _embedding_model
+
+
+def reset_models():
     """
-    return GoogleGenerativeAIEmbeddings(
-        model=settings.GOOGLE_EMBEDDING_MODEL,
-        api_key=settings.GOOGLE_API_KEY
-    )
+    Drops the shared model clients so the next call rebuilds them
+    (e.g. after the API key or model names change).
+    """
+    global _llm, _embedding_model
+    with _lock:
+        _llm = None
+        _embedding_model = None
+
+    # Wrappers built around the old embedding model (imported here: both
+    # modules import this one)
+    from ..rag.embedder import reset_embedder
+    from ..rag.vectorstore import reset_vectorstore
+    reset_embedder()
+    reset_vectorstore()
@@ -0,0 +1,210 @@
+# backend/app/core/metrics.py
+
+"""In-process metrics with Prometheus text exposition.
+
+Counters and fixed-bucket histograms cost one lock + a few additions per
+observation, so they are safe on the chat hot path. Values owned by other
+components (cache stats, pool stats) are registered as collectors and only
+read when /metrics is scraped.
+"""
+
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (1, 2, 4, 6, 8, 12, 16, 24, 32, 48, 64, 128)
+SIZE_BUCKETS = (500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 12000, 16000, 32000)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = LATENCY_BUCKETS,
+                 labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.labels = labels
+        # key -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            row[idx] += 1
+            row[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, row in sorted(self._values.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, row):
+                    cumulative += count
+                    le = _format_labels(self.labels, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                cumulative += row[len(self.buckets)]
+                le = _format_labels(self.labels, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {row[-1]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]] = []
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = LATENCY_BUCKETS,
+                  labels: Tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, help_text, buckets, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable):
+        """
+        `collector()` returns [(name, type, help, labels, value), ...] at
+        scrape time; use it for stats owned by other components.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        seen = set()
+        for collector in self._collectors:
+            try:
+                samples = list(collector())
+            except Exception:
+                continue
+            for name, kind, help_text, labels, value in samples:
+                if name not in seen:
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    seen.add(name)
+                names = tuple(labels)
+                lines.append(f"{name}{_format_labels(names, tuple(labels[n] for n in names))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ---------------------------------------------------------------------------
+# Chat pipeline metrics
+# ---------------------------------------------------------------------------
+STAGE_SECONDS = registry.histogram(
+    "hr_bot_stage_seconds", "Latency of each chat pipeline stage.", LATENCY_BUCKETS, labels=("stage",))
+REQUESTS_TOTAL = registry.counter(
+    "hr_bot_chat_requests_total", "Chat requests by endpoint and outcome.", labels=("endpoint", "status"))
+RETRIEVED_CHUNKS = registry.histogram(
+    "hr_bot_retrieved_chunks", "Chunks returned by the retriever per request.", COUNT_BUCKETS)
+CONTEXT_SOURCES = registry.histogram(
+    "hr_bot_context_chunks", "Chunks that made it into the prompt context per request.", COUNT_BUCKETS)
+CONTEXT_CHARS = registry.histogram(
+    "hr_bot_context_chars", "Characters of prompt context per request.", SIZE_BUCKETS)
+PROMPT_TOKENS = registry.histogram(
+    "hr_bot_prompt_tokens", "Estimated prompt tokens (instructions + question + context) per request.",
+    TOKEN_BUCKETS)
+PACKED_CHUNKS = registry.counter(
+    "hr_bot_packed_chunks_total", "Ranked chunks by context packer outcome (kept, trimmed, dropped).",
+    labels=("outcome",))
+DEDUPLICATED_CHUNKS = registry.counter(
+    "hr_bot_deduplicated_chunks_total", "Retrieved chunks collapsed as near-duplicates, by match type "
+    "(simhash, exact).", labels=("match",))
+K_USED = registry.histogram(
+    "hr_bot_k_used", "Effective k after query analysis boosts.", COUNT_BUCKETS)
+ROUTED_RETRIEVALS = registry.counter(
+    "hr_bot_routed_retrievals_total", "Intent-routed retrievals by outcome (filtered or fallback).",
+    labels=("outcome",))
+TIME_TO_FIRST_TOKEN = registry.histogram(
+    "hr_bot_time_to_first_token_seconds", "Time from request to first streamed token.", LATENCY_BUCKETS)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """
+    Times the enclosed block into hr_bot_stage_seconds{stage=...}.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+def timed_stage(stage: str):
+    """
+    Decorator version of stage_timer for sync and async functions.
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage_timer(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_stage(stage: str, started: float) -> float:
+    """
+    Records time since `started` for `stage` and returns a new start time,
+    for timing consecutive sections of one function.
+    """
+    now = time.perf_counter()
+    STAGE_SECONDS.observe(now - started, stage=stage)
+    return now
+
+
+def render_metrics() -> str:
+    return registry.render()
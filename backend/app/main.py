@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .api import ingest, chat, auth
+from .api import ingest, chat, auth, documents, metrics
 
 # Import models so that SQLModel metadata knows about them
 from .models import user, session, message
@@ -24,7 +24,9 @@ async def startup_event():
 
 app.include_router(ingest.router, prefix="/api")
 app.include_router(chat.router, prefix="/api")
+app.include_router(documents.router, prefix="/api")
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
+app.include_router(metrics.router)
 
 @app.get("/")
 def root():
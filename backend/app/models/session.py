@@ -10,5 +10,8 @@ class ChatSession(SQLModel, table=True):
     user_id: int = Field(foreign_key="user.id")
     created_at: Optional[str] = Field(default_factory=lambda: "now()")
     last_active: Optional[str] = Field(default_factory=lambda: "now()")
+    # Rolling summary of the conversation up to and including summary_message_id
+    summary: Optional[str] = None
+    summary_message_id: Optional[int] = None
     # Relationship to messages (not required for DB schema but useful)
     messages: List["ChatMessage"] = Relationship(back_populates="session")
@@ -0,0 +1,214 @@
+# backend/app/rag/answer_cache.py
+
+"""Semantic answer cache for run_rag.
+
+Serves a stored answer when a new question's embedding is within
+ANSWER_CACHE_THRESHOLD cosine similarity of a previously answered one.
+Entries are scoped to the corpus generation, today's date, the requested k
+and a fingerprint of the chat history, so a paraphrase only hits when the
+retrieval and prompt inputs would otherwise be equivalent.
+The cache lives in-process; each uvicorn worker keeps its own. The corpus
+generation is shared through a file (see vectorstore.py), so an ingest in
+one worker invalidates every worker's cache.
+"""
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ..core.config import settings
+from .embedder import embed_query, normalize_query
+from .vectorstore import bump_corpus_generation, get_corpus_generation
+
+
+def history_fingerprint(chat_history: Optional[list], question: str) -> str:
+    """
+    Fingerprint of the history run_rag would put into the prompt.
+
+    chat_endpoint stores the current question before loading history, so a
+    trailing user message equal to the question is ignored. Empty history
+    maps to "".
+    """
+    history = list(chat_history or [])[-10:]
+    if history and history[-1].get("role") == "user" and \
+            normalize_query(history[-1].get("content", "")) == normalize_query(question):
+        history = history[:-1]
+    if not history:
+        return ""
+    digest = hashlib.sha1()
+    for msg in history:
+        digest.update(f"{msg.get('role', '')}:{normalize_query(msg.get('content', ''))}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Thread-safe nearest-neighbour cache of run_rag results.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 512, ttl_seconds: float = 0):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.generation = get_corpus_generation()
+        # scope -> {"keys": [...], "matrix": np.ndarray | None}
+        self._scopes: Dict[tuple, Dict[str, Any]] = {}
+        # (scope, normalized question) -> (unit vector, result, stored_at); LRU order
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _scope(self, chat_history: Optional[list], question: str, k: int) -> tuple:
+        today = datetime.now().strftime("%Y-%m-%d")
+        return (get_corpus_generation(), today, k, history_fingerprint(chat_history, question))
+
+    def _check_generation(self):
+        # Caller holds self._lock
+        generation = get_corpus_generation()
+        if generation != self.generation:
+            self._scopes.clear()
+            self._entries.clear()
+            self.generation = generation
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        arr = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(arr)
+        return arr / norm if norm else arr
+
+    def _scope_matrix(self, scope: tuple):
+        # Caller holds self._lock
+        bucket = self._scopes.get(scope)
+        if not bucket or not bucket["keys"]:
+            return None, []
+        if bucket["matrix"] is None:
+            bucket["matrix"] = np.vstack([self._entries[key][0] for key in bucket["keys"]])
+        return bucket["matrix"], bucket["keys"]
+
+    def lookup(self, question: str, chat_history: Optional[list], k: int) -> Optional[Dict[str, Any]]:
+        """
+        Returns a cached result for a semantically equivalent question, or None.
+        """
+        scope = self._scope(chat_history, question, k)
+        query_vec = self._unit(embed_query(question))
+        now = time.time()
+
+        with self._lock:
+            self._check_generation()
+            matrix, keys = self._scope_matrix(scope)
+            if matrix is not None:
+                sims = matrix @ query_vec
+                hit, expired = None, []
+                # Best live match above the threshold; expired entries on
+                # the way are evicted, not returned as a miss
+                for i in np.argsort(-sims):
+                    if sims[i] < self.threshold:
+                        break
+                    key = keys[i]
+                    _, result, stored_at = self._entries[key]
+                    if self.ttl_seconds and now - stored_at > self.ttl_seconds:
+                        expired.append(key)
+                        continue
+                    self._entries.move_to_end(key)
+                    hit = copy.deepcopy(result)
+                    hit["cache_hit"] = True
+                    hit["cache_similarity"] = round(float(sims[i]), 4)
+                    break
+                for key in expired:
+                    self._remove(key)
+                if hit is not None:
+                    self.hits += 1
+                    return hit
+            self.misses += 1
+        return None
+
+    def store(self, question: str, chat_history: Optional[list], k: int, result: Dict[str, Any]):
+        """
+        Caches a run_rag result for the question's scope.
+        """
+        scope = self._scope(chat_history, question, k)
+        vector = self._unit(embed_query(question))
+        key = (scope, normalize_query(question))
+
+        with self._lock:
+            self._check_generation()
+            if scope[0] != self.generation:
+                return  # corpus changed while this answer was being generated
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (vector, copy.deepcopy(result), time.time())
+            bucket = self._scopes.setdefault(scope, {"keys": [], "matrix": None})
+            bucket["keys"].append(key)
+            bucket["matrix"] = None
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def _remove(self, key: tuple):
+        # Caller holds self._lock
+        self._entries.pop(key, None)
+        bucket = self._scopes.get(key[0])
+        if bucket and key in bucket["keys"]:
+            bucket["keys"].remove(key)
+            bucket["matrix"] = None
+            if not bucket["keys"]:
+                del self._scopes[key[0]]
+
+    def invalidate(self):
+        """
+        Drops every cached answer.
+        """
+        with self._lock:
+            self._scopes.clear()
+            self._entries.clear()
+            self.generation = get_corpus_generation()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": settings.ANSWER_CACHE_ENABLED,
+                "size": len(self._entries),
+                "generation": self.generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_cache_lock = threading.Lock()
+_answer_cache = None
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """
+    Returns the process-wide answer cache.
+    """
+    global _answer_cache
+    if _answer_cache is None:
+        with _cache_lock:
+            if _answer_cache is None:
+                _answer_cache = SemanticAnswerCache(
+                    threshold=settings.ANSWER_CACHE_THRESHOLD,
+                    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.ANSWER_CACHE_TTL,
+                )
+    return _answer_cache
+
+
+def invalidate_answer_cache():
+    """
+    Drops cached answers; called by the ingest pipeline after the corpus
+    changes. Bumping the shared generation makes the other workers drop
+    theirs on their next lookup.
+    """
+    bump_corpus_generation()
+    if _answer_cache is not None:
+        _answer_cache.invalidate()
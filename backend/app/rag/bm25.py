@@ -0,0 +1,210 @@
+# backend/app/rag/bm25.py
+
+"""BM25 inverted index over all chunks, built at ingest time.
+
+Persisted as JSON next to the Chroma data so lexical lookups (exact holiday
+names like "Makara Sankranti", policy titles, dates) do not require
+re-tokenizing retrieved chunks on every request.
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from .flat_index import metadata_matches
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "the", "and", "for", "from", "with", "this", "that", "are", "is", "on", "or", "to",
+    "a", "an", "by", "at", "be", "been", "if", "as", "in", "of", "it", "what", "which",
+    "when", "how", "can", "do", "does", "my", "i", "me", "we", "you", "your",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase alphanumeric tokens with stopwords removed.
+    """
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed set of chunks.
+    postings: term -> [[row, term_frequency], ...]
+    """
+
+    def __init__(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]],
+                 postings: Dict[str, List[List[int]]], doc_lengths: List[int]):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.row_of = {doc_id: row for row, doc_id in enumerate(ids)}
+        n = len(doc_lengths)
+        self.avg_doc_length = (sum(doc_lengths) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            for term, rows in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]) -> "BM25Index":
+        postings: Dict[str, List[List[int]]] = defaultdict(list)
+        doc_lengths = []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text or "")
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append([row, tf])
+        return cls(ids, texts, metadatas, dict(postings), doc_lengths)
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": self.ids,
+                "texts": self.texts,
+                "metadatas": self.metadatas,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths,
+            }, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["ids"], data["texts"], data["metadatas"], data["postings"], data["doc_lengths"])
+
+    def search(self, query: str, k: int,
+               where: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        """
+        Returns [(row, bm25_score), ...] for the top-k rows, best first.
+        `where` restricts scoring to rows whose metadata matches it.
+        """
+        allowed = None
+        if where:
+            allowed = {row for row, meta in enumerate(self.metadatas) if metadata_matches(meta, where)}
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            rows = self.postings.get(term)
+            if not rows:
+                continue
+            idf = self.idf[term]
+            for row, tf in rows:
+                if allowed is not None and row not in allowed:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[row] / (self.avg_doc_length or 1))
+                scores[row] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]
+
+    def document(self, row: int) -> Document:
+        return Document(page_content=self.texts[row], metadata=dict(self.metadatas[row] or {}), id=self.ids[row])
+
+
+_index_lock = threading.Lock()
+_loaded: Dict[str, Tuple[int, BM25Index]] = {}
+
+
+def load_bm25_index(path: Path) -> Optional[BM25Index]:
+    """
+    Returns the pooled index at `path`, reloading it when the file changes.
+    None if the index has not been built yet.
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    mtime = os.stat(path).st_mtime_ns
+    key = str(path)
+    cached = _loaded.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _index_lock:
+        cached = _loaded.get(key)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, BM25Index.load(path))
+            _loaded[key] = cached
+            # Forget indexes of retired collections whose files were deleted
+            for other in [k for k in _loaded if not Path(k).exists()]:
+                del _loaded[other]
+        return cached[1]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuses several ranked id lists: score(id) = sum(1 / (rrf_k + rank)).
+    """
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] += 1.0 / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves `candidates` chunks from BM25 and from the vector backend,
+    fuses both rankings with reciprocal-rank fusion and returns the top k.
+    Returned Documents carry `bm25_score` and `rrf_score` in their metadata.
+    """
+
+    bm25: Any
+    embeddings: Any
+    vector_search: Any  # callable(query_embedding, n, where) -> List[Document] with .id set
+    k: int = 4
+    candidates: int = 20
+    rrf_k: int = 60
+    where: Optional[Dict[str, Any]] = None
+
+    def _fuse(self, query: str, vector_docs: List[Document]) -> List[Document]:
+        lexical = self.bm25.search(query, self.candidates, where=self.where)
+        bm25_scores = {self.bm25.ids[row]: score for row, score in lexical}
+
+        by_id: Dict[str, Document] = {d.id: d for d in vector_docs if d.id}
+
+        fused = reciprocal_rank_fusion(
+            [list(by_id), [self.bm25.ids[row] for row, _ in lexical]],
+            rrf_k=self.rrf_k,
+        )
+
+        results = []
+        for doc_id, rrf_score in fused[:self.k]:
+            doc = by_id.get(doc_id)
+            if doc is None:
+                doc = self.bm25.document(self.bm25.row_of[doc_id])
+            doc.metadata["bm25_score"] = round(bm25_scores.get(doc_id, 0.0), 4)
+            doc.metadata["rrf_score"] = round(rrf_score, 6)
+            results.append(doc)
+        return results
+
+    def retrieve_with_embedding(self, query: str, query_embedding: List[float]) -> List[Document]:
+        return self._fuse(query, self.vector_search(query_embedding, self.candidates, self.where))
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.retrieve_with_embedding(query, self.embeddings.embed_query(query))
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        query_embedding = await self.embeddings.aembed_query(query)
+        # Vector search and BM25 scoring are CPU-bound; keep them off the event loop
+        return await asyncio.to_thread(self.retrieve_with_embedding, query, query_embedding)
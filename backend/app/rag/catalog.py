@@ -0,0 +1,115 @@
+# backend/app/rag/catalog.py
+
+"""Persisted catalog of ingested documents.
+
+One record per source file: filename, content hash, page count, chunk
+count and ingest time. The ingest pipeline writes it next to the Chroma
+data; document listing and counting read it instead of scanning every
+chunk's metadata out of the collection.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ..core.config import settings
+
+
+def file_content_hash(path) -> str:
+    """
+    SHA-256 of a file's bytes, read in 1 MiB blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_chunk_id(filename: str, text: str, occurrence: int = 0) -> str:
+    """
+    Deterministic chunk id from the file name, the chunk text and which
+    occurrence of that text in the file it is. Position (page_no,
+    chunk_index) is metadata only, so an edit early in a file leaves the
+    ids and embeddings of the unchanged chunks after it alone.
+    """
+    digest = hashlib.sha1(f"{filename}\0{occurrence}\0{text}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def make_catalog_entry(filename: str, content_hash: str, page_count: int, chunk_count: int) -> Dict:
+    return {
+        "filename": filename,
+        "content_hash": content_hash,
+        "page_count": page_count,
+        "chunk_count": chunk_count,
+        "ingested_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def diff_catalog(catalog: Dict[str, Dict], hashes: Dict[str, str]
+                 ) -> Tuple[List[str], List[str], List[str], List[str]]:
+    """
+    Compares the files on disk ({filename: content hash}) with the catalog.
+    Returns (added, changed, removed, unchanged) filenames, each sorted.
+    """
+    files = sorted(hashes)
+    added = [f for f in files if f not in catalog]
+    changed = [f for f in files if f in catalog and catalog[f].get("content_hash") != hashes[f]]
+    removed = sorted(f for f in catalog if f not in hashes)
+    unchanged = [f for f in files if f in catalog and catalog[f].get("content_hash") == hashes[f]]
+    return added, changed, removed, unchanged
+
+
+_catalog_lock = threading.Lock()
+_loaded: Optional[Tuple[int, Dict[str, Dict]]] = None
+
+
+def load_catalog() -> Optional[Dict[str, Dict]]:
+    """
+    Returns {filename: entry} from the catalog file, cached until the file
+    changes. None if no catalog has been written yet.
+    """
+    global _loaded
+    path = Path(settings.DOCUMENT_CATALOG_PATH)
+    if not path.exists():
+        return None
+    mtime = os.stat(path).st_mtime_ns
+    cached = _loaded
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _catalog_lock:
+        if _loaded is None or _loaded[0] != mtime:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)["documents"]
+            _loaded = (mtime, {e["filename"]: e for e in entries})
+        return _loaded[1]
+
+
+def save_catalog(entries: Dict[str, Dict]):
+    """
+    Atomically replaces the catalog with `entries` ({filename: entry}).
+    """
+    global _loaded
+    path = Path(settings.DOCUMENT_CATALOG_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with _catalog_lock:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"documents": sorted(entries.values(), key=lambda e: e["filename"])}, f, indent=2)
+        os.replace(tmp, path)
+        _loaded = None
+
+
+def list_documents() -> Optional[List[Dict]]:
+    """
+    Catalog entries sorted by filename, or None if there is no catalog.
+    """
+    catalog = load_catalog()
+    if catalog is None:
+        return None
+    return [catalog[name] for name in sorted(catalog)]
@@ -1,13 +1,28 @@
 # backend/app/rag/chain.py
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Any
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 import logging
 
+from ..core.config import settings
 from ..core.llm import get_llm
-from .vectorstore import get_retriever, calculate_dynamic_k
+from ..core.metrics import (
+    CONTEXT_CHARS, CONTEXT_SOURCES, K_USED, PACKED_CHUNKS, PROMPT_TOKENS, RETRIEVED_CHUNKS,
+    ROUTED_RETRIEVALS, observe_stage, timed_stage,
+)
+from .vectorstore import (
+    get_retriever, calculate_dynamic_k, retrieve_with_embedding, get_document_names, source_filter,
+)
 from .filter import filter_chunks
+from .dedup import NearDuplicateFilter
+from .features import concept_terms, features_from_metadata, get_chunk_features
+from .answer_cache import get_answer_cache
+from .context_packer import estimate_tokens, pack_chunks, pack_history
+from .embedder import embed_queries
 import re
 
 
@@ -119,27 +134,297 @@ def build_rag_chain():
     return chain
 
 
-def run_rag(question: str, k: int = 4, chat_history: list = None) -> Dict[str, Any]:
+# --------------------------
+# 2. Chunk matching & ranking
+# --------------------------
+# Structural features are query-independent and precomputed at ingest
+# (see features.py); chunks from older ingests are analyzed on the fly.
+
+HOLIDAY_QUESTION_SIGNALS = ['holiday', 'january', 'february', 'march', 'april',
+                            'may', 'june', 'july', 'august', 'september',
+                            'october', 'november', 'december', 'mandate', 'optional']
+
+
+def extract_question_concepts(q: str) -> set:
     """
-    Executes the RAG flow:
-       - retrieve relevant chunks
-       - build context (including chat history if provided)
-       - run LCEL chain
-       - return answer + sources
+    Extract meaningful question concepts (NOT hardcoded keywords).
+    Returns set of significant words.
     
-    Args:
-        question: Current user query
-        k: Number of chunks to retrieve
-        chat_history: Optional list of previous messages [{"role": "user"|"assistant", "content": "..."}]
+    Includes:
+    - Words > 3 chars (to catch month names like "june", "july")
+    - Alphabetic only (removes dates, numbers)
+    - Excludes common stopwords (the, and, for, etc.)
+    - INCLUDES month names (january, february, etc.)
+    - INCLUDES action words (leave, policy, approval, etc.)
+    """
+    return concept_terms(q)
+
+
+def get_chunk_terms(doc) -> set:
+    """
+    Concept terms of a retrieved chunk, read from ingest-time metadata
+    when available.
+    """
+    meta = getattr(doc, "metadata", {}) or {}
+    features = features_from_metadata(meta)
+    if features is not None:
+        return set(features["feat_terms"].split())
+    return concept_terms(getattr(doc, "page_content", "") or "")
+
+
+def chunk_matches_question(chunk_terms: set, question_concepts: set) -> bool:
+    """
+    DETERMINISTIC matching: Does chunk address question's concepts?
+    NO hardcoding - based on concept overlap.
     
-    For multi-concept questions (hybrid + leave + holidays), we auto-boost k
-    to ensure cross-document retrieval. The boost is calculated dynamically
-    based on the number of unique documents in the vectorstore.
+    IMPORTANT: Match ALL chunks that share ANY concept (>= 1).
+    This ensures no relevant chunks are skipped before ranking.
+    Ranking happens AFTER matching, not during matching.
     """
+    if not question_concepts:
+        return True
     
-    if chat_history is None:
-        chat_history = []
+    # Concept overlap: chunk must share AT LEAST 1 meaningful concept with question
+    # Do NOT skip chunks based on concept count - let ranking handle prioritization
+    overlap = len(question_concepts & chunk_terms)
+    return overlap >= 1
+
+
+def question_has_holiday_signals(question_concepts: set) -> bool:
+    """
+    Does the question ask about holidays/months? Computed once per request.
+    """
+    question_lower = ' '.join(question_concepts).lower()
+    return any(signal in question_lower for signal in HOLIDAY_QUESTION_SIGNALS)
+
+
+def score_chunk_completeness(doc, question_concepts: set, has_holiday_signals: bool = None) -> float:
+    """
+    Score chunk completeness for ranking (ONLY matching chunks).
+    Higher score = more complete. NO hardcoding.
+    """
+    content = getattr(doc, "page_content", "") or ""
+    meta = getattr(doc, "metadata", {}) or {}
+    features = get_chunk_features(content, meta)
+    if has_holiday_signals is None:
+        has_holiday_signals = question_has_holiday_signals(question_concepts)
+    
+    score = 0.0
+    
+    # ===== COMPLETENESS SCORING =====
     
+    # 1. HIGHEST PRIORITY: Complete table structure (headers + columns)
+    if features['feat_table_headers'] > 0 and features['feat_has_table_columns']:
+        score += 50  # Well-formed, complete table
+    elif features['feat_table_headers'] > 0:
+        score += 30  # Has headers
+    
+    # 2. Entry count: more entries = more complete
+    if features['feat_numbered_entries'] > 5:
+        score += 25  # Many entries
+    elif features['feat_numbered_entries'] > 2:
+        score += 15  # Some entries
+    elif features['feat_numbered_entries'] > 0:
+        score += 8
+    
+    # 3. Data density
+    if features['feat_data_rows'] > 5:
+        score += 15
+    elif features['feat_data_rows'] > 2:
+        score += 8
+    
+    # 4. Content length: substantial > fragment
+    if features['feat_char_len'] > 400:
+        score += 10
+    elif features['feat_char_len'] > 200:
+        score += 5
+    
+    # 5. Concept match quality
+    chunk_words = set(w for w in features['feat_terms'].split() if len(w) > 4)
+    concept_overlap = len(question_concepts & chunk_words)
+    score += min(8, concept_overlap)
+    
+    # ===== DOCUMENT-TYPE BOOST (without hardcoding) =====
+    # If query asks about holidays AND content contains holiday data → boost
+    if has_holiday_signals and features['feat_has_dates'] and features['feat_has_table_columns']:
+        score += 40  # STRONG boost for holiday tables
+    elif has_holiday_signals and features['feat_has_dates']:
+        score += 25  # Medium boost for holiday content
+    
+    return score
+
+
+# --------------------------
+# 3. Query decomposition & routing
+# --------------------------
+# concept -> (trigger patterns, retrieval keywords for that concept's sub-query).
+# Triggers are regexes matched as whole words, so "noticed" is not "notice".
+_MONTHS = (
+    r"(?:january|february|march|april|may|june|july|august|september|october|"
+    r"november|december|jan|feb|mar|apr|jun|jul|aug|sept?|oct|nov|dec)"
+)
+
+QUERY_CONCEPTS = {
+    "probation": (
+        [r"\bprobation(?:ary)?\b", r"\bjoin(?:ed|ing)?\b", r"\bconfirmation\b"],
+        "probation period duration confirmation",
+    ),
+    "separation": (
+        [r"\bresign(?:ed|ing|ation)?\b", r"\bnotice\b", r"\bquit(?:ting)?\b", r"\bseparation\b",
+         r"\brelieving\b", r"\bexit\b", r"\bleave the (?:org|organi[sz]ation|company)\b"],
+        "resignation notice period separation policy",
+    ),
+    "holiday_calendar": (
+        # "mandatory"/"optional" and month names mean a holiday only in
+        # holiday context: "optional leave", "mandatory holidays", "Dec 25".
+        [r"\bholidays?\b", r"\bfestivals?\b", r"\bcalendar\b",
+         r"\b(?:mandatory|mandate|optional)\s+(?:leaves?|holidays?|days?\s+off)\b",
+         rf"\b{_MONTHS}\s+\d{{1,2}}(?:st|nd|rd|th)?\b",
+         rf"\b\d{{1,2}}(?:st|nd|rd|th)?\s+(?:of\s+)?{_MONTHS}\b"],
+        "Holiday Calendar 2025 Bangalore mandatory optional holidays",
+    ),
+    "hybrid_work": (
+        [r"\bhybrid\b", r"\bwfh\b", r"\bwork(?:ing)? from home\b", r"\bremote(?:ly)?\b",
+         r"\boffice days?\b"],
+        "Hybrid Work Policy work from home office attendance",
+    ),
+}
+
+_CONCEPT_PATTERNS = {
+    concept: re.compile("|".join(triggers), re.IGNORECASE)
+    for concept, (triggers, _) in QUERY_CONCEPTS.items()
+}
+
+
+def detect_query_concepts(question: str) -> List[str]:
+    """
+    Concepts from QUERY_CONCEPTS that the question touches, in table order.
+    """
+    return [concept for concept, pattern in _CONCEPT_PATTERNS.items() if pattern.search(question)]
+
+
+def decompose_query(question: str) -> List[str]:
+    """
+    One sub-query per detected concept (the question plus that concept's
+    retrieval keywords). Empty unless at least two concepts are present.
+    """
+    concepts = detect_query_concepts(question)
+    if len(concepts) < 2:
+        return []
+    return [f"{question} {QUERY_CONCEPTS[c][1]}" for c in concepts]
+
+
+# concept -> filename keywords identifying the documents that answer it
+CONCEPT_SOURCE_KEYWORDS = {
+    "probation": ["probation"],
+    "separation": ["separation", "resignation", "exit"],
+    "holiday_calendar": ["holiday", "calendar"],
+    "hybrid_work": ["hybrid", "wfh", "remote"],
+}
+
+
+def route_sources(concepts: List[str]) -> List[str]:
+    """
+    Ingested source files whose names match any of the concepts' keywords.
+    Empty (search everything) when nothing matches or every file does.
+    """
+    keywords = [kw for c in concepts for kw in CONCEPT_SOURCE_KEYWORDS.get(c, [])]
+    if not keywords:
+        return []
+    names = get_document_names()
+    matched = [name for name in names if any(kw in name.lower() for kw in keywords)]
+    return matched if len(matched) < len(names) else []
+
+
+def filtered_results_look_weak(query: str, docs: list, k: int) -> bool:
+    """
+    A routed search is weak when it returns fewer than ROUTING_MIN_RESULTS
+    chunks or none of them shares a concept term with the query.
+    """
+    if len(docs) < min(k, settings.ROUTING_MIN_RESULTS):
+        return True
+    question_concepts = extract_question_concepts(query)
+    return not any(chunk_matches_question(get_chunk_terms(d), question_concepts) for d in docs)
+
+
+def routed_search(search, query: str, k: int, sources: List[str]) -> list:
+    """
+    Runs `search(where)` restricted to `sources`, falling back to the
+    unfiltered search when the filtered result looks weak.
+    """
+    if sources:
+        docs = search(source_filter(sources))
+        if not filtered_results_look_weak(query, docs, k):
+            ROUTED_RETRIEVALS.inc(outcome="filtered")
+            return docs
+        ROUTED_RETRIEVALS.inc(outcome="fallback")
+        logging.debug(f"Routed search over {sources} looked weak; falling back to global search")
+    return search(None)
+
+
+async def arouted_search(search, query: str, k: int, sources: List[str]) -> list:
+    """
+    Async routed_search; `search(where)` returns an awaitable.
+    """
+    if sources:
+        docs = await search(source_filter(sources))
+        if not filtered_results_look_weak(query, docs, k):
+            ROUTED_RETRIEVALS.inc(outcome="filtered")
+            return docs
+        ROUTED_RETRIEVALS.inc(outcome="fallback")
+        logging.debug(f"Routed search over {sources} looked weak; falling back to global search")
+    return await search(None)
+
+
+def _doc_key(doc) -> str:
+    doc_id = getattr(doc, "id", None)
+    if doc_id:
+        return doc_id
+    return " ".join((getattr(doc, "page_content", "") or "").lower().split())
+
+
+def merge_subquery_results(results: List[list], doc_quota: int, max_chunks: int) -> list:
+    """
+    Round-robin merge of per-sub-query rankings: takes each list's next best
+    chunk in turn, skips duplicates, and caps chunks per source document so
+    every concept's document is represented.
+    """
+    merged, seen, per_doc = [], set(), {}
+    near_duplicates = NearDuplicateFilter(settings.NEAR_DUPLICATE_DISTANCE)
+    cursors = [0] * len(results)
+    while len(merged) < max_chunks:
+        progressed = False
+        for i, docs in enumerate(results):
+            while cursors[i] < len(docs):
+                doc = docs[cursors[i]]
+                cursors[i] += 1
+                key = _doc_key(doc)
+                meta = getattr(doc, "metadata", {}) or {}
+                src = meta.get("source_file", "unknown")
+                if key in seen or per_doc.get(src, 0) >= doc_quota:
+                    continue
+                if near_duplicates.match(doc.page_content, meta):
+                    continue
+                seen.add(key)
+                near_duplicates.add(doc.page_content, meta)
+                per_doc[src] = per_doc.get(src, 0) + 1
+                merged.append(doc)
+                progressed = True
+                break
+            if len(merged) >= max_chunks:
+                break
+        if not progressed:
+            break
+    return merged
+
+
+@timed_stage("query_expansion")
+def plan_query(question: str, k: int = 4) -> Dict[str, Any]:
+    """
+    Query analysis stage of run_rag: expands the question for retrieval and
+    decides k. Returns a plan dict consumed by retrieve_documents() and
+    build_context().
+    """
     # ========================================================================
     # QUERY EXPANSION: Detect temporal patterns and expand with relevant keywords
     # ========================================================================
@@ -230,10 +515,118 @@ def run_rag(question: str, k: int = 4, chat_history: list = None) -> Dict[str, A
             logging.debug(f"Multi-concept query detected. Dynamic k={k}")
             break
 
-    retriever = get_retriever(k=k)
-    # Use expanded query for retrieval to get better multi-document coverage
-    docs = retriever.invoke(expanded_query)   # LCEL-compatible API
-    
+    # Multi-concept questions can fan out into per-concept sub-queries
+    # instead of one blended query with a raised k
+    sub_queries = []
+    if settings.QUERY_DECOMPOSITION and is_multi_concept and not is_doc_listing_query:
+        sub_queries = decompose_query(question)
+        if sub_queries:
+            logging.debug(f"Decomposed into {len(sub_queries)} sub-queries")
+
+    # Intent routing: restrict retrieval to the documents the detected
+    # concepts live in (each sub-query gets its own concept's documents)
+    sources, sub_query_sources = [], []
+    if settings.RETRIEVAL_ROUTING and not is_doc_listing_query:
+        concepts = detect_query_concepts(question)
+        if sub_queries:
+            sub_query_sources = [route_sources([c]) for c in concepts]
+        else:
+            sources = route_sources(concepts)
+            if sources:
+                logging.debug(f"Routing retrieval to {sources}")
+
+    K_USED.observe(k)
+    return {
+        "question": question,
+        "expanded_query": expanded_query,
+        "k": k,
+        "is_doc_listing_query": is_doc_listing_query,
+        "is_multi_concept": is_multi_concept,
+        "sub_queries": sub_queries,
+        "sources": sources,
+        "sub_query_sources": sub_query_sources,
+    }
+
+
+@timed_stage("retrieval")
+def retrieve_documents(plan: Dict[str, Any], query_embedding: List[float] = None) -> list:
+    """
+    Retrieval stage of run_rag. When the caller already embedded the
+    expanded query (e.g. in a batch), the embedding is reused.
+    """
+    if plan.get("sub_queries"):
+        return retrieve_sub_queries(plan["sub_queries"], plan.get("sub_query_sources"))
+
+    expanded_query = plan["expanded_query"]
+    k = plan["k"]
+    if query_embedding is not None:
+        search = lambda where: retrieve_with_embedding(expanded_query, query_embedding, k, where)
+    else:
+        # Use expanded query for retrieval to get better multi-document coverage
+        search = lambda where: get_retriever(k=k, where=where).invoke(expanded_query)
+    return routed_search(search, expanded_query, k, plan.get("sources"))
+
+
+@timed_stage("retrieval")
+async def aretrieve_documents(plan: Dict[str, Any]) -> list:
+    """
+    Async retrieval stage (retriever.ainvoke).
+    """
+    def searcher(query: str, k: int):
+        return lambda where: get_retriever(k=k, where=where).ainvoke(query)
+
+    if plan.get("sub_queries"):
+        k = settings.SUBQUERY_K
+        sources = plan.get("sub_query_sources") or [[]] * len(plan["sub_queries"])
+        results = await asyncio.gather(*(
+            arouted_search(searcher(q, k), q, k, s) for q, s in zip(plan["sub_queries"], sources)
+        ))
+        return merge_subquery_results(list(results), settings.SUBQUERY_DOC_QUOTA, settings.SUBQUERY_MAX_CHUNKS)
+
+    query, k = plan["expanded_query"], plan["k"]
+    return await arouted_search(searcher(query, k), query, k, plan.get("sources"))
+
+
+def retrieve_sub_queries(sub_queries: List[str], sub_query_sources: List[List[str]] = None) -> list:
+    """
+    Embeds all sub-queries in one batched call, runs their (optionally
+    routed) searches concurrently and merges the results with per-document
+    quotas.
+    """
+    embeddings = embed_queries(sub_queries)
+    sources = sub_query_sources or [[]] * len(sub_queries)
+    k = settings.SUBQUERY_K
+
+    def search(args):
+        query, embedding, query_sources = args
+        return routed_search(
+            lambda where: retrieve_with_embedding(query, embedding, k, where), query, k, query_sources)
+
+    with ThreadPoolExecutor(max_workers=len(sub_queries)) as pool:
+        results = list(pool.map(search, zip(sub_queries, embeddings, sources)))
+    return merge_subquery_results(results, settings.SUBQUERY_DOC_QUOTA, settings.SUBQUERY_MAX_CHUNKS)
+
+
+# Fixed prompt cost (instructions) charged on top of the packed context
+PROMPT_TEMPLATE_TOKENS = estimate_tokens(RAG_PROMPT.template)
+CONTEXT_SEPARATOR = "\\n\\n---\\n\\n"
+
+
+def build_context(plan: Dict[str, Any], docs: list, chat_history: list = None) -> Dict[str, Any]:
+    """
+    Match/rank/filter stage of run_rag: turns retrieved docs into the prompt
+    context and the structured sources list. With CONTEXT_TOKEN_BUDGET set,
+    history and chunks are packed into the budget (see context_packer.py);
+    `usage` reports the estimated tokens either way.
+    """
+    question = plan["question"]
+    is_doc_listing_query = plan["is_doc_listing_query"]
+    is_multi_concept = plan["is_multi_concept"]
+    if chat_history is None:
+        chat_history = []
+    RETRIEVED_CHUNKS.observe(len(docs))
+    stage_started = time.perf_counter()
+
     # ========================================================================
     # DOCUMENT LISTING SPECIAL CASE: Inject complete document list
     # ========================================================================
@@ -241,22 +634,9 @@ def run_rag(question: str, k: int = 4, chat_history: list = None) -> Dict[str, A
     # to ensure the LLM can list them all, regardless of retrieval results
     document_list_context = ""
     if is_doc_listing_query:
-        from .vectorstore import get_chroma_client
-        client = get_chroma_client()
-        collection = client.get_or_create_collection(
-            name="hr_docs",
-            metadata={"hnsw:space": "cosine"}
-        )
-        all_items = collection.get()
-        
-        if all_items and all_items.get("metadatas"):
-            unique_docs = set()
-            for meta in all_items["metadatas"]:
-                source_file = meta.get("source_file", "")
-                if source_file:
-                    unique_docs.add(source_file)
-            
-            doc_list = sorted(list(unique_docs))
+        from .vectorstore import get_document_names
+        doc_list = get_document_names()
+        if doc_list:
             document_list_context = "[SYSTEM NOTE: Complete list of available documents in knowledge base: " + ", ".join(doc_list) + "]\n\n"
             logging.debug(f"Injected document list: {doc_list}")
     
@@ -268,178 +648,15 @@ def run_rag(question: str, k: int = 4, chat_history: list = None) -> Dict[str, A
     # Phase 2: Rank matching chunks by completeness
     # ========================================================================
     
-    def extract_question_concepts(q: str) -> set:
-        """
-        Extract meaningful question concepts (NOT hardcoded keywords).
-        Returns set of significant words.
-        
-        Includes:
-        - Words > 3 chars (to catch month names like "june", "july")
-        - Alphabetic only (removes dates, numbers)
-        - Excludes common stopwords (the, and, for, etc.)
-        - INCLUDES month names (january, february, etc.)
-        - INCLUDES action words (leave, policy, approval, etc.)
-        """
-        q_lower = q.lower()
-        # Common English stopwords that don't add meaning
-        stopwords = {"the", "and", "for", "from", "with", "this", "that", "are", "is", "on", "or", "to", "a", "an", "by", "at", "be", "been", "if", "as", "in"}
-        
-        # Extract words longer than 3 chars, alphabetic only
-        concepts = set(
-            w for w in q_lower.split() 
-            if len(w) > 3 and w.isalpha() and w not in stopwords
-        )
-        return concepts
-    
-    def chunk_matches_question(chunk_content: str, question_concepts: set) -> bool:
-        """
-        DETERMINISTIC matching: Does chunk address question's concepts?
-        NO hardcoding - based on concept overlap.
-        
-        IMPORTANT: Match ALL chunks that share ANY concept (>= 1).
-        This ensures no relevant chunks are skipped before ranking.
-        Ranking happens AFTER matching, not during matching.
-        """
-        if not question_concepts:
-            return True
-        
-        chunk_lower = chunk_content.lower()
-        stopwords = {"the", "and", "for", "from", "with", "this", "that", "are", "is", "on", "or", "to", "a", "an", "by", "at", "be", "been", "if", "as", "in"}
-        
-        chunk_words = set(
-            w for w in chunk_lower.split() 
-            if len(w) > 3 and w.isalpha() and w not in stopwords
-        )
-        
-        # Concept overlap: chunk must share AT LEAST 1 meaningful concept with question
-        # Do NOT skip chunks based on concept count - let ranking handle prioritization
-        overlap = len(question_concepts & chunk_words)
-        return overlap >= 1
-    
-    def analyze_chunk_structure(content: str) -> Dict[str, Any]:
-        """
-        Analyze chunk structure objectively for completeness assessment.
-        NO hardcoding - pure structural analysis.
-        """
-        lines = content.split('\n')
-        
-        metrics = {
-            'num_lines': len(lines),
-            'non_empty_lines': 0,
-            'numbered_entries': 0,      # Entries like "1 Item", "2 Item"
-            'table_headers': 0,         # Header-like lines (>50% uppercase)
-            'data_rows': 0,             # Data-bearing lines (many digits)
-            'numeric_lines': 0,         # Lines with any numbers
-            'has_table_columns': False, # S.No, Date, Holiday, etc present
-        }
-        
-        for line in lines:
-            stripped = line.strip()
-            if not stripped:
-                continue
-            
-            metrics['non_empty_lines'] += 1
-            
-            # Numbered entries (1, 2, 3, ...)
-            if stripped[0].isdigit():
-                parts = stripped.split(None, 1)
-                if parts and parts[0].isdigit():
-                    metrics['numbered_entries'] += 1
-            
-            # Header lines (>50% uppercase)
-            if len(stripped) > 3:
-                upper_ratio = sum(1 for c in stripped if c.isupper()) / len(stripped)
-                if upper_ratio > 0.5:
-                    metrics['table_headers'] += 1
-            
-            # Numeric content
-            digit_count = sum(1 for c in stripped if c.isdigit())
-            if digit_count > 0:
-                metrics['numeric_lines'] += 1
-                if digit_count > 3:
-                    metrics['data_rows'] += 1
-        
-        # Check for table structure keywords
-        metrics['has_table_columns'] = any(kw in content for kw in 
-                                          ['S.No', 'Date', 'Holiday', 'Month', 'Day', 'Occasion'])
-        
-        return metrics
-    
-    def score_chunk_completeness(doc, question_concepts: set) -> float:
-        """
-        Score chunk completeness for ranking (ONLY matching chunks).
-        Higher score = more complete. NO hardcoding.
-        """
-        content = getattr(doc, "page_content", "") or ""
-        analysis = analyze_chunk_structure(content)
-        
-        score = 0.0
-        
-        # ===== COMPLETENESS SCORING =====
-        
-        # 1. HIGHEST PRIORITY: Complete table structure (headers + columns)
-        if analysis['table_headers'] > 0 and analysis['has_table_columns']:
-            score += 50  # Well-formed, complete table
-        elif analysis['table_headers'] > 0:
-            score += 30  # Has headers
-        
-        # 2. Entry count: more entries = more complete
-        if analysis['numbered_entries'] > 5:
-            score += 25  # Many entries
-        elif analysis['numbered_entries'] > 2:
-            score += 15  # Some entries
-        elif analysis['numbered_entries'] > 0:
-            score += 8
-        
-        # 3. Data density
-        if analysis['data_rows'] > 5:
-            score += 15
-        elif analysis['data_rows'] > 2:
-            score += 8
-        
-        # 4. Content length: substantial > fragment
-        if len(content) > 400:
-            score += 10
-        elif len(content) > 200:
-            score += 5
-        
-        # 5. Concept match quality
-        chunk_words = set(w for w in content.lower().split() if len(w) > 4 and w.isalpha())
-        concept_overlap = len(question_concepts & chunk_words)
-        score += min(8, concept_overlap)
-        
-        # ===== DOCUMENT-TYPE BOOST (without hardcoding) =====
-        # If question asks about holidays/months, boost chunks with date/day content
-        question_lower = ' '.join(question_concepts).lower()
-        
-        has_holiday_signals = any(signal in question_lower for signal in 
-                                 ['holiday', 'january', 'february', 'march', 'april', 
-                                  'may', 'june', 'july', 'august', 'september', 
-                                  'october', 'november', 'december', 'mandate', 'optional'])
-        
-        # Content has holiday indicators (dates, day names, holiday structure)
-        content_lower = content.lower()
-        has_content_dates = any(date_signal in content_lower for date_signal in
-                               ['january', 'february', 'march', 'april', 'may', 'june',
-                                'july', 'august', 'september', 'october', 'november', 'december',
-                                'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 
-                                'saturday', 'sunday', 'mandate', 'optional'])
-        
-        # If query asks about holidays AND content contains holiday data → boost
-        if has_holiday_signals and has_content_dates and analysis['has_table_columns']:
-            score += 40  # STRONG boost for holiday tables
-        elif has_holiday_signals and has_content_dates:
-            score += 25  # Medium boost for holiday content
-        
-        return score
-    
+    stage_started = observe_stage("doc_listing", stage_started)
+
     # ===== PHASE 1: FILTER BY MATCHING =====
     question_concepts = extract_question_concepts(question)
+    holiday_question = question_has_holiday_signals(question_concepts)
     matching_docs = []
     
     for doc in docs:
-        content = getattr(doc, "page_content", "") or ""
-        if chunk_matches_question(content, question_concepts):
+        if chunk_matches_question(get_chunk_terms(doc), question_concepts):
             matching_docs.append(doc)
     
     logging.debug(f"Question concepts: {question_concepts}")
@@ -452,12 +669,13 @@ def run_rag(question: str, k: int = 4, chat_history: list = None) -> Dict[str, A
     # ===== PHASE 2: RANK MATCHING CHUNKS BY COMPLETENESS =====
     ranked_docs = []
     for doc in matching_docs:
-        score = score_chunk_completeness(doc, question_concepts)
+        score = score_chunk_completeness(doc, question_concepts, holiday_question)
         ranked_docs.append((doc, score))
     
     # Sort by score descending
     ranked_docs.sort(key=lambda x: x[1], reverse=True)
     docs = [doc for doc, _ in ranked_docs]
+    rank_scores = [score for _, score in ranked_docs]
     
     # For multi-concept queries, apply LIGHT document diversity:
     # Preserve intelligent ranking order but ensure key documents aren't completely missing
@@ -479,36 +697,59 @@ def run_rag(question: str, k: int = 4, chat_history: list = None) -> Dict[str, A
             # Don't override completeness scores with forced diversity
             pass  # Keep docs as-is (already ranked by completeness)
 
+    stage_started = observe_stage("match_rank", stage_started)
+
     # Convert docs → context + structured sources
     texts = []
     metas = []
-    for d in docs:
+    for d, score in zip(docs, rank_scores):
         text = getattr(d, "page_content", "") or ""
         meta = getattr(d, "metadata", {}) or {}
         texts.append(text)
-        metas.append(meta)
+        metas.append({**meta, "rank_score": score})
 
     logging.debug("Retrieved %d docs from retriever", len(texts))
 
-    # Filter noise and remove duplicate chunks (normalized)
-    filtered_texts, filtered_metas = filter_chunks(texts, metas)
+    # Filter noise and collapse near-duplicate chunks (SimHash signatures, same numbers)
+    filtered_texts, filtered_metas = filter_chunks(texts, metas, settings.NEAR_DUPLICATE_DISTANCE)
     logging.debug("After filtering/dedup: %d chunks", len(filtered_texts))
+    stage_started = observe_stage("filter_chunks", stage_started)
+
+    # Build context from retrieved chunks (already deduplicated by filter_chunks)
+    candidates = []
+    for meta, text in zip(filtered_metas, filtered_texts):
+        src_file = meta.get("source_file", "unknown")
+        header = f"[SOURCE: {src_file} | page: {meta.get('page_no','?')} | chunk: {meta.get('chunk_index','?')}]"
+        candidates.append((header, text, meta))
+
+    # Token budget: the prompt template, question and fixed notes first,
+    # history gets at most a quarter of what is left, chunks get the rest
+    budget = settings.CONTEXT_TOKEN_BUDGET
+    available = budget - PROMPT_TEMPLATE_TOKENS - estimate_tokens(question) - estimate_tokens(document_list_context)
+    history = pack_history(chat_history, max(available // 4, 1) if budget > 0 else 0)
+    history_tokens = sum(estimate_tokens(m.get("content", "")) + 4 for m in history)
+    chunk_budget = max(available - history_tokens, 1) if budget > 0 else 0
+    packed = pack_chunks(
+        [text for _, text, _ in candidates],
+        [meta.get("rank_score", 0.0) for _, _, meta in candidates],
+        chunk_budget,
+        [estimate_tokens(header + "\n" + CONTEXT_SEPARATOR) for header, _, _ in candidates],
+    )
+    PACKED_CHUNKS.inc(len(packed["selected"]) - packed["trimmed"], outcome="kept")
+    PACKED_CHUNKS.inc(packed["trimmed"], outcome="trimmed")
+    PACKED_CHUNKS.inc(packed["dropped"], outcome="dropped")
+    if packed["dropped"] or packed["trimmed"]:
+        logging.debug(f"Context packer: dropped {packed['dropped']}, trimmed {packed['trimmed']} "
+                      f"of {len(candidates)} chunks (budget {chunk_budget} tokens)")
 
-    # Build context from retrieved chunks. We dedupe at the chunk level (normalized text)
-    # but avoid any heuristic that filters out content based on domain-specific tokens.
-    seen_chunks = set()
     pieces: List[str] = []
     sources: List[Dict[str, Any]] = []
     
     # Track sources for diversity boost
     source_counts = {}
 
-    for meta, text in zip(filtered_metas, filtered_texts):
-        norm = " ".join(text.lower().split())
-        if norm in seen_chunks:
-            continue
-        seen_chunks.add(norm)
-
+    for index, text, _ in packed["selected"]:
+        header, _, meta = candidates[index]
         src_file = meta.get("source_file", "unknown")
         source_counts[src_file] = source_counts.get(src_file, 0) + 1
 
@@ -518,8 +759,6 @@ def run_rag(question: str, k: int = 4, chat_history: list = None) -> Dict[str, A
             "chunk_index": meta.get("chunk_index")
         }
         sources.append({**src_preview, "text": text[:800]})
-
-        header = f"[SOURCE: {src_file} | page: {meta.get('page_no','?')} | chunk: {meta.get('chunk_index','?')}]"
         pieces.append(header + "\n" + text)
 
     # For multi-concept questions, if we have a strong imbalance (one doc >> 80% of chunks),
@@ -534,55 +773,302 @@ def run_rag(question: str, k: int = 4, chat_history: list = None) -> Dict[str, A
 
     # join pieces with a clear separator so the LLM can see chunk boundaries
     # For document listing queries, prepend the complete document list
-    context = document_list_context + "\\n\\n---\\n\\n".join(pieces) + source_dist_note
+    context = document_list_context + CONTEXT_SEPARATOR.join(pieces) + source_dist_note
     
     # ========================================================================
     # CHAT HISTORY: Prepend conversation history for context-aware responses
     # ========================================================================
     # Format chat history as a conversation thread
-    if chat_history and len(chat_history) > 0:
+    if history:
         history_text = "[CONVERSATION HISTORY]\\n"
-        for msg in chat_history[-10:]:  # Keep last 10 messages for context
+        for msg in history:  # Last 10 messages, fewer if they exceed the budget
             role = msg.get("role", "unknown")
             content = msg.get("content", "")
             if role == "user":
                 history_text += f"User: {content}\\n"
             elif role == "assistant":
                 history_text += f"Assistant: {content}\\n"
+            elif role == "summary":
+                history_text += f"Summary of earlier conversation: {content}\\n"
         history_text += "[END OF CONVERSATION HISTORY]\\n\\n"
         
         # Prepend history to context
         context = history_text + context
-        logging.debug(f"Added {len(chat_history)} messages to context")
+        logging.debug(f"Added {len(history)} messages to context")
 
-    chain = build_rag_chain()
-    today = datetime.now().strftime("%Y-%m-%d")
+    context_tokens = estimate_tokens(context)
+    usage = {
+        "context_tokens": context_tokens,
+        "prompt_tokens": PROMPT_TEMPLATE_TOKENS + estimate_tokens(question) + context_tokens,
+        "token_budget": budget,
+        "chunks_packed": len(pieces),
+        "chunks_trimmed": packed["trimmed"],
+        "chunks_dropped": packed["dropped"],
+    }
+
+    observe_stage("context_assembly", stage_started)
+    CONTEXT_SOURCES.observe(len(sources))
+    CONTEXT_CHARS.observe(len(context))
+    PROMPT_TOKENS.observe(usage["prompt_tokens"])
+
+    return {"context": context, "sources": sources, "usage": usage}
 
-    # No domain-specific deterministic extraction here. The chain will provide the
-    # retrieved context to the LLM and the LLM is instructed to answer only from
-    # the context. This avoids hard-coded assumptions about document structure
-    # (holidays or otherwise) and lets the model reason over arbitrary content.
 
-    # Otherwise invoke the chain (LLM) with the assembled context and return
-    answer = chain.invoke({
+def build_chain_inputs(question: str, context: str) -> Dict[str, Any]:
+    """
+    Prompt variables for the LCEL chain.
+    """
+    return {
         "context": context,
         "question": question,
-        "today": today
-    })
+        "today": datetime.now().strftime("%Y-%m-%d")
+    }
+
 
-    # If model indicates it couldn't find the information, include short
-    # provenance snippets so the caller can see what was retrieved.
+def add_not_found_previews(answer: str, sources: List[Dict[str, Any]]) -> str:
+    """
+    If model indicates it couldn't find the information, include short
+    provenance snippets so the caller can see what was retrieved.
+    """
     low_answer = answer.lower() if isinstance(answer, str) else ""
     if isinstance(answer, str) and "i couldn't find" in low_answer:
         # include previews of top 3 retrieved sources to help debugging
         previews = []
         for s in sources[:3]:
-            previews.append(f"[source={s.get('source_file')} page={s.get('page_no')} chunk={s.get('chunk_index')}] {s.get('text')[:400].replace('\n',' ') }")
+            snippet = s.get('text')[:400].replace('\n', ' ')
+            previews.append(f"[source={s.get('source_file')} page={s.get('page_no')} chunk={s.get('chunk_index')}] {snippet}")
         preview_text = "\n\nTop retrieved snippets:\n" + "\n".join(previews) if previews else ""
         answer = answer + preview_text
+    return answer
 
-    return {
+
+@timed_stage("llm")
+def generate_answer(question: str, context: str, sources: List[Dict[str, Any]]) -> str:
+    """
+    Generation stage of run_rag: invokes the LCEL chain on the assembled
+    context.
+    """
+    chain = build_rag_chain()
+
+    # No domain-specific deterministic extraction here. The chain will provide the
+    # retrieved context to the LLM and the LLM is instructed to answer only from
+    # the context. This avoids hard-coded assumptions about document structure
+    # (holidays or otherwise) and lets the model reason over arbitrary content.
+    answer = chain.invoke(build_chain_inputs(question, context))
+    return add_not_found_previews(answer, sources)
+
+
+@timed_stage("llm")
+async def agenerate_answer(question: str, context: str, sources: List[Dict[str, Any]]) -> str:
+    """
+    Async generation stage: awaits the Gemini call instead of holding a thread.
+    """
+    chain = build_rag_chain()
+    answer = await chain.ainvoke(build_chain_inputs(question, context))
+    return add_not_found_previews(answer, sources)
+
+
+def run_rag(question: str, k: int = 4, chat_history: list = None) -> Dict[str, Any]:
+    """
+    Executes the RAG flow:
+       - retrieve relevant chunks
+       - build context (including chat history if provided)
+       - run LCEL chain
+       - return answer + sources
+    
+    Args:
+        question: Current user query
+        k: Number of chunks to retrieve
+        chat_history: Optional list of previous messages [{"role": "user"|"assistant", "content": "..."}]
+    
+    For multi-concept questions (hybrid + leave + holidays), we auto-boost k
+    to ensure cross-document retrieval. The boost is calculated dynamically
+    based on the number of unique documents in the vectorstore.
+
+    When ANSWER_CACHE_ENABLED is set, a semantically equivalent question
+    asked against the same corpus generation and history is answered from
+    the answer cache without retrieval or generation.
+    """
+    
+    if chat_history is None:
+        chat_history = []
+
+    answer_cache = get_answer_cache() if settings.ANSWER_CACHE_ENABLED else None
+    if answer_cache is not None:
+        cached = answer_cache.lookup(question, chat_history, k)
+        if cached is not None:
+            logging.debug(f"Answer cache hit (similarity={cached['cache_similarity']})")
+            return cached
+
+    plan = plan_query(question, k)
+    docs = retrieve_documents(plan)
+    built = build_context(plan, docs, chat_history)
+    answer = generate_answer(question, built["context"], built["sources"])
+    return _finish_rag(question, chat_history, k, answer, built["sources"], answer_cache, built["usage"])
+
+
+async def arun_rag(question: str, k: int = 4, chat_history: list = None) -> Dict[str, Any]:
+    """
+    Async version of run_rag with the same stages and result shape.
+    Retrieval and generation are awaited (ainvoke), so an event-loop worker
+    can keep hundreds of chats in flight while Gemini responds.
+    """
+    if chat_history is None:
+        chat_history = []
+
+    answer_cache = get_answer_cache() if settings.ANSWER_CACHE_ENABLED else None
+    if answer_cache is not None:
+        cached = await asyncio.to_thread(answer_cache.lookup, question, chat_history, k)
+        if cached is not None:
+            logging.debug(f"Answer cache hit (similarity={cached['cache_similarity']})")
+            return cached
+
+    plan = await asyncio.to_thread(plan_query, question, k)
+    docs = await aretrieve_documents(plan)
+    built = await asyncio.to_thread(build_context, plan, docs, chat_history)
+    answer = await agenerate_answer(question, built["context"], built["sources"])
+    if answer_cache is not None:
+        return await asyncio.to_thread(
+            _finish_rag, question, chat_history, k, answer, built["sources"], answer_cache, built["usage"])
+    return _finish_rag(question, chat_history, k, answer, built["sources"], None, built["usage"])
+
+
+async def astream_rag(question: str, k: int = 4, chat_history: list = None):
+    """
+    Streaming version of arun_rag. Async generator of (event, payload):
+       ("sources", {"sources": [...], "retrieved_chunks": n,
+                    "usage": {...}})                           before generation
+       ("token", str)                                          as Gemini streams
+       ("done", {"answer": str, "cache_hit": bool})            once complete
+    The assembled answer gets the same post-processing (not-found previews,
+    answer cache) as run_rag; previews arrive as a final token.
+    """
+    if chat_history is None:
+        chat_history = []
+
+    answer_cache = get_answer_cache() if settings.ANSWER_CACHE_ENABLED else None
+    if answer_cache is not None:
+        cached = await asyncio.to_thread(answer_cache.lookup, question, chat_history, k)
+        if cached is not None:
+            yield "sources", {"sources": cached["sources"], "retrieved_chunks": cached["retrieved_chunks"],
+                              "usage": None}
+            yield "token", cached["answer"]
+            yield "done", {"answer": cached["answer"], "cache_hit": True}
+            return
+
+    plan = await asyncio.to_thread(plan_query, question, k)
+    docs = await aretrieve_documents(plan)
+    built = await asyncio.to_thread(build_context, plan, docs, chat_history)
+    sources = built["sources"]
+    yield "sources", {"sources": sources, "retrieved_chunks": len(sources), "usage": built["usage"]}
+
+    chain = build_rag_chain()
+    parts: List[str] = []
+    llm_started = time.perf_counter()
+    async for token in chain.astream(build_chain_inputs(question, built["context"])):
+        if token:
+            parts.append(token)
+            yield "token", token
+    observe_stage("llm", llm_started)
+
+    streamed = "".join(parts)
+    answer = add_not_found_previews(streamed, sources)
+    if answer != streamed:
+        yield "token", answer[len(streamed):]
+
+    await asyncio.to_thread(_finish_rag, question, chat_history, k, answer, sources, answer_cache)
+    yield "done", {"answer": answer, "cache_hit": False}
+
+
+def _finish_rag(question: str, chat_history: list, k: int, answer: str,
+                sources: List[Dict[str, Any]], answer_cache, usage: Dict[str, Any] = None) -> Dict[str, Any]:
+    result = {
         "answer": answer,
         "sources": sources,
         "retrieved_chunks": len(sources)
-    }
\ No newline at end of file
+    }
+
+    # Don't cache misses: a later ingest or paraphrase may well find the answer
+    low_answer = answer.lower() if isinstance(answer, str) else ""
+    if answer_cache is not None and "i couldn't find" not in low_answer:
+        answer_cache.store(question, chat_history, k, result)
+
+    # Token usage describes this request's prompt, not a later cache hit
+    return {**result, "usage": usage}
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def run_rag_batch(questions: List[str], k: int = 4, max_concurrency: int = None) -> List[Dict[str, Any]]:
+    """
+    Answers many independent questions (no chat history) in one pass:
+       - plan every question
+       - embed all expanded queries in one batched embedding call
+       - retrieve and build context for each question
+       - generate answers with at most `max_concurrency` LLM calls in flight
+
+    Results are returned in input order. Each carries per-stage timings in
+    milliseconds and an `error` string instead of raising, so one failing
+    question does not sink the batch. The answer cache is not consulted:
+    batch runs (regression, nightly export) always produce fresh answers.
+    """
+    max_concurrency = max_concurrency or settings.BATCH_MAX_CONCURRENCY
+    results = [
+        {"question": q, "answer": None, "sources": [], "retrieved_chunks": 0, "usage": None, "error": None, "timing_ms": {}}
+        for q in questions
+    ]
+    plans: List[Dict[str, Any]] = [None] * len(questions)
+    contexts: List[Dict[str, Any]] = [None] * len(questions)
+
+    for i, question in enumerate(questions):
+        started = time.perf_counter()
+        try:
+            plans[i] = plan_query(question, k)
+        except Exception as e:
+            results[i]["error"] = f"query planning failed: {e}"
+        results[i]["timing_ms"]["plan"] = _elapsed_ms(started)
+
+    active = [i for i, plan in enumerate(plans) if plan is not None]
+
+    # One embedding request for every expanded query (cache hits skipped)
+    started = time.perf_counter()
+    try:
+        embeddings = embed_queries([plans[i]["expanded_query"] for i in active])
+    except Exception as e:
+        for i in active:
+            results[i]["error"] = f"embedding failed: {e}"
+        active, embeddings = [], []
+    embed_ms = _elapsed_ms(started)
+    for i in active:
+        results[i]["timing_ms"]["embed_batch"] = embed_ms
+
+    for i, embedding in zip(active, embeddings):
+        started = time.perf_counter()
+        try:
+            docs = retrieve_documents(plans[i], query_embedding=embedding)
+            contexts[i] = build_context(plans[i], docs)
+        except Exception as e:
+            results[i]["error"] = f"retrieval failed: {e}"
+        results[i]["timing_ms"]["retrieve"] = _elapsed_ms(started)
+
+    def _generate(i: int):
+        started = time.perf_counter()
+        try:
+            sources = contexts[i]["sources"]
+            results[i]["answer"] = generate_answer(questions[i], contexts[i]["context"], sources)
+            results[i]["sources"] = sources
+            results[i]["retrieved_chunks"] = len(sources)
+            results[i]["usage"] = contexts[i]["usage"]
+        except Exception as e:
+            results[i]["error"] = f"generation failed: {e}"
+        results[i]["timing_ms"]["generate"] = _elapsed_ms(started)
+
+    ready = [i for i, ctx in enumerate(contexts) if ctx is not None]
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        list(pool.map(_generate, ready))
+
+    for result in results:
+        result["timing_ms"]["total"] = round(sum(result["timing_ms"].values()), 1)
+    return results
@@ -0,0 +1,106 @@
+# backend/app/rag/context_packer.py
+
+"""Token-budgeted context packing.
+
+build_context() ranks the retrieved chunks; pack_chunks() then decides
+which of them go into the prompt so the prompt stays within
+CONTEXT_TOKEN_BUDGET. Chunks are chosen by ranking score per token, with
+scores taken as a share of the best chunk's; chunks without a positive
+score follow in rank order rather than shortest first. The first chunk
+that no longer fits is trimmed at a line boundary and chunks that still
+do not fit are dropped. Tokens are estimated as characters / 4, which is
+close enough for Gemini on English policy text and costs nothing per
+request.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+CHARS_PER_TOKEN = 4
+MIN_TRIMMED_TOKENS = 64  # a trimmed chunk smaller than this is dropped instead
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cuts `text` to about `max_tokens`, preferring the last line, sentence
+    or word boundary in the second half of the allowance.
+    """
+    limit = max(0, max_tokens) * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    for sep in ("\n", ". ", " "):
+        pos = cut.rfind(sep)
+        if pos >= limit // 2:
+            return cut[:pos + 1].rstrip()
+    return cut.rstrip()
+
+
+def pack_chunks(texts: List[str], scores: List[float], budget: int,
+                overheads: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Selects chunks (given in rank order) to maximize ranking score per token
+    within `budget` tokens. `overheads[i]` is the extra cost of including
+    chunk i (source header, separator). budget <= 0 keeps every chunk.
+
+    Returns {"selected": [(index, text, trimmed), ...] in rank order,
+             "tokens_used", "dropped", "trimmed"}.
+    """
+    overheads = overheads or [0] * len(texts)
+    costs = [estimate_tokens(t) + o for t, o in zip(texts, overheads)]
+
+    if budget <= 0:
+        return {
+            "selected": [(i, t, False) for i, t in enumerate(texts)],
+            "tokens_used": sum(costs),
+            "dropped": 0,
+            "trimmed": 0,
+        }
+
+    # Scores as a share of the best one: zero-scored chunks come last in rank
+    # order, and with no positive score at all this is plain rank order
+    top = max(scores, default=0.0)
+    values = [max(s, 0.0) / top if top > 0 else 0.0 for s in scores]
+    order = sorted(range(len(texts)), key=lambda i: (-values[i] / max(costs[i], 1), i))
+
+    chosen: Dict[int, Tuple[str, bool]] = {}
+    remaining = budget
+    for i in order:
+        if costs[i] <= remaining:
+            chosen[i] = (texts[i], False)
+            remaining -= costs[i]
+            continue
+        room = remaining - overheads[i]
+        if room >= MIN_TRIMMED_TOKENS:
+            trimmed = trim_to_tokens(texts[i], room)
+            chosen[i] = (trimmed, True)
+            remaining -= estimate_tokens(trimmed) + overheads[i]
+
+    selected = [(i, chosen[i][0], chosen[i][1]) for i in sorted(chosen)]
+    return {
+        "selected": selected,
+        "tokens_used": budget - remaining,
+        "dropped": len(texts) - len(selected),
+        "trimmed": sum(1 for _, _, was_trimmed in selected if was_trimmed),
+    }
+
+
+def pack_history(chat_history: List[Dict[str, Any]], budget: int, max_messages: int = 10) -> List[Dict[str, Any]]:
+    """
+    Most recent history messages (at most `max_messages`) that fit in
+    `budget` tokens, oldest first. budget <= 0 keeps all of them.
+    """
+    recent = list(chat_history or [])[-max_messages:]
+    if budget <= 0:
+        return recent
+    kept, used = [], 0
+    for msg in reversed(recent):
+        cost = estimate_tokens(msg.get("content", "")) + 4  # role prefix + newline
+        if used + cost > budget:
+            break
+        kept.append(msg)
+        used += cost
+    return list(reversed(kept))
@@ -0,0 +1,185 @@
+# backend/app/rag/dedup.py
+
+"""Near-duplicate detection with SimHash.
+
+Every chunk gets a 64-bit SimHash of its word 3-shingles at ingest. Chunks
+whose signatures differ in at most NEAR_DUPLICATE_DISTANCE bits are treated
+as near-duplicates (repeated letterhead and footers, re-issued pages), but
+only if they contain the same numbers: "12 days" vs "18 days", or a 2024 vs
+a 2025 holiday calendar, are different policies however similar the wording.
+
+The ingest pipeline assigns each chunk a cluster id, which is the signature
+of the cluster's representative (its first chunk). A chunk joins a cluster
+only if it is within range of that representative, so clusters never chain
+A~B~C. Signature, number fingerprint and cluster id are stored as chunk
+metadata. At query time a chunk is dropped only if it is within range of,
+and has the same numbers as, a chunk already kept: a popcount against a few
+chunks. Chunks ingested before signatures existed fall back to exact
+matching on normalized text.
+"""
+
+import hashlib
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SIMHASH_KEY = "simhash"
+NUMBERS_KEY = "dup_numbers"
+CLUSTER_KEY = "dup_cluster"
+
+SHINGLE_SIZE = 3
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_BIT_POSITIONS = np.arange(64, dtype=np.uint64)
+
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash over the word 3-shingles of `text` (lowercased,
+    alphanumeric tokens). Texts with fewer words use a single shingle.
+    """
+    tokens = _TOKEN_RE.findall((text or "").lower())
+    if not tokens:
+        return 0
+    shingles = [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(max(1, len(tokens) - SHINGLE_SIZE + 1))]
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64, count=len(shingles),
+    )
+    ones = ((hashes[:, None] >> _BIT_POSITIONS) & np.uint64(1)).sum(axis=0)
+    signature = 0
+    for bit in np.flatnonzero(ones * 2 > len(shingles)):
+        signature |= 1 << int(bit)
+    return signature
+
+
+def signature_hex(text: str) -> str:
+    """
+    simhash() as the 16-character hex string stored in chunk metadata
+    (Chroma metadata ints are signed 64-bit).
+    """
+    return f"{simhash(text):016x}"
+
+
+def number_fingerprint(text: str) -> str:
+    """
+    Short digest of the tokens of `text` that contain digits, in order
+    ("" if there are none). Chunks with different fingerprints are never
+    near-duplicates.
+    """
+    numbers = [t for t in _TOKEN_RE.findall((text or "").lower()) if any(c.isdigit() for c in t)]
+    if not numbers:
+        return ""
+    return hashlib.blake2b(" ".join(numbers).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex:
+    """
+    Cluster representatives, searchable for one within `max_distance` bits
+    of a query signature with the same number fingerprint. The 64 bits are
+    cut into max_distance + 1 bands; two signatures that close must agree
+    exactly on at least one band, so only representatives sharing a band
+    (and fingerprint) are compared.
+    """
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max(0, min(max_distance, 31))
+        bands = self.max_distance + 1
+        width = 64 // bands
+        self._bands = [(i * width, width if i < bands - 1 else 64 - i * width) for i in range(bands)]
+        self._tables: List[Dict[Tuple[str, int], List[int]]] = [{} for _ in self._bands]
+
+    def _keys(self, signature: int, numbers: str):
+        return [(numbers, (signature >> start) & ((1 << width) - 1)) for start, width in self._bands]
+
+    def find(self, signature: int, numbers: str) -> Optional[int]:
+        """
+        The nearest representative within max_distance, or None.
+        """
+        best, best_distance = None, self.max_distance + 1
+        for table, key in zip(self._tables, self._keys(signature, numbers)):
+            for representative in table.get(key, ()):
+                distance = hamming(signature, representative)
+                if distance < best_distance:
+                    best, best_distance = representative, distance
+        return best
+
+    def add(self, representative: int, numbers: str):
+        for table, key in zip(self._tables, self._keys(representative, numbers)):
+            bucket = table.setdefault(key, [])
+            if representative not in bucket:
+                bucket.append(representative)
+
+    def assign(self, signature_hex: str, numbers: str) -> Tuple[str, bool]:
+        """
+        Cluster id for a new chunk and whether it joined an existing cluster.
+        A chunk that joins no cluster becomes the representative of a new one.
+        """
+        signature = int(signature_hex, 16)
+        representative = self.find(signature, numbers)
+        if representative is not None:
+            return f"{representative:016x}", True
+        self.add(signature, numbers)
+        return signature_hex, False
+
+    @classmethod
+    def from_clusters(cls, max_distance: int, clusters: Iterable[Tuple[str, str]]) -> "SimHashIndex":
+        """
+        Index seeded with the (cluster id, number fingerprint) pairs of
+        stored chunks. A cluster id is its representative's signature, so
+        clusters stay usable after the representative chunk is deleted.
+        """
+        index = cls(max_distance)
+        for cluster, numbers in clusters:
+            index.add(int(cluster, 16), numbers)
+        return index
+
+
+def _normalize_text(s: str) -> str:
+    return " ".join(s.lower().split())
+
+
+class NearDuplicateFilter:
+    """
+    Per-request collapse of retrieved chunks: a chunk is a duplicate if its
+    signature is within `max_distance` bits of a kept chunk with the same
+    number fingerprint. Chunks without signatures are compared by
+    normalized text.
+    """
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        self._kept: List[Tuple[int, str]] = []
+        self._texts = set()
+
+    @staticmethod
+    def _numbers(text: str, meta: Dict) -> str:
+        numbers = meta.get(NUMBERS_KEY)
+        return number_fingerprint(text) if numbers is None else numbers
+
+    def match(self, text: str, meta: Optional[Dict]) -> Optional[str]:
+        """
+        How the chunk matches a kept one ("simhash", "exact"), or None if
+        it is new.
+        """
+        meta = meta or {}
+        signature = meta.get(SIMHASH_KEY)
+        if signature is None:
+            return "exact" if _normalize_text(text) in self._texts else None
+        value, numbers = int(signature, 16), self._numbers(text, meta)
+        for other, other_numbers in self._kept:
+            if other_numbers == numbers and hamming(value, other) <= self.max_distance:
+                return "simhash"
+        return None
+
+    def add(self, text: str, meta: Optional[Dict]):
+        meta = meta or {}
+        signature = meta.get(SIMHASH_KEY)
+        if signature is None:
+            self._texts.add(_normalize_text(text))
+            return
+        self._kept.append((int(signature, 16), self._numbers(text, meta)))
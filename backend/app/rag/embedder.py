@@ -1,15 +1,578 @@
+import asyncio
+import hashlib
+import logging
+import random
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:  # installed with the Gemini client
+    google_exceptions = None
+
+from ..core.config import settings
 from ..core.llm import get_embedding_model
+from ..core.metrics import stage_timer
+
+
+# ----------------------------------------------------------------------------
+# Disk tier
+# ----------------------------------------------------------------------------
+class SqliteEmbeddingTier:
+    """
+    Minimal key -> vector store backed by a SQLite file.
+    Vectors are stored as packed float32 so a restart does not need to
+    re-embed queries that were already seen.
+    """
+
+    def __init__(self, path: str, table: str = "query_embeddings"):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        self._lock = threading.Lock()
+        # One connection shared across threads, serialized by self._lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, max_age: float = 0):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT vector, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        blob, created_at = row
+        if max_age and time.time() - created_at > max_age:
+            return None
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def set(self, key: str, vector: List[float]):
+        blob = array("f", vector).tobytes()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, vector, created_at) VALUES (?, ?, ?)",
+                (key, blob, time.time()),
+            )
+            self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Vectors for the keys that are present, in one query per 500 keys.
+        """
+        found: Dict[str, List[float]] = {}
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM {self.table} WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+            for key, blob in rows:
+                vector = array("f")
+                vector.frombytes(blob)
+                found[key] = vector.tolist()
+        return found
+
+    def set_many(self, items: Dict[str, List[float]]):
+        now = time.time()
+        rows = [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, vector, created_at) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+
+# ----------------------------------------------------------------------------
+# In-memory LRU + TTL cache
+# ----------------------------------------------------------------------------
+def normalize_query(text: str) -> str:
+    """
+    Normalize query text for cache keys: lower, collapse whitespace.
+    """
+    return re.sub(r"\s+", " ", text.strip().lower())
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded, thread-safe cache of query embeddings.
+
+    Keys are (embedding model, normalized query). Entries expire after
+    `ttl_seconds` and the least recently used entry is evicted once
+    `max_size` is reached. An optional disk tier (any object with
+    get(key, max_age) / set(key, vector)) is consulted on memory misses.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 0, disk_tier=None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.disk_tier = disk_tier
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return f"{model}::{normalize_query(text)}"
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = self.make_key(model, text)
+        vector = self._get_memory(key)
+        if vector is None and self.disk_tier is not None:
+            vector = self._get_disk(key)
+        if vector is None:
+            with self._lock:
+                self.misses += 1
+        return vector
+
+    async def aget(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        get() for the event loop: the memory tier is checked inline, the
+        disk tier (SQLite I/O) in a worker thread.
+        """
+        key = self.make_key(model, text)
+        vector = self._get_memory(key)
+        if vector is None and self.disk_tier is not None:
+            vector = await asyncio.to_thread(self._get_disk, key)
+        if vector is None:
+            with self._lock:
+                self.misses += 1
+        return vector
+
+    def put(self, model: str, text: str, vector: List[float]):
+        key = self.make_key(model, text)
+        self._store(key, vector)
+        if self.disk_tier is not None:
+            self.disk_tier.set(key, vector)
+
+    async def aput(self, model: str, text: str, vector: List[float]):
+        """
+        put() for the event loop; the disk write runs in a worker thread.
+        """
+        key = self.make_key(model, text)
+        self._store(key, vector)
+        if self.disk_tier is not None:
+            await asyncio.to_thread(self.disk_tier.set, key, vector)
+
+    def _get_memory(self, key: str) -> Optional[List[float]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, stored_at = entry
+            if self.ttl_seconds and now - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def _get_disk(self, key: str) -> Optional[List[float]]:
+        vector = self.disk_tier.get(key, max_age=self.ttl_seconds)
+        if vector is not None:
+            self._store(key, vector)
+            with self._lock:
+                self.disk_hits += 1
+        return vector
+
+    def _store(self, key: str, vector: List[float]):
+        with self._lock:
+            self._entries[key] = (vector, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk_tier is not None:
+            self.disk_tier.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves embed_query() from a QueryEmbeddingCache
+    and embed_documents() from a content-addressed document store (if
+    given); only misses reach the wrapped model.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: QueryEmbeddingCache, model_name: str,
+                 document_store=None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+        self.document_store = document_store
+
+    def _stored_documents(self, texts: List[str]):
+        keys = [content_key(self.model_name, t) for t in texts]
+        found = self.document_store.get_many(sorted(set(keys)))
+        missing = sorted({t for t, k in zip(texts, keys) if k not in found})
+        return keys, found, missing
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.document_store is None:
+            return self.embeddings.embed_documents(texts)
+        keys, found, missing = self._stored_documents(texts)
+        if missing:
+            fresh = dict(zip((content_key(self.model_name, t) for t in missing),
+                             self.embeddings.embed_documents(missing)))
+            self.document_store.set_many(fresh)
+            found.update(fresh)
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(self.model_name, text)
+        if vector is None:
+            with stage_timer("embedding"):
+                vector = self.embeddings.embed_query(text)
+            self.cache.put(self.model_name, text, vector)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds many queries: cache hits are served locally and all misses go
+        to the model in a single batched request.
+        """
+        vectors: List[Optional[List[float]]] = [self.cache.get(self.model_name, t) for t in texts]
+        missing = sorted({t for t, v in zip(texts, vectors) if v is None})
+        if missing:
+            with stage_timer("embedding_batch"):
+                try:
+                    # Same task type embed_query() uses, so vectors are interchangeable
+                    fresh = self.embeddings.embed_documents(missing, task_type="RETRIEVAL_QUERY")
+                except TypeError:
+                    fresh = [self.embeddings.embed_query(t) for t in missing]
+            by_text = dict(zip(missing, fresh))
+            for text, vector in by_text.items():
+                self.cache.put(self.model_name, text, vector)
+            vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.document_store is None:
+            return await self.embeddings.aembed_documents(texts)
+        # The document store is SQLite; keep its I/O off the event loop
+        keys, found, missing = await asyncio.to_thread(self._stored_documents, texts)
+        if missing:
+            fresh = dict(zip((content_key(self.model_name, t) for t in missing),
+                             await self.embeddings.aembed_documents(missing)))
+            await asyncio.to_thread(self.document_store.set_many, fresh)
+            found.update(fresh)
+        return [found[k] for k in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = await self.cache.aget(self.model_name, text)
+        if vector is None:
+            with stage_timer("embedding"):
+                vector = await self.embeddings.aembed_query(text)
+            await self.cache.aput(self.model_name, text, vector)
+        return vector
+
+
+# ----------------------------------------------------------------------------
+# Ingest embedding scheduler
+# ----------------------------------------------------------------------------
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursts up to
+    `capacity`. rate <= 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+
+# Errors worth retrying: quota/rate limits, transient 5xx and timeouts.
+# Exception types and status codes are checked first; messages are only a
+# fallback for wrappers that keep nothing but the text, and are matched
+# on whole status codes and phrases ("500" must not match "1500 tokens").
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_STATUS_NAMES = {"RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL"}
+RETRYABLE_MESSAGE_RE = re.compile(
+    r"\b(?:408|429|500|502|503|504)\b"
+    r"|resource[ _]?exhausted|rate[ _]limit|quota exceeded|service unavailable"
+    r"|deadline[ _]exceeded|timed out|\btimeout\b|internal server error",
+    re.IGNORECASE,
+)
+RETRYABLE_GOOGLE_ERRORS = tuple(
+    getattr(google_exceptions, name)
+    for name in ("TooManyRequests", "ResourceExhausted", "ServiceUnavailable",
+                 "InternalServerError", "DeadlineExceeded", "GatewayTimeout")
+    if google_exceptions is not None and hasattr(google_exceptions, name)
+)
+
+
+def _status_of(exc: BaseException):
+    for attr in ("code", "status_code", "status"):
+        value = getattr(exc, attr, None)
+        if callable(value):
+            # grpc errors expose code() -> StatusCode
+            try:
+                value = value()
+            except Exception:
+                value = None
+        if value is not None:
+            return value
+    return None
+
+
+def _is_retryable_status(status) -> bool:
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS_CODES
+    name = getattr(status, "name", status)
+    return isinstance(name, str) and name.upper() in RETRYABLE_STATUS_NAMES
+
+
+def is_retryable_error(exc: Exception) -> bool:
+    """
+    Whether an embedding request that raised `exc` is worth retrying.
+    Follows the exception's cause chain (client wrappers re-raise).
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, (TimeoutError, ConnectionError)):
+            return True
+        if google_exceptions is not None:
+            if isinstance(exc, RETRYABLE_GOOGLE_ERRORS):
+                return True
+            if isinstance(exc, google_exceptions.GoogleAPICallError):
+                return False
+        status = _status_of(exc)
+        if status is not None and _is_retryable_status(status):
+            return True
+        if RETRYABLE_MESSAGE_RE.search(str(exc)):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class EmbeddingScheduler:
+    """
+    Embeds document texts for ingestion: batches of `batch_size`, at most
+    `max_concurrency` requests in flight, each request taking a token from
+    a `requests_per_minute` bucket, and retryable errors (quota, 5xx,
+    timeouts) retried with exponential backoff and jitter.
+
+    With a store (SqliteEmbeddingTier), texts whose key is already stored
+    are not sent at all and every finished batch is written as soon as it
+    returns, so a rerun after an interrupted ingest only embeds what is
+    missing. Texts sharing a key are embedded once.
+    """
+
+    def __init__(self, embeddings: Embeddings, batch_size: int = 64, max_concurrency: int = 4,
+                 requests_per_minute: float = 0, max_retries: int = 6,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0, store=None):
+        self.embeddings = embeddings
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.bucket = TokenBucket(requests_per_minute / 60.0, capacity=self.max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.store = store
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                delay *= 0.5 + random.random() / 2
+                logging.warning(f"Embedding batch failed ({e}); retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed(self, texts: List[str], keys: Optional[List[str]] = None) -> List[List[float]]:
+        """
+        Vectors for `texts`, in order. `keys` (see content_key) identify the
+        texts in the store; without them nothing is stored or reused.
+        """
+        keys = keys or [None] * len(texts)
+        positions: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            positions.setdefault(key if key is not None else f"#{i}", []).append(i)
+
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        if self.store is not None and any(keys):
+            done = self.store.get_many([k for k in positions if not k.startswith("#")])
+            for key, vector in done.items():
+                for i in positions.pop(key):
+                    vectors[i] = vector
+            if done:
+                reused = sum(1 for v in vectors if v is not None)
+                print(f"♻️ {reused} of {len(texts)} embeddings reused from the embedding store.")
+
+        todo = list(positions.items())
+        batches = [todo[start:start + self.batch_size] for start in range(0, len(todo), self.batch_size)]
+
+        def run(batch):
+            fresh = self._embed_batch([texts[indices[0]] for _, indices in batch])
+            if self.store is not None:
+                self.store.set_many({key: v for (key, _), v in zip(batch, fresh) if not key.startswith("#")})
+            return batch, fresh
+
+        with stage_timer("embedding_ingest"), ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            for n, (batch, fresh) in enumerate(pool.map(run, batches), start=1):
+                for (_, indices), vector in zip(batch, fresh):
+                    for i in indices:
+                        vectors[i] = vector
+                if n % 10 == 0 or n == len(batches):
+                    print(f"🧮 Embedded batch {n}/{len(batches)}")
+        return vectors
+
+
+def content_key(model: str, text: str) -> str:
+    """
+    Content address of a document embedding: sha256(model name + text).
+    """
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+_store_lock = threading.Lock()
+_embedding_store = None
+
+
+def get_embedding_store() -> SqliteEmbeddingTier:
+    """
+    Returns the persistent content-addressed document embedding store.
+    """
+    global _embedding_store
+    if _embedding_store is None:
+        with _store_lock:
+            if _embedding_store is None:
+                _embedding_store = SqliteEmbeddingTier(str(settings.EMBEDDING_STORE_PATH), table="document_embeddings")
+    return _embedding_store
+
+
+def get_embedding_scheduler() -> EmbeddingScheduler:
+    """
+    A scheduler over the shared embedding model, configured from settings.
+    """
+    return EmbeddingScheduler(
+        get_embedding_model(),
+        batch_size=settings.EMBED_BATCH_SIZE,
+        max_concurrency=settings.EMBED_MAX_CONCURRENCY,
+        requests_per_minute=settings.EMBED_REQUESTS_PER_MINUTE,
+        max_retries=settings.EMBED_MAX_RETRIES,
+        backoff_base=settings.EMBED_BACKOFF_BASE,
+        backoff_max=settings.EMBED_BACKOFF_MAX,
+        store=get_embedding_store(),
+    )
+
+
+_cache_lock = threading.RLock()
+_query_cache = None
+_embedder = None
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    """
+    Returns the process-wide query-embedding cache.
+    """
+    global _query_cache
+    if _query_cache is None:
+        with _cache_lock:
+            if _query_cache is None:
+                disk_tier = None
+                if settings.QUERY_EMBEDDING_CACHE_PATH:
+                    disk_tier = SqliteEmbeddingTier(settings.QUERY_EMBEDDING_CACHE_PATH)
+                _query_cache = QueryEmbeddingCache(
+                    max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+                    ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL,
+                    disk_tier=disk_tier,
+                )
+    return _query_cache
+
 
 def get_embedder():
     """
-    Loads the Google embedding model.
+    Loads the Google embedding model, wrapped with the query-embedding cache.
     """
-    return get_embedding_model()
+    global _embedder
+    if _embedder is None:
+        with _cache_lock:
+            if _embedder is None:
+                _embedder = CachedQueryEmbeddings(
+                    get_embedding_model(),
+                    get_query_cache(),
+                    settings.GOOGLE_EMBEDDING_MODEL,
+                    document_store=get_embedding_store(),
+                )
+    return _embedder
+
+
+def reset_embedder():
+    """
+    Drops the shared cached-query embedder so the next call rebuilds it
+    around the current embedding model. The query cache is kept; its
+    entries are keyed by model name.
+    """
+    global _embedder
+    with _cache_lock:
+        _embedder = None
 
 
 def embed_text(chunks: list[str]):
     """
-    Embeds a list of text chunks.
+    Embeds a list of text chunks, reusing vectors from the embedding store.
     Returns a list of embedding vectors.
     """
     embedder = get_embedder()
@@ -17,9 +580,26 @@ def embed_text(chunks: list[str]):
     return embeddings
 
 
+def embed_documents_scheduled(texts: List[str]) -> List[List[float]]:
+    """
+    Embeds ingest chunks through the EmbeddingScheduler (batched, rate
+    limited, retried); texts already in the embedding store are not sent.
+    """
+    keys = [content_key(settings.GOOGLE_EMBEDDING_MODEL, t) for t in texts]
+    return get_embedding_scheduler().embed(texts, keys)
+
+
 def embed_query(query: str):
     """
     Embeds a single query (for retrieval at runtime).
     """
     embedder = get_embedder()
     return embedder.embed_query(query)
+
+
+def embed_queries(queries: list[str]):
+    """
+    Embeds several queries with one batched model call for the cache misses.
+    """
+    embedder = get_embedder()
+    return embedder.embed_queries(queries)
@@ -0,0 +1,121 @@
+# backend/app/rag/features.py
+
+"""Query-independent chunk features, computed once at ingest.
+
+The ranking stage of run_rag needs structural signals (numbered entries,
+header lines, digit-heavy rows, table column keywords, date words) that
+depend only on the chunk text. ingest_documents() stores them as flat
+`feat_*` metadata so ranking can read them in O(1) per candidate.
+"""
+
+from typing import Any, Dict, Optional
+
+# Bump when the feature definitions change; chunks with an older version
+# fall back to on-the-fly analysis until the corpus is re-ingested.
+FEATURE_VERSION = 1
+
+STOPWORDS = {"the", "and", "for", "from", "with", "this", "that", "are", "is", "on", "or", "to", "a", "an", "by", "at", "be", "been", "if", "as", "in"}
+
+TABLE_COLUMN_KEYWORDS = ['S.No', 'Date', 'Holiday', 'Month', 'Day', 'Occasion']
+
+DATE_SIGNALS = ['january', 'february', 'march', 'april', 'may', 'june',
+                'july', 'august', 'september', 'october', 'november', 'december',
+                'monday', 'tuesday', 'wednesday', 'thursday', 'friday',
+                'saturday', 'sunday', 'mandate', 'optional']
+
+
+def concept_terms(text: str) -> set:
+    """
+    Meaningful words of a text: alphabetic, longer than 3 chars, not stopwords.
+    """
+    return set(
+        w for w in text.lower().split()
+        if len(w) > 3 and w.isalpha() and w not in STOPWORDS
+    )
+
+
+def analyze_chunk_structure(content: str) -> Dict[str, Any]:
+    """
+    Analyze chunk structure objectively for completeness assessment.
+    NO hardcoding - pure structural analysis.
+    """
+    lines = content.split('\n')
+
+    metrics = {
+        'num_lines': len(lines),
+        'non_empty_lines': 0,
+        'numbered_entries': 0,      # Entries like "1 Item", "2 Item"
+        'table_headers': 0,         # Header-like lines (>50% uppercase)
+        'data_rows': 0,             # Data-bearing lines (many digits)
+        'numeric_lines': 0,         # Lines with any numbers
+        'has_table_columns': False, # S.No, Date, Holiday, etc present
+    }
+
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            continue
+
+        metrics['non_empty_lines'] += 1
+
+        # Numbered entries (1, 2, 3, ...)
+        if stripped[0].isdigit():
+            parts = stripped.split(None, 1)
+            if parts and parts[0].isdigit():
+                metrics['numbered_entries'] += 1
+
+        # Header lines (>50% uppercase)
+        if len(stripped) > 3:
+            upper_ratio = sum(1 for c in stripped if c.isupper()) / len(stripped)
+            if upper_ratio > 0.5:
+                metrics['table_headers'] += 1
+
+        # Numeric content
+        digit_count = sum(1 for c in stripped if c.isdigit())
+        if digit_count > 0:
+            metrics['numeric_lines'] += 1
+            if digit_count > 3:
+                metrics['data_rows'] += 1
+
+    # Check for table structure keywords
+    metrics['has_table_columns'] = any(kw in content for kw in TABLE_COLUMN_KEYWORDS)
+
+    return metrics
+
+
+def compute_chunk_features(content: str) -> Dict[str, Any]:
+    """
+    Full feature set for a chunk, flattened into Chroma-compatible
+    metadata (str/int/bool values only).
+    """
+    analysis = analyze_chunk_structure(content)
+    content_lower = content.lower()
+    return {
+        "feat_version": FEATURE_VERSION,
+        "feat_char_len": len(content),
+        "feat_non_empty_lines": analysis['non_empty_lines'],
+        "feat_numbered_entries": analysis['numbered_entries'],
+        "feat_table_headers": analysis['table_headers'],
+        "feat_data_rows": analysis['data_rows'],
+        "feat_numeric_lines": analysis['numeric_lines'],
+        "feat_has_table_columns": analysis['has_table_columns'],
+        "feat_has_dates": any(signal in content_lower for signal in DATE_SIGNALS),
+        "feat_terms": " ".join(sorted(concept_terms(content))),
+    }
+
+
+def features_from_metadata(meta: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Returns the precomputed features stored on a chunk, or None if the chunk
+    was ingested without them (or with an older FEATURE_VERSION).
+    """
+    if not meta or meta.get("feat_version") != FEATURE_VERSION:
+        return None
+    return meta
+
+
+def get_chunk_features(content: str, meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Precomputed features if present, otherwise computed from the text.
+    """
+    return features_from_metadata(meta) or compute_chunk_features(content)
@@ -1,6 +1,9 @@
 import re
 from typing import List, Tuple, Dict
 
+from ..core.metrics import DEDUPLICATED_CHUNKS
+from .dedup import NearDuplicateFilter
+
 TITLE_KEYWORDS = [
     "holiday calendar", "mandate holidays", "optional holidays",
     "holiday calendar 2025", "holiday calendar 2024", "holiday calendar 2023",
@@ -21,13 +24,6 @@ def _uppercase_ratio(s: str) -> float:
     return up / len(letters)
 
 
-def _normalize_text(s: str) -> str:
-    """
-    Normalize text for duplicate detection: lower, collapse whitespace.
-    """
-    return re.sub(r"\s+", " ", s.strip().lower())
-
-
 def looks_like_title(s: str) -> bool:
     """
     Heuristic to decide if a small piece of text is just a header/title.
@@ -70,10 +66,12 @@ def is_noise_chunk(text: str) -> bool:
     return False
 
 
-def filter_chunks(chunks: List[str], metadatas: List[Dict]) -> Tuple[List[str], List[Dict]]:
+def filter_chunks(chunks: List[str], metadatas: List[Dict],
+                  max_distance: int = 3) -> Tuple[List[str], List[Dict]]:
     """
-    Remove chunks detected as noise and exact-duplicate chunks (normalized).
-    Returns (filtered_chunks, filtered_metadatas).
+    Remove chunks detected as noise and near-duplicates of an earlier chunk
+    (SimHash signatures within `max_distance` bits and the same numbers;
+    see dedup.py). Returns (filtered_chunks, filtered_metadatas).
     
     IMPORTANT: Preserves original chunk_index metadata - does NOT reindex!
     This is crucial for maintaining chunk identity across pipeline.
@@ -82,16 +80,17 @@ def filter_chunks(chunks: List[str], metadatas: List[Dict]) -> Tuple[List[str],
 
     new_chunks = []
     new_metas = []
-    seen = set()
+    seen = NearDuplicateFilter(max_distance)
 
     for chunk, meta in zip(chunks, metadatas):
-        norm = _normalize_text(chunk)
-        if norm in seen:
-            # duplicate content across chunks -> skip
+        match = seen.match(chunk, meta)
+        if match is not None:
+            # near-duplicate of a higher-ranked chunk -> skip
+            DEDUPLICATED_CHUNKS.inc(match=match)
             continue
 
         if not is_noise_chunk(chunk):
-            seen.add(norm)
+            seen.add(chunk, meta)
             meta = dict(meta)  # copy
             meta["filtered"] = False
             # PRESERVE ORIGINAL chunk_index - DO NOT REINDEX
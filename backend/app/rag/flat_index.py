@@ -0,0 +1,229 @@
+# backend/app/rag/flat_index.py
+
+"""Brute-force cosine index over a memory-mapped float32 matrix.
+
+For a corpus of a few thousand chunks one matmul over a contiguous matrix
+beats HNSW + SQLite on both latency and predictability. The index is a
+snapshot of the Chroma collection:
+
+    <dir>/CURRENT                     name of the live snapshot directory
+    <dir>/<snapshot>/embeddings.npy   L2-normalized float32 matrix, one row per chunk
+    <dir>/<snapshot>/metadata.json    {"ids": [...], "texts": [...], "metadatas": [...]}
+
+Each build writes a new snapshot directory and then replaces CURRENT, so
+a reader always pairs vectors and metadata from the same build. Chroma
+stays the source of truth; rebuild_flat_index() in vectorstore.py
+re-exports the snapshot after ingestion.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+CURRENT_FILE = "CURRENT"
+SNAPSHOT_PREFIX = "snapshot-"
+
+
+def current_snapshot(directory: Path) -> Optional[str]:
+    """
+    Name of the snapshot directory CURRENT points at, or None.
+    """
+    try:
+        return (Path(directory) / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def metadata_matches(meta: Optional[Dict[str, Any]], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluates the subset of Chroma's `where` syntax the retrievers use:
+    {"key": value} for equality and {"key": {"$in": [...]}} for membership.
+    """
+    if not where:
+        return True
+    meta = meta or {}
+    for key, condition in where.items():
+        value = meta.get(key)
+        if isinstance(condition, dict):
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class FlatVectorIndex:
+    """
+    Read-only view over an on-disk flat index.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.matrix = np.load(self.directory / EMBEDDINGS_FILE, mmap_mode="r")
+        with open(self.directory / METADATA_FILE, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        self.ids: List[str] = sidecar["ids"]
+        self.texts: List[str] = sidecar["texts"]
+        self.metadatas: List[Dict[str, Any]] = sidecar["metadatas"]
+        if len(self.ids) and self.matrix.shape[0] != len(self.ids):
+            raise ValueError(f"Flat index at {self.directory} is inconsistent")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def build(directory: Path, ids: List[str], texts: List[str],
+              metadatas: List[Dict[str, Any]], embeddings) -> "FlatVectorIndex":
+        """
+        Writes a new snapshot directory and points CURRENT at it with
+        os.replace, so readers never see a half-written index or vectors
+        from one build with metadata from another. Snapshots older than the
+        previous one are deleted.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if not ids:
+            # Empty corpus: reshape(0, -1) cannot infer a width
+            matrix = np.zeros((0, matrix.shape[1] if matrix.ndim == 2 else 0), dtype=np.float32)
+        elif matrix.ndim != 2:
+            matrix = matrix.reshape(len(ids), -1)
+        matrix = np.ascontiguousarray(_normalize_rows(matrix))
+
+        # Nothing reads the new directory until CURRENT names it
+        snapshot = f"{SNAPSHOT_PREFIX}{time.time_ns()}-{os.getpid()}"
+        target = directory / snapshot
+        target.mkdir()
+        with open(target / EMBEDDINGS_FILE, "wb") as f:
+            np.save(f, matrix)
+        with open(target / METADATA_FILE, "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "texts": texts, "metadatas": metadatas}, f)
+
+        previous = current_snapshot(directory)
+        tmp = directory / f".{CURRENT_FILE}.{os.getpid()}.tmp"
+        tmp.write_text(snapshot, encoding="utf-8")
+        os.replace(tmp, directory / CURRENT_FILE)
+
+        # The previous snapshot stays for readers that resolved CURRENT just
+        # before the switch; older ones are only open in readers that already
+        # mapped them, which unlinking does not disturb
+        for entry in directory.iterdir():
+            if entry.name.startswith(SNAPSHOT_PREFIX) and entry.name not in (snapshot, previous):
+                shutil.rmtree(entry, ignore_errors=True)
+        return FlatVectorIndex(target)
+
+    @staticmethod
+    def exists(directory: Path) -> bool:
+        snapshot = current_snapshot(directory)
+        if snapshot is None:
+            return False
+        target = Path(directory) / snapshot
+        return (target / EMBEDDINGS_FILE).exists() and (target / METADATA_FILE).exists()
+
+    def search(self, query_embedding: List[float], k: int,
+               where: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        """
+        Returns [(row, cosine_similarity), ...] for the top-k rows, best first.
+        `where` is an optional Chroma-style metadata filter (see
+        metadata_matches).
+        """
+        if not len(self) or k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        scores = self.matrix @ query  # one vectorized pass over every chunk
+
+        if where:
+            mask = np.fromiter((metadata_matches(meta, where) for meta in self.metadatas),
+                               dtype=bool, count=len(self.metadatas))
+            scores = np.where(mask, scores, -np.inf)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def document(self, row: int, score: Optional[float] = None) -> Document:
+        metadata = dict(self.metadatas[row] or {})
+        if score is not None:
+            metadata["score"] = score
+        return Document(page_content=self.texts[row], metadata=metadata, id=self.ids[row])
+
+
+_index_lock = threading.Lock()
+_loaded: Dict[str, Tuple[str, FlatVectorIndex]] = {}
+
+
+def load_flat_index(directory: Path) -> Optional[FlatVectorIndex]:
+    """
+    Returns the pooled index for `directory`, reloading it when CURRENT
+    points at a newer snapshot than the loaded one. None if no snapshot
+    exists.
+    """
+    directory = Path(directory)
+    snapshot = current_snapshot(directory)
+    if snapshot is None:
+        return None
+    key = str(directory)
+    cached = _loaded.get(key)
+    if cached is not None and cached[0] == snapshot:
+        return cached[1]
+    with _index_lock:
+        cached = _loaded.get(key)
+        if cached is None or cached[0] != snapshot:
+            try:
+                cached = (snapshot, FlatVectorIndex(directory / snapshot))
+            except (FileNotFoundError, ValueError):
+                # Snapshot pruned by two quick rebuilds; keep serving the old one
+                return cached[1] if cached is not None else None
+            _loaded[key] = cached
+            # Forget snapshots of retired collections whose files were deleted
+            for other in [k for k in _loaded if not FlatVectorIndex.exists(Path(k))]:
+                del _loaded[other]
+        return cached[1]
+
+
+class FlatIndexRetriever(BaseRetriever):
+    """
+    LangChain retriever over a FlatVectorIndex; returns the same Document
+    objects (page_content + Chroma metadata) as the Chroma retriever.
+    """
+
+    index: Any
+    embeddings: Any
+    k: int = 4
+    where: Optional[Dict[str, Any]] = None
+
+    def _search(self, query_embedding: List[float]) -> List[Document]:
+        hits = self.index.search(query_embedding, self.k, where=self.where)
+        return [self.index.document(row, score) for row, score in hits]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self._search(self.embeddings.embed_query(query))
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        return self._search(await self.embeddings.aembed_query(query))
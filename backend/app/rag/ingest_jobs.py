@@ -0,0 +1,180 @@
+# backend/app/rag/ingest_jobs.py
+
+"""Background ingestion jobs.
+
+POST /api/ingest submits a job and returns its id at once. One daemon
+worker thread runs jobs in submission order, so concurrent submissions
+never ingest at the same time. Parsing runs in worker processes and
+embedding is network-bound, so the event loop and the chat threadpool keep
+serving while a job runs. Job state lives in memory; the last
+INGEST_JOB_HISTORY jobs are kept for the status endpoints.
+"""
+
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from ..core.config import settings
+from ..core.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class IngestJob:
+    """
+    State of one ingestion run, updated by the pipeline's on_progress
+    callback and read by the status endpoint.
+    """
+
+    def __init__(self, kind: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = "queued"  # queued -> running -> succeeded | failed
+        self.submitted_at = _now_iso()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.progress: Dict[str, Any] = {"stage": "queued"}
+        self._started = None
+        self._finished = None
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            self.progress.update(fields)
+
+    def _mark(self, status: str, **attrs):
+        with self._lock:
+            self.status = status
+            for key, value in attrs.items():
+                setattr(self, key, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            progress = dict(self.progress)
+            elapsed = None
+            if self._started is not None:
+                elapsed = (self._finished or time.monotonic()) - self._started
+            chunks = progress.get("chunks_created", 0)
+            throughput = round(chunks / elapsed, 2) if elapsed else None
+
+            eta = None
+            bytes_total, bytes_done = progress.get("bytes_total"), progress.get("bytes_done")
+            if self.status == "running" and elapsed and bytes_total and bytes_done:
+                eta = round(elapsed * (bytes_total - bytes_done) / bytes_done, 1)
+
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "params": self.params,
+                "status": self.status,
+                "stage": progress.pop("stage", None),
+                "progress": progress,
+                "elapsed_seconds": round(elapsed, 1) if elapsed is not None else None,
+                "chunks_per_second": throughput,
+                "eta_seconds": eta,
+                "submitted_at": self.submitted_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+class IngestJobRunner:
+    """
+    FIFO queue of ingestion jobs drained by a single worker thread.
+    """
+
+    def __init__(self, history: int = 50):
+        self.history = history
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._pending: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    def submit(self, kind: str, func: Callable[..., Dict[str, Any]], **params) -> IngestJob:
+        """
+        Queues `func(on_progress=..., **params)` and returns its job.
+        """
+        job = IngestJob(kind, params)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.status in ("queued", "running"):
+                    break
+                self._jobs.popitem(last=False)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="ingest-jobs", daemon=True)
+                self._worker.start()
+        self._pending.put((job, func))
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def queue_position(self, job: IngestJob) -> int:
+        """
+        Jobs ahead of `job` (queued or running); 0 once it has started.
+        """
+        if job.status != "queued":
+            return 0
+        with self._lock:
+            ahead = 0
+            for other in self._jobs.values():
+                if other is job:
+                    break
+                if other.status in ("queued", "running"):
+                    ahead += 1
+            return ahead
+
+    def _run(self):
+        while True:
+            job, func = self._pending.get()
+            job._started = time.monotonic()
+            job._mark("running", started_at=_now_iso())
+            job.update(stage="starting")
+            try:
+                with stage_timer(f"{job.kind}_job"):
+                    result = func(on_progress=job.update, **job.params)
+                job._finished = time.monotonic()
+                job.update(stage="done")
+                job._mark("succeeded", result=result, finished_at=_now_iso())
+            except Exception as e:
+                logger.exception("Ingest job %s failed", job.id)
+                job._finished = time.monotonic()
+                job.update(stage="failed")
+                job._mark("failed", error=str(e), finished_at=_now_iso())
+
+
+_runner_lock = threading.Lock()
+_runner: Optional[IngestJobRunner] = None
+
+
+def get_job_runner() -> IngestJobRunner:
+    """
+    Returns the process-wide ingest job runner.
+    """
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = IngestJobRunner(history=settings.INGEST_JOB_HISTORY)
+    return _runner
@@ -1,40 +1,414 @@
 # backend/app/rag/ingest_pipeline.py
 
-from .loader import load_all_pdfs
+"""Streaming ingestion.
+
+    page batches -> chunks -> embedding batches -> upsert
+
+Each arrow is a generator; parsing and embedding run in their own threads
+behind bounded queues, so memory holds at most a few batches regardless of
+corpus size. A file's catalog entry is saved as soon as its last chunk is
+in Chroma, so an interrupted run resumes with the files it had finished.
+
+Full rebuilds write into a new versioned collection and switch queries to
+it only when it is complete (see promote_collection in vectorstore.py), so
+chat keeps answering from the previous corpus for the whole rebuild.
+"""
+
+import os
+import queue
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .loader import iter_page_batches, list_pdf_files
 from .splitter import split_text
-from .vectorstore import add_to_chroma, clear_collection
+from .features import compute_chunk_features
+from .dedup import CLUSTER_KEY, NUMBERS_KEY, SIMHASH_KEY, SimHashIndex, number_fingerprint, signature_hex
+from .catalog import (
+    diff_catalog, file_content_hash, load_catalog, make_catalog_entry, make_chunk_id, save_catalog,
+)
+from ..core.config import settings
+from .vectorstore import (
+    collect_retired_collections, count_chunks, create_staging_collection, delete_chunks,
+    delete_orphan_chunks, get_chunk_clusters, get_chunk_ids, get_collection_name, promote_collection,
+    rebuild_flat_index, rebuild_bm25_index, update_chunk_positions, upsert_chunks,
+)
+from .answer_cache import invalidate_answer_cache
+from .embedder import content_key, get_embedding_scheduler
 
-def ingest_documents():
-    print("📥 Starting ingestion pipeline...")
-    
-    # Clear existing collection to prevent duplicates
-    clear_collection()
-
-    docs = load_all_pdfs()
-    if not docs:
-        return {"status": "no documents found"}
-
-    all_chunks = []
-    all_metadata = []
-
-    for doc in docs:
-        chunks = split_text(doc["content"])
-        for chunk in chunks:
-            all_chunks.append(chunk)
-            # Add metadata
+
+def _chunk_pages(filename: str, pages: List[Tuple[str, int]], chunk_index: int,
+                 occurrences: Dict[str, int]) -> Iterator[Tuple[str, str, dict]]:
+    for page_text, page_no in pages:
+        for chunk in split_text(page_text):
+            # Add metadata (keys match what run_rag reads) plus the
+            # query-independent ranking features
             meta = {
-                "source": doc["source"],
-                "page": doc["page"]
+                "source_file": filename,
+                "page_no": page_no,
+                "chunk_index": chunk_index,
             }
-            all_metadata.append(meta)
+            meta.update(compute_chunk_features(chunk))
+            meta[SIMHASH_KEY] = signature_hex(chunk)
+            meta[NUMBERS_KEY] = number_fingerprint(chunk)
+            occurrence = occurrences.get(chunk, 0)
+            occurrences[chunk] = occurrence + 1
+            yield make_chunk_id(filename, chunk, occurrence), chunk, meta
+            chunk_index += 1
+
+
+# ----------------------------------------------------------------------------
+# Pipeline stages
+# ----------------------------------------------------------------------------
+_END = object()
+
+
+class _StageError:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def threaded(iterable: Iterable, maxsize: int) -> Iterator:
+    """
+    Runs `iterable` in a daemon thread that works ahead of the consumer by
+    at most `maxsize` items. Exceptions are re-raised in the consumer; if
+    the consumer stops early the producer stops too.
+    """
+    items: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_END)
+        except BaseException as e:
+            put(_StageError(e))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                return
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+
+
+def chunk_stage(page_batches: Iterable) -> Iterator[tuple]:
+    """
+    Page batches -> ("chunk", filename, chunk_id, text, meta) records,
+    with ("end", filename, page_count, parse_seconds) after each file.
+    """
+    chunk_index = page_count = 0
+    occurrences: Dict[str, int] = {}
+    for filename, pages, parse_seconds in page_batches:
+        for chunk_id, text, meta in _chunk_pages(filename, pages, chunk_index, occurrences):
+            yield "chunk", filename, chunk_id, text, meta
+            chunk_index += 1
+        page_count += len(pages)
+        if parse_seconds is not None:
+            yield "end", filename, page_count, parse_seconds
+            chunk_index = page_count = 0
+            occurrences = {}
+
+
+def batch_stage(records: Iterable[tuple], batch_size: int) -> Iterator[tuple]:
+    """
+    Groups chunk records into ("batch", [records]) of `batch_size`. A file's
+    "end" record is released right after the batch holding its last chunk.
+    """
+    batch, ends = [], []
+    for record in records:
+        if record[0] == "end":
+            if batch:
+                ends.append(record)
+            else:
+                yield record
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield "batch", batch
+            yield from ends
+            batch, ends = [], []
+    if batch:
+        yield "batch", batch
+    yield from ends
+
+
+def embed_stage(items: Iterable[tuple], existing: Dict[str, set]) -> Iterator[tuple]:
+    """
+    Embeds each batch's chunks that are not already stored in Chroma under
+    the same id; yields ("batch", records, vectors) with None for skipped
+    chunks. "end" records pass through.
+    """
+    scheduler = get_embedding_scheduler()
+    model = settings.GOOGLE_EMBEDDING_MODEL
+    for item in items:
+        if item[0] != "batch":
+            yield item
+            continue
+        records = item[1]
+        todo = [i for i, r in enumerate(records) if r[2] not in existing.get(r[1], ())]
+        vectors = [None] * len(records)
+        if todo:
+            texts = [records[i][3] for i in todo]
+            for i, vector in zip(todo, scheduler.embed(texts, [content_key(model, t) for t in texts])):
+                vectors[i] = vector
+        yield "batch", records, vectors
+
+
+def _no_progress(**fields):
+    pass
+
+
+def _no_save(catalog: Dict[str, Dict]):
+    pass
+
+
+def ingest_documents(full: bool = False, on_progress: Optional[Callable[..., None]] = None):
+    """
+    Brings the collection in line with RAW_DOCS_DIR. Files whose content
+    hash matches the catalog are skipped; added and changed files stream
+    through parse -> chunk -> embed -> upsert (chunks whose id already
+    exists are not re-embedded); chunks of removed files and stale chunks of
+    changed files are deleted. `full=True`, or a missing/inconsistent
+    catalog, re-ingests everything into a new collection that replaces the
+    current one once complete.
+
+    `on_progress(**fields)` is called as work advances (stage, files and
+    bytes total/done, chunks created/embedded); see ingest_jobs.py.
+    """
+    progress = on_progress or _no_progress
+    print("📥 Starting ingestion pipeline...")
+    progress(stage="scanning")
+    collect_retired_collections()
+
+    catalog = load_catalog()
+    target = None
+    if full or catalog is None or not _catalog_matches_collection(catalog):
+        print("🔄 Full re-ingestion; queries keep using the current collection until it is done.")
+        target = create_staging_collection()
+        catalog, mode = {}, "full"
+    else:
+        mode = "incremental"
+
+    files = list_pdf_files()
+    hashes = {f: file_content_hash(settings.RAW_DOCS_DIR / f) for f in files}
+
+    added, changed, removed, unchanged = diff_catalog(catalog, hashes)
+
+    if not added and not changed and not removed:
+        if not files:
+            if target is not None:
+                _refresh_indexes(target)
+                promote_collection(target)
+                invalidate_answer_cache()
+            save_catalog({})
+            return {"status": "no documents found", "mode": mode}
+        print(f"✅ All {len(files)} documents unchanged; nothing to ingest.")
+        return _report("unchanged", mode, added, changed, removed, unchanged, 0, 0, 0, {})
+
+    new_catalog = {f: catalog[f] for f in unchanged}
+    # A full rebuild's catalog describes the new collection, so it is only
+    # saved once queries have switched to it
+    save = save_catalog if target is None else _no_save
+    chunks_deleted = 0
+    for filename in removed:
+        chunks_deleted += delete_chunks(get_chunk_ids(filename))
+    save(new_catalog)
+
+    # Chunks already in Chroma for the files being (re)ingested: from the
+    # old version of a changed file, or from an interrupted earlier run
+    to_ingest = added + changed
+    existing = {f: set(get_chunk_ids(f)) for f in to_ingest} if mode == "incremental" else {}
+    counts = _stream_files(to_ingest, hashes, existing, new_catalog, mode, progress, target, save)
+    chunks_deleted += counts["chunks_deleted"]
+
+    progress(stage="indexing")
+    chunks_deleted += delete_orphan_chunks(files, target)
+    # A full rebuild writes the new collection's own BM25/flat index files,
+    # which the pointer switch makes current together with the collection
+    _refresh_indexes(target)
+    if target is not None:
+        promote_collection(target)
+        save_catalog(new_catalog)
+    # Answers cached against the previous corpus are now stale
+    invalidate_answer_cache()
+
+    return _report("success", mode, added, changed, removed, unchanged, counts["chunks_created"],
+                   counts["chunks_embedded"], chunks_deleted, counts["parse_seconds"],
+                   counts["near_duplicates"])
+
+
+def ingest_document(filename: str, on_progress: Optional[Callable[..., None]] = None):
+    """
+    Ingests one PDF already in RAW_DOCS_DIR (see ingest_upload) without
+    touching the rest of the collection. When
+    it replaces an earlier version, only that document's stale chunks are
+    deleted, and chunks whose text is unchanged keep their ids and
+    embeddings.
+    """
+    progress = on_progress or _no_progress
+    print(f"📥 Ingesting uploaded document {filename}...")
+    progress(stage="scanning", current_file=filename)
+
+    catalog = load_catalog()
+    if catalog is None or not _catalog_matches_collection(catalog):
+        # Corpus ingested before catalogs existed, or out of sync with the
+        # collection: a one-file catalog would make the next incremental
+        # run treat every other document as new (or drop it). Rebuild
+        # everything, this document included, instead.
+        print("🔄 Catalog does not describe the collection; running a full ingest instead.")
+        return ingest_documents(full=True, on_progress=on_progress)
+
+    catalog = dict(catalog)
+    content_hash = file_content_hash(settings.RAW_DOCS_DIR / filename)
+    previous = catalog.get(filename)
+    if previous is not None and previous.get("content_hash") == content_hash:
+        print(f"✅ {filename} unchanged; nothing to ingest.")
+        return _report("unchanged", "document", [], [], [], [filename], 0, 0, 0, {})
+
+    existing = {filename: set(get_chunk_ids(filename))}
+    counts = _stream_files([filename], {filename: content_hash}, existing, catalog, "document", progress)
+
+    progress(stage="indexing")
+    _refresh_indexes()
+    invalidate_answer_cache()
+
+    added, changed = ([], [filename]) if previous is not None else ([filename], [])
+    return _report("success", "document", added, changed, [], [], counts["chunks_created"],
+                   counts["chunks_embedded"], counts["chunks_deleted"], counts["parse_seconds"],
+                   counts["near_duplicates"])
+
+
+def ingest_upload(upload_path: str, filename: str, on_progress: Optional[Callable[..., None]] = None):
+    """
+    Moves a staged upload into RAW_DOCS_DIR as `filename` and ingests it.
+    Runs as a queued ingest job, so the file is never swapped under an
+    ingest that is still parsing the previous version.
+    """
+    try:
+        os.makedirs(settings.RAW_DOCS_DIR, exist_ok=True)
+        os.replace(upload_path, settings.RAW_DOCS_DIR / filename)
+    finally:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+    return ingest_document(filename, on_progress=on_progress)
+
+
+def _stream_files(to_ingest: List[str], hashes: Dict[str, str], existing: Dict[str, set],
+                  catalog: Dict[str, Dict], mode: str, progress: Callable[..., None],
+                  collection_name: Optional[str] = None,
+                  save: Callable[[Dict[str, Dict]], None] = save_catalog) -> Dict:
+    """
+    Streams `to_ingest` through parse -> chunk -> embed -> upsert into
+    `collection_name` (default: current). As each file completes, its
+    chunks not re-emitted this run are deleted and its entry is added to
+    `catalog` and passed to `save`.
+    """
+    sizes = {f: os.path.getsize(settings.RAW_DOCS_DIR / f) for f in to_ingest}
+    files_done = bytes_done = 0
+    progress(stage="ingesting", mode=mode, files_total=len(to_ingest), bytes_total=sum(sizes.values()),
+             files_done=0, bytes_done=0, chunks_created=0, chunks_embedded=0)
+
+    chunks_created = chunks_embedded = chunks_deleted = near_duplicates = 0
+    # Near-duplicate clusters continue those of the chunks already stored
+    clusters = SimHashIndex.from_clusters(settings.NEAR_DUPLICATE_DISTANCE, get_chunk_clusters(collection_name))
+    file_ids: Dict[str, List[str]] = {}
+    parse_seconds: Dict[str, float] = {}
+    queue_size = max(1, settings.INGEST_QUEUE_SIZE)
+    batch_size = max(1, settings.EMBED_BATCH_SIZE) * max(1, settings.EMBED_MAX_CONCURRENCY)
+
+    pages = threaded(iter_page_batches(to_ingest), queue_size)
+    batches = batch_stage(chunk_stage(pages), batch_size)
+    for item in threaded(embed_stage(batches, existing), queue_size):
+        if item[0] == "batch":
+            _, records, vectors = item
+            fresh = [(r, v) for r, v in zip(records, vectors) if v is not None]
+            for r, _ in fresh:
+                r[4][CLUSTER_KEY], is_duplicate = clusters.assign(r[4][SIMHASH_KEY], r[4][NUMBERS_KEY])
+                near_duplicates += is_duplicate
+            if fresh:
+                upsert_chunks(
+                    [r[2] for r, _ in fresh], [r[3] for r, _ in fresh],
+                    [r[4] for r, _ in fresh], [v for _, v in fresh], collection_name,
+                )
+            kept = [r for r, v in zip(records, vectors) if v is None]
+            update_chunk_positions([r[2] for r in kept], [r[4] for r in kept], collection_name)
+            for r in records:
+                file_ids.setdefault(r[1], []).append(r[2])
+            chunks_created += len(records)
+            chunks_embedded += len(fresh)
+            print(f"✅ Stored batch of {len(records)} chunks ({chunks_created} so far).")
+            progress(chunks_created=chunks_created, chunks_embedded=chunks_embedded)
+            continue
+
+        # A file is complete: drop its stale chunks and record it in the catalog
+        _, filename, page_count, seconds = item
+        ids = file_ids.pop(filename, [])
+        chunks_deleted += delete_chunks(sorted(existing.pop(filename, set()) - set(ids)), collection_name)
+        parse_seconds[filename] = seconds
+        catalog[filename] = make_catalog_entry(
+            filename, hashes[filename], page_count=page_count, chunk_count=len(ids),
+        )
+        save(catalog)
+        print(f"📄 {filename}: {len(ids)} chunks")
+        files_done += 1
+        bytes_done += sizes[filename]
+        progress(files_done=files_done, bytes_done=bytes_done, current_file=filename)
+
+    return {
+        "chunks_created": chunks_created,
+        "chunks_embedded": chunks_embedded,
+        "chunks_deleted": chunks_deleted,
+        "near_duplicates": near_duplicates,
+        "parse_seconds": parse_seconds,
+    }
+
+
+def _refresh_indexes(collection_name: Optional[str] = None):
+    rebuild_bm25_index(collection_name)
+    if settings.RETRIEVAL_BACKEND == "flat":
+        rebuild_flat_index(collection_name)
+
+
+def _catalog_matches_collection(catalog: Dict[str, Dict]) -> bool:
+    # A catalog that disagrees with the collection (older ingest, manual
+    # deletes) cannot be trusted for diffing. Chunks of files missing from
+    # the catalog are fine: they are left over from an interrupted run and
+    # get reconciled when those files are ingested.
+    expected = sum(e.get("chunk_count", 0) for e in catalog.values())
+    return count_chunks(list(catalog)) == expected
 
-    if not all_chunks:
-        return {"status": "no chunks generated"}
 
-    add_to_chroma(all_chunks, all_metadata)
-    
+def _report(status: str, mode: str, added: List[str], changed: List[str], removed: List[str],
+            unchanged: List[str], chunks_created: int, chunks_embedded: int, chunks_deleted: int,
+            parse_seconds: Dict[str, float], near_duplicates: int = 0) -> Dict:
     return {
-        "status": "success", 
-        "documents_processed": len(docs),
-        "chunks_created": len(all_chunks)
+        "status": status,
+        "mode": mode,
+        "collection": get_collection_name(),
+        "documents_processed": len(added) + len(changed),
+        "chunks_created": chunks_created,
+        "chunks_embedded": chunks_embedded,
+        "chunks_deleted": chunks_deleted,
+        "near_duplicates": near_duplicates,
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "unchanged": unchanged,
+        "parse_seconds": parse_seconds,
     }
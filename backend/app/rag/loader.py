@@ -1,6 +1,10 @@
 # backend/app/rag/loader.py
+import multiprocessing
 import os
-from typing import List, Dict, Tuple
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from pypdf import PdfReader
 from ..core.config import settings
 
@@ -25,19 +29,127 @@ def load_pdf_pages(file_path: str) -> List[Tuple[str, int]]:
     return pages
 
 
-def load_all_pdfs() -> List[Dict]:
+def list_pdf_files() -> List[str]:
     """
-    Load all PDFs in RAW_DOCS_DIR and return a list of documents,
-    each as: {"filename": <str>, "pages": [(text, page_no), ...]}
+    Filenames of the PDFs in RAW_DOCS_DIR, sorted.
+    """
+    return sorted(f for f in os.listdir(settings.RAW_DOCS_DIR) if f.lower().endswith(".pdf"))
+
+
+def load_pdf(filename: str) -> Dict:
+    """
+    Load one PDF from RAW_DOCS_DIR as {"filename": <str>, "pages": [(text, page_no), ...]}.
+    """
+    print(f"📄 Loading PDF: {filename}")
+    return {"filename": filename, "pages": load_pdf_pages(os.path.join(settings.RAW_DOCS_DIR, filename))}
+
+
+def _extract_page_range(path: str, start: int, limit: Optional[int]
+                        ) -> Tuple[List[Tuple[str, int]], float, int]:
+    """
+    Process-pool task: text of up to `limit` pages from `start` (all
+    remaining pages if None) as (page_text, page_no), the seconds spent
+    parsing, and the file's page count.
+    """
+    started = time.perf_counter()
+    reader = PdfReader(path)
+    count = len(reader.pages)
+    end = count if limit is None else min(start + limit, count)
+    pages = [((reader.pages[i].extract_text() or "").strip(), i + 1) for i in range(start, end)]
+    return pages, time.perf_counter() - started, count
+
+
+def iter_page_batches(filenames: Iterable[str], workers: Optional[int] = None
+                       ) -> Iterator[Tuple[str, List[Tuple[str, int]], Optional[float]]]:
+    """
+    Parses `filenames` in page-range tasks and yields
+    (filename, [(page_text, page_no), ...], parse_seconds) in file order,
+    then page order. parse_seconds is set on a file's last batch only.
     """
-    docs_dir = settings.RAW_DOCS_DIR
-    pdf_files = [f for f in os.listdir(docs_dir) if f.lower().endswith(".pdf")]
+    workers = workers if workers is not None else settings.INGEST_WORKERS
+    workers = workers or os.cpu_count() or 1
+    per_task = max(1, settings.INGEST_PAGES_PER_TASK)
+    timings: Dict[str, float] = {}
+
+    def finish(filename: str, last: bool, pages: List[Tuple[str, int]], seconds: float):
+        timings[filename] = timings.get(filename, 0.0) + seconds
+        if not last:
+            return filename, pages, None
+        print(f"📄 Parsed PDF: {filename} in {timings[filename]:.2f}s")
+        return filename, pages, round(timings[filename], 3)
+
+    if workers == 1:
+        for filename in filenames:
+            pages, seconds, _ = _extract_page_range(os.path.join(settings.RAW_DOCS_DIR, filename), 0, None)
+            yield finish(filename, True, pages, seconds)
+        return
 
-    all_docs = []
-    for pdf in pdf_files:
-        path = os.path.join(docs_dir, pdf)
-        print(f"📄 Loading PDF: {pdf}")
-        pages = load_pdf_pages(path)
-        all_docs.append({"filename": pdf, "pages": pages})
+    # Each file's first task also counts its pages, so the parent never
+    # opens a PDF. Files longer than INGEST_PAGES_PER_TASK then get their
+    # remaining ranges queued right behind the first one, spreading their
+    # pages across workers. Results are consumed in order and at most
+    # workers * 4 tasks are in flight, which keeps memory flat for large
+    # corpora. Workers are spawned, not forked: ingestion runs on a thread
+    # of a multi-threaded server, and a forked child can inherit held locks.
+    files = iter(filenames)
+    window = workers * 4
+    pending = deque()  # [filename, path, start, future or None] in yield order
 
-    return all_docs
+    def top_up(pool):
+        in_flight = 0
+        for entry in pending:
+            if in_flight >= window:
+                return
+            if entry[3] is None:
+                entry[3] = pool.submit(_extract_page_range, entry[1], entry[2], per_task)
+            in_flight += 1
+        for filename in files:
+            path = os.path.join(settings.RAW_DOCS_DIR, filename)
+            pending.append([filename, path, 0, pool.submit(_extract_page_range, path, 0, per_task)])
+            in_flight += 1
+            if in_flight >= window:
+                return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        while True:
+            top_up(pool)
+            if not pending:
+                return
+            filename, path, start, future = pending.popleft()
+            pages, seconds, count = future.result()
+            if start == 0 and count > per_task:
+                pending.extendleft([filename, path, range_start, None]
+                                   for range_start in reversed(range(per_task, count, per_task)))
+            yield finish(filename, start + per_task >= count, pages, seconds)
+
+
+def iter_pdf_pages(filenames: Iterable[str], workers: Optional[int] = None) -> Iterator[Tuple[str, int, str]]:
+    """
+    Parses PDFs from RAW_DOCS_DIR on a process pool of `workers` (default
+    INGEST_WORKERS; 0 = one per CPU, 1 = in-process) and streams
+    (source, page_no, text) records in file order, then page order.
+    """
+    for filename, pages, _ in iter_page_batches(filenames, workers):
+        for page_text, page_no in pages:
+            yield filename, page_no, page_text
+
+
+def load_pdfs(filenames: Iterable[str], workers: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Parallel load_pdf over many files: yields
+    {"filename", "pages": [(text, page_no), ...], "parse_seconds"} in order.
+    """
+    pages: List[Tuple[str, int]] = []
+    for filename, batch, parse_seconds in iter_page_batches(filenames, workers):
+        pages.extend(batch)
+        if parse_seconds is not None:
+            yield {"filename": filename, "pages": pages, "parse_seconds": parse_seconds}
+            pages = []
+
+
+def load_all_pdfs() -> List[Dict]:
+    """
+    Load all PDFs in RAW_DOCS_DIR and return a list of documents,
+    each as: {"filename": <str>, "pages": [(text, page_no), ...], "parse_seconds": <float>}
+    """
+    return list(load_pdfs(list_pdf_files()))
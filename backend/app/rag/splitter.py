@@ -1,23 +1,134 @@
+"""Chunking of page text.
+
+SPLITTER=native (default) uses split_spans(): the same chunk boundaries as
+LangChain's RecursiveCharacterTextSplitter with our settings, computed as
+(start, end) offsets into the page. With the separators kept at the start
+of each piece, every LangChain chunk is a contiguous slice of the input
+(stripped), so the recursion and merging can work on offsets alone and
+only the final chunks are sliced out. SPLITTER=langchain uses the LangChain
+splitter itself. benchmark_splitter.py checks that both agree.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from typing import List, Tuple
+
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from ..core.config import settings
 
+# Prioritize larger breaks to preserve table structure
+SEPARATORS = ["\n\n\n", "\n\n", "\n", ". ", " ", ""]
+
+Span = Tuple[int, int]
+
+_splitter_lock = threading.Lock()
+_splitter = None
+
+
 def get_text_splitter():
     """
     Returns a text splitter that breaks long text into
     overlapping chunks suitable for embedding.
     """
-    return RecursiveCharacterTextSplitter(
-        chunk_size=settings.CHUNK_SIZE,
-        chunk_overlap=settings.CHUNK_OVERLAP,
-        # Prioritize larger breaks to preserve table structure
-        separators=["\n\n\n", "\n\n", "\n", ". ", " ", ""]
-    )
+    global _splitter
+    if _splitter is None:
+        with _splitter_lock:
+            if _splitter is None:
+                _splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=settings.CHUNK_SIZE,
+                    chunk_overlap=settings.CHUNK_OVERLAP,
+                    separators=SEPARATORS,
+                )
+    return _splitter
+
+
+def _boundaries(text: str, start: int, end: int, separator: str) -> List[int]:
+    # Offsets b such that the pieces are text[b[j]:b[j + 1]]: re.split on
+    # the separator with each match kept at the start of the piece that
+    # follows it, empty pieces dropped
+    if not separator:
+        return list(range(start, end + 1))
+    bounds = [start]
+    find, step = text.find, len(separator)
+    pos = find(separator, start, end)
+    while pos != -1:
+        if pos > bounds[-1]:
+            bounds.append(pos)
+        pos = find(separator, pos + step, end)
+    if end > bounds[-1]:
+        bounds.append(end)
+    return bounds
+
+
+def _merge(text: str, bounds: List[int], lo: int, hi: int, chunk_size: int, chunk_overlap: int,
+           out: List[Span]):
+    # Greedy merge of pieces lo..hi-1 into chunks of at most chunk_size,
+    # each starting with up to chunk_overlap of the previous one. Pieces
+    # are contiguous, so a run of them spans bounds[first]..bounds[cut] and
+    # both the cut and the overlap start are found by bisection.
+    first = lo
+    while True:
+        cut = bisect_right(bounds, bounds[first] + chunk_size, first + 2, hi + 1) - 1
+        if cut >= hi:
+            break
+        _emit(text, bounds[first], bounds[cut], out)
+        keep_from = max(bounds[cut] - chunk_overlap, bounds[cut + 1] - chunk_size)
+        first = bisect_left(bounds, keep_from, first, cut)
+    _emit(text, bounds[first], bounds[hi], out)
+
+
+def _emit(text: str, start: int, end: int, out: List[Span]):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if end > start:
+        out.append((start, end))
+
+
+def _split(text: str, start: int, end: int, separators: List[str], chunk_size: int,
+           chunk_overlap: int, out: List[Span]):
+    separator, remaining = separators[-1], []
+    for i, candidate in enumerate(separators):
+        if not candidate:
+            separator = candidate
+            break
+        if text.find(candidate, start, end) != -1:
+            separator, remaining = candidate, separators[i + 1:]
+            break
+
+    bounds = _boundaries(text, start, end, separator)
+    pieces = len(bounds) - 1
+    run_start = 0
+    # Pieces of chunk_size or more are split further; runs of smaller ones are merged
+    for j in [j for j in range(pieces) if bounds[j + 1] - bounds[j] >= chunk_size]:
+        if j > run_start:
+            _merge(text, bounds, run_start, j, chunk_size, chunk_overlap, out)
+        if remaining:
+            _split(text, bounds[j], bounds[j + 1], remaining, chunk_size, chunk_overlap, out)
+        else:
+            out.append((bounds[j], bounds[j + 1]))
+        run_start = j + 1
+    if pieces > run_start:
+        _merge(text, bounds, run_start, pieces, chunk_size, chunk_overlap, out)
+
+
+def split_spans(text: str, chunk_size: int = None, chunk_overlap: int = None) -> List[Span]:
+    """
+    Chunk boundaries of `text` as (start, end) offsets; text[start:end] is
+    the chunk. Defaults to CHUNK_SIZE / CHUNK_OVERLAP.
+    """
+    chunk_size = settings.CHUNK_SIZE if chunk_size is None else chunk_size
+    chunk_overlap = settings.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+    out: List[Span] = []
+    _split(text, 0, len(text), SEPARATORS, chunk_size, chunk_overlap, out)
+    return out
 
 
 def split_text(text: str):
     """
-    Splits input text into chunks using the default splitter.
+    Splits input text into chunks using the configured SPLITTER.
     """
-    splitter = get_text_splitter()
-    chunks = splitter.split_text(text)
-    return chunks
+    if settings.SPLITTER == "langchain":
+        return get_text_splitter().split_text(text)
+    return [text[start:end] for start, end in split_spans(text)]
@@ -0,0 +1,66 @@
+# backend/app/rag/summarizer.py
+
+"""Rolling conversation summaries.
+
+With CONVERSATION_SUMMARY enabled, each ChatSession keeps a compact summary
+of everything before its last few turns. After a turn is answered the
+older messages are folded into the summary in the background, so the chat
+prompt carries the summary plus the recent turns instead of ten raw
+messages (assistant answers full of holiday tables included).
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from ..core.config import settings
+from ..core.llm import get_llm
+from ..core.metrics import timed_stage
+
+# Long assistant answers are cut before summarizing; the gist is enough
+MAX_MESSAGE_CHARS = 1200
+
+SUMMARY_PROMPT = PromptTemplate(
+    input_variables=["summary", "messages", "max_words"],
+    template="""You maintain a running summary of a conversation between an employee and an HR policy assistant.
+
+Current summary (may be empty):
+{summary}
+
+New messages:
+{messages}
+
+Write the updated summary in at most {max_words} words. Keep what later questions may refer back to: the topics and policies asked about, facts about the employee (joining date, location, role), dates, numbers and conclusions already given. Drop tables, citations and pleasantries. Output only the summary text.
+""",
+)
+
+
+def format_messages(messages: List[Dict[str, str]]) -> str:
+    lines = []
+    for msg in messages:
+        content = (msg.get("content") or "").strip()
+        if len(content) > MAX_MESSAGE_CHARS:
+            content = content[:MAX_MESSAGE_CHARS] + " ..."
+        speaker = "Employee" if msg.get("role") == "user" else "Assistant"
+        lines.append(f"{speaker}: {content}")
+    return "\n".join(lines)
+
+
+@timed_stage("summary_update")
+def summarize_conversation(previous_summary: Optional[str], messages: List[Dict[str, str]]) -> str:
+    """
+    Folds `messages` ([{"role", "content"}], oldest first) into
+    `previous_summary` with one LLM call. Capped at SUMMARY_MAX_CHARS.
+    """
+    chain = SUMMARY_PROMPT | get_llm() | StrOutputParser()
+    summary = chain.invoke({
+        "summary": previous_summary or "",
+        "messages": format_messages(messages),
+        "max_words": max(settings.SUMMARY_MAX_CHARS // 6, 20),
+    }).strip()
+    if len(summary) > settings.SUMMARY_MAX_CHARS:
+        logging.debug(f"Conversation summary truncated from {len(summary)} chars")
+        summary = summary[:settings.SUMMARY_MAX_CHARS].rsplit(" ", 1)[0]
+    return summary
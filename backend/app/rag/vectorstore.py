@@ -1,55 +1,588 @@
+import json
 import os
+import shutil
+import threading
+import time
+import uuid
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 
 from chromadb import PersistentClient
 from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
 
 from ..core.config import settings
-from .embedder import get_embedder
+from .embedder import embed_documents_scheduled, get_embedder
+from .flat_index import FlatIndexRetriever, FlatVectorIndex, load_flat_index
+from .bm25 import BM25Index, HybridRetriever, load_bm25_index
+from .catalog import load_catalog
+from .dedup import CLUSTER_KEY, NUMBERS_KEY
+
+
+# Name of the original collection, and prefix of the versioned collections
+# full rebuilds create (hr_docs_v1, hr_docs_v2, ...)
+COLLECTION_NAME = "hr_docs"
+
+# ----------------------------------------------------------------------------
+# Process-wide resource pool
+# ----------------------------------------------------------------------------
+# The Chroma client and the LangChain wrapper are expensive to build and safe
+# to share between request threads, so each worker keeps a single instance.
+# The wrapper is bound to one collection, so it is rebuilt when the current
+# collection pointer moves (or the collection is cleared).
+_pool_lock = threading.RLock()
+_client = None
+_vectorstore = None
+_vectorstore_collection = None
+_pool_stats = {
+    "client_builds": 0,
+    "vectorstore_builds": 0,
+    "build_seconds": 0.0,
+    "reuses": 0,
+}
+# Separate from _pool_lock so counting a reuse never waits on a build
+_stats_lock = threading.Lock()
+
+
+def _record_build(kind: str, started: float):
+    with _stats_lock:
+        _pool_stats[f"{kind}_builds"] += 1
+        _pool_stats["build_seconds"] += time.perf_counter() - started
+
+
+def _record_reuse():
+    with _stats_lock:
+        _pool_stats["reuses"] += 1
 
 
 def get_chroma_client():
     """
-    Returns a Persistent ChromaDB client using the new API (v1.3+).
+    Returns the shared Persistent ChromaDB client using the new API (v1.3+).
     """
-    persist_dir = Path(settings.CHROMA_DIR)
-    persist_dir.mkdir(parents=True, exist_ok=True)
+    global _client
+    if _client is not None:
+        _record_reuse()
+        return _client
 
-    client = PersistentClient(path=str(persist_dir))
-    return client
+    with _pool_lock:
+        if _client is None:
+            started = time.perf_counter()
+            persist_dir = Path(settings.CHROMA_DIR)
+            persist_dir.mkdir(parents=True, exist_ok=True)
+            _client = PersistentClient(path=str(persist_dir))
+            _record_build("client", started)
+        return _client
 
 
 def get_vectorstore():
     """
-    Returns the Chroma vector store.
+    Returns the shared Chroma vector store.
     """
+    global _vectorstore, _vectorstore_collection
+    name = get_collection_name()
+    vectorstore = _vectorstore
+    if vectorstore is not None and _vectorstore_collection == name:
+        _record_reuse()
+        return vectorstore
+
+    with _pool_lock:
+        if _vectorstore is None or _vectorstore_collection != name:
+            client = get_chroma_client()
+            started = time.perf_counter()
+            _vectorstore = Chroma(
+                client=client,
+                collection_name=name,
+                embedding_function=get_embedder(),
+            )
+            _vectorstore_collection = name
+            _record_build("vectorstore", started)
+        return _vectorstore
+
+
+def reset_vectorstore():
+    """
+    Drops the pooled vector store so the next call rebuilds it.
+    Call after the underlying collection is deleted or recreated.
+    """
+    global _vectorstore
+    with _pool_lock:
+        _vectorstore = None
+
+
+# ----------------------------------------------------------------------------
+# Current collection pointer (blue/green rebuilds)
+# ----------------------------------------------------------------------------
+# A full rebuild writes into a fresh versioned collection while queries keep
+# reading the current one, then promote_collection() atomically replaces the
+# pointer file. Every worker re-reads the pointer when its mtime changes, so
+# all of them switch on their next query. The replaced collection is kept
+# for COLLECTION_GC_GRACE_SECONDS so queries already running on it finish.
+_pointer_cache: Optional[Tuple[int, Dict[str, Any]]] = None
+
+
+def _read_pointer() -> Dict[str, Any]:
+    global _pointer_cache
+    path = Path(settings.COLLECTION_POINTER_PATH)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        # Corpus ingested before versioned collections existed
+        return {"collection": COLLECTION_NAME, "version": 0, "retired": []}
+    cached = _pointer_cache
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        pointer = json.load(f)
+    _pointer_cache = (mtime, pointer)
+    return pointer
+
+
+def _write_pointer(pointer: Dict[str, Any]):
+    global _pointer_cache
+    path = Path(settings.COLLECTION_POINTER_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(pointer, f, indent=2)
+    os.replace(tmp, path)
+    _pointer_cache = None
+
+
+def get_collection_name() -> str:
+    """
+    Name of the collection queries currently read from.
+    """
+    return _read_pointer()["collection"]
+
+
+def get_collection(name: Optional[str] = None):
+    """
+    The named collection, or the current one.
+    """
+    return get_chroma_client().get_or_create_collection(name or get_collection_name())
+
+
+def create_staging_collection() -> str:
+    """
+    Creates an empty collection for a full rebuild and returns its name.
+    Queries keep using the current collection until promote_collection().
+    """
+    name = f"{COLLECTION_NAME}_v{_read_pointer()['version'] + 1}"
     client = get_chroma_client()
-    embedding_function = get_embedder()
+    try:
+        # Left behind by an interrupted rebuild
+        client.delete_collection(name)
+    except Exception:
+        pass
+    client.create_collection(name)
+    print(f"🆕 Building new collection '{name}'.")
+    return name
 
-    vectorstore = Chroma(
-        client=client,
-        collection_name="hr_docs",
-        embedding_function=embedding_function,
-    )
-    return vectorstore
 
+def promote_collection(name: str):
+    """
+    Points queries at `name` and retires the previous collection; it is
+    deleted once COLLECTION_GC_GRACE_SECONDS have passed.
+    """
+    with _pool_lock:
+        pointer = _read_pointer()
+        previous = pointer["collection"]
+        retired = [r for r in pointer.get("retired", []) if r["name"] != name]
+        if previous != name:
+            retired.append({"name": previous, "retired_at": time.time()})
+        _write_pointer({"collection": name, "version": pointer["version"] + 1, "retired": retired})
+        reset_vectorstore()
+        bump_corpus_generation()
+    print(f"🔀 Switched queries from '{previous}' to '{name}'.")
+
+    timer = threading.Timer(settings.COLLECTION_GC_GRACE_SECONDS + 1, collect_retired_collections)
+    timer.daemon = True
+    timer.start()
 
-def add_to_chroma(chunks: List[str], metadata: List[dict]):
+
+def collect_retired_collections() -> List[str]:
     """
-    Adds chunks to the Chroma vector store.
+    Deletes retired collections whose grace period has passed. Returns
+    their names. Also run at the start of each ingest, since the timer
+    started by promote_collection() does not survive a restart.
     """
-    vectorstore = get_vectorstore()
-    vectorstore.add_texts(texts=chunks, metadatas=metadata)
+    with _pool_lock:
+        pointer = _read_pointer()
+        now = time.time()
+        keep, deleted = [], []
+        retired = pointer.get("retired", [])
+        for entry in retired:
+            if entry["name"] == pointer["collection"]:
+                continue
+            if now - entry["retired_at"] < settings.COLLECTION_GC_GRACE_SECONDS:
+                keep.append(entry)
+                continue
+            try:
+                get_chroma_client().delete_collection(entry["name"])
+            except Exception:
+                pass  # already gone
+            _delete_index_files(entry["name"])
+            deleted.append(entry["name"])
+        if len(keep) != len(retired):
+            _write_pointer({**pointer, "retired": keep})
+    for name in deleted:
+        print(f"🗑️ Deleted retired collection '{name}'.")
+    return deleted
+
+
+# Bumped whenever the indexed corpus changes, so caches derived from
+# retrieval results can tell that they are stale. It lives in a file next
+# to the collection pointer so that a change made by one worker (ingest,
+# upload, pointer switch) is seen by every other worker's caches.
+_generation_cache: Optional[Tuple[Tuple[int, int], int]] = None
+
+
+def get_corpus_generation() -> int:
+    """
+    Returns the current generation of the corpus, shared by all workers.
+    """
+    global _generation_cache
+    path = Path(settings.CORPUS_GENERATION_PATH)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 0
+    # os.replace gives every write a new inode, so this also catches two
+    # writes within one mtime tick
+    version = (stat.st_ino, stat.st_mtime_ns)
+    cached = _generation_cache
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            generation = int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return cached[1] if cached is not None else 0
+    _generation_cache = (version, generation)
+    return generation
+
+
+def bump_corpus_generation() -> int:
+    """
+    Marks the corpus as changed for every worker and returns the new
+    generation.
+    """
+    global _generation_cache
+    with _pool_lock:
+        generation = get_corpus_generation() + 1
+        path = Path(settings.CORPUS_GENERATION_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(generation))
+        os.replace(tmp, path)
+        _generation_cache = None
+        return generation
+
+
+def _is_current(collection_name: Optional[str]) -> bool:
+    return collection_name is None or collection_name == get_collection_name()
+
+
+def get_pool_stats() -> dict:
+    """
+    Returns build/reuse counters for the pooled resources.
+
+    `estimated_seconds_saved` multiplies the average build cost by the
+    number of calls that reused a pooled object instead of rebuilding it.
+    """
+    with _stats_lock:
+        stats = dict(_pool_stats)
+    builds = stats["client_builds"] + stats["vectorstore_builds"]
+    avg_build = stats["build_seconds"] / builds if builds else 0.0
+    stats["estimated_seconds_saved"] = round(avg_build * stats["reuses"], 4)
+    return stats
+
+
+# Rows per Chroma upsert call (well under the client's max batch size)
+UPSERT_BATCH_SIZE = 500
+
+
+def add_to_chroma(chunks: List[str], metadata: List[dict], ids: Optional[List[str]] = None):
+    """
+    Upserts chunks into the Chroma collection. Embeddings come from the
+    ingest EmbeddingScheduler, which reuses vectors from the embedding store.
+    """
+    if ids is None:
+        ids = [uuid.uuid4().hex for _ in chunks]
+    upsert_chunks(ids, chunks, metadata, embed_documents_scheduled(chunks))
     print(f"✅ Added {len(chunks)} chunks to ChromaDB.")
 
 
-def get_retriever(k: int = 4):
+def upsert_chunks(ids: List[str], chunks: List[str], metadata: List[dict], embeddings: List[List[float]],
+                  collection_name: Optional[str] = None):
+    """
+    Writes already-embedded chunks to `collection_name` (default: current).
+    """
+    collection = get_collection(collection_name)
+    for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+        end = start + UPSERT_BATCH_SIZE
+        collection.upsert(
+            ids=ids[start:end],
+            embeddings=embeddings[start:end],
+            documents=chunks[start:end],
+            metadatas=metadata[start:end],
+        )
+    if _is_current(collection_name):
+        bump_corpus_generation()
+
+
+def update_chunk_positions(ids: List[str], metadata: List[dict],
+                           collection_name: Optional[str] = None) -> int:
     """
-    Returns a retriever object.
+    Rewrites page_no/chunk_index of chunks that are already stored under
+    `ids` (same text, so same id and embedding) but moved within their
+    file. Returns the number of chunks whose position changed.
+    """
+    if not ids:
+        return 0
+    collection = get_collection(collection_name)
+    wanted = dict(zip(ids, metadata))
+    stored = collection.get(ids=list(ids), include=["metadatas"])
+    moved_ids, moved_metas = [], []
+    for chunk_id, meta in zip(stored.get("ids") or [], stored.get("metadatas") or []):
+        meta = dict(meta or {})
+        position = {key: wanted[chunk_id][key] for key in ("page_no", "chunk_index")}
+        if any(meta.get(key) != value for key, value in position.items()):
+            meta.update(position)
+            moved_ids.append(chunk_id)
+            moved_metas.append(meta)
+    if moved_ids:
+        collection.update(ids=moved_ids, metadatas=moved_metas)
+        if _is_current(collection_name):
+            bump_corpus_generation()
+    return len(moved_ids)
+
+
+def get_chunk_ids(source_file: str, collection_name: Optional[str] = None) -> List[str]:
     """
+    Ids of every chunk stored for one source file.
+    """
+    collection = get_collection(collection_name)
+    return list(collection.get(where={"source_file": source_file}, include=[])["ids"])
+
+
+def get_chunk_clusters(collection_name: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Distinct (dup_cluster, dup_numbers) pairs of the stored chunks, for
+    seeding the ingest-time near-duplicate index.
+    """
+    collection = get_collection(collection_name)
+    clusters = set()
+    for meta in collection.get(include=["metadatas"]).get("metadatas") or []:
+        if meta and meta.get(CLUSTER_KEY) and meta.get(NUMBERS_KEY) is not None:
+            clusters.add((meta[CLUSTER_KEY], meta[NUMBERS_KEY]))
+    return sorted(clusters)
+
+
+def delete_chunks(ids: List[str], collection_name: Optional[str] = None) -> int:
+    """
+    Deletes chunks by id. Returns the number of ids deleted.
+    """
+    if not ids:
+        return 0
+    collection = get_collection(collection_name)
+    collection.delete(ids=list(ids))
+    if _is_current(collection_name):
+        bump_corpus_generation()
+    print(f"🗑️ Deleted {len(ids)} chunks from ChromaDB.")
+    return len(ids)
+
+
+def count_chunks(source_files: Optional[List[str]] = None) -> int:
+    """
+    Chunks in the current collection, or only those of `source_files`.
+    """
+    collection = get_collection()
+    if source_files is None:
+        return collection.count()
+    if not source_files:
+        return 0
+    return len(collection.get(where={"source_file": {"$in": list(source_files)}}, include=[])["ids"])
+
+
+def delete_orphan_chunks(source_files: List[str], collection_name: Optional[str] = None) -> int:
+    """
+    Deletes chunks whose source_file is not in `source_files` (left behind
+    by an interrupted ingest of a file that has since been removed).
+    """
+    collection = get_collection(collection_name)
+    where = {"source_file": {"$nin": list(source_files)}} if source_files else None
+    return delete_chunks(collection.get(where=where, include=[])["ids"], collection_name)
+
+
+# The BM25 and flat index files belong to one collection, so a full
+# rebuild writes its own and promote_collection() switches them together
+# with the pointer.
+def _flat_index_dir(collection_name: str) -> Path:
+    return Path(settings.FLAT_INDEX_DIR) / collection_name
+
+
+def _bm25_index_path(collection_name: str) -> Path:
+    path = Path(settings.BM25_INDEX_PATH)
+    return path.with_name(f"{path.stem}_{collection_name}{path.suffix}")
+
+
+def _delete_index_files(collection_name: str):
+    shutil.rmtree(_flat_index_dir(collection_name), ignore_errors=True)
+    _bm25_index_path(collection_name).unlink(missing_ok=True)
+
+
+def rebuild_flat_index(collection_name: Optional[str] = None) -> int:
+    """
+    Exports a Chroma collection (default: current) to its memory-mapped
+    flat index. Returns the number of chunks written.
+    """
+    collection_name = collection_name or get_collection_name()
+    collection = get_collection(collection_name)
+    result = collection.get(include=["embeddings", "documents", "metadatas"])
+    ids = result.get("ids") or []
+    embeddings = result.get("embeddings")
+    if embeddings is None:
+        embeddings = []
+    directory = _flat_index_dir(collection_name)
+    FlatVectorIndex.build(
+        directory,
+        ids=list(ids),
+        texts=list(result.get("documents") or []),
+        metadatas=[dict(m or {}) for m in (result.get("metadatas") or [])],
+        embeddings=embeddings,
+    )
+    print(f"✅ Wrote {len(ids)} chunks to flat index at {directory}.")
+    return len(ids)
+
+
+def get_flat_index():
+    """
+    Returns the pooled flat index of the current collection, exporting it
+    from Chroma on first use.
+    """
+    name = get_collection_name()
+    index = load_flat_index(_flat_index_dir(name))
+    if index is None:
+        with _pool_lock:
+            index = load_flat_index(_flat_index_dir(name))
+            if index is None:
+                rebuild_flat_index(name)
+                index = load_flat_index(_flat_index_dir(name))
+    return index
+
+
+def rebuild_bm25_index(collection_name: Optional[str] = None) -> int:
+    """
+    Builds the BM25 inverted index over every chunk in a collection
+    (default: current) and persists it next to the Chroma data. Returns the
+    number of chunks indexed.
+    """
+    collection_name = collection_name or get_collection_name()
+    collection = get_collection(collection_name)
+    result = collection.get(include=["documents", "metadatas"])
+    ids = list(result.get("ids") or [])
+    index = BM25Index.build(
+        ids,
+        list(result.get("documents") or []),
+        [dict(m or {}) for m in (result.get("metadatas") or [])],
+    )
+    index.save(_bm25_index_path(collection_name))
+    print(f"✅ Built BM25 index over {len(ids)} chunks ({len(index.postings)} terms).")
+    return len(ids)
+
+
+def get_bm25_index():
+    """
+    Returns the pooled BM25 index of the current collection, building it
+    from Chroma on first use.
+    """
+    name = get_collection_name()
+    index = load_bm25_index(_bm25_index_path(name))
+    if index is None:
+        with _pool_lock:
+            index = load_bm25_index(_bm25_index_path(name))
+            if index is None:
+                rebuild_bm25_index(name)
+                index = load_bm25_index(_bm25_index_path(name))
+    return index
+
+
+def vector_search(query_embedding: List[float], k: int,
+                  where: Optional[Dict[str, Any]] = None) -> List[Document]:
+    """
+    Top-k nearest chunks for a precomputed query embedding on the configured
+    RETRIEVAL_BACKEND, optionally restricted by a Chroma `where` filter.
+    Returned Documents carry their chunk id in `.id`.
+    """
+    if settings.RETRIEVAL_BACKEND == "flat":
+        index = get_flat_index()
+        return [index.document(row, score) for row, score in index.search(query_embedding, k, where=where)]
+
+    collection = get_collection()
+    query_kwargs = {"where": where} if where else {}
+    result = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=k,
+        include=["documents", "metadatas", "distances"],
+        **query_kwargs,
+    )
+    docs = []
+    for doc_id, text, meta, distance in zip(
+        result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+    ):
+        metadata = dict(meta or {})
+        metadata["distance"] = distance
+        docs.append(Document(page_content=text or "", metadata=metadata, id=doc_id))
+    return docs
+
+
+def get_retriever(k: int = 4, where: Optional[Dict[str, Any]] = None):
+    """
+    Returns a retriever object for the configured RETRIEVAL_BACKEND and
+    RETRIEVAL_MODE. `where` is a Chroma metadata filter applied by every
+    backend.
+    """
+    if settings.RETRIEVAL_MODE == "hybrid":
+        return HybridRetriever(
+            bm25=get_bm25_index(),
+            embeddings=get_embedder(),
+            vector_search=vector_search,
+            k=k,
+            candidates=max(k, settings.HYBRID_CANDIDATES),
+            rrf_k=settings.RRF_K,
+            where=where,
+        )
+    if settings.RETRIEVAL_BACKEND == "flat":
+        return FlatIndexRetriever(index=get_flat_index(), embeddings=get_embedder(), k=k, where=where)
     vectorstore = get_vectorstore()
-    return vectorstore.as_retriever(search_kwargs={"k": k})
+    search_kwargs = {"k": k}
+    if where:
+        search_kwargs["filter"] = where
+    return vectorstore.as_retriever(search_kwargs=search_kwargs)
+
+
+def retrieve_with_embedding(query: str, query_embedding: List[float], k: int = 4,
+                            where: Optional[Dict[str, Any]] = None) -> List[Document]:
+    """
+    Same results as get_retriever(k, where).invoke(query), but reuses an
+    embedding the caller already computed (e.g. one batched call for many
+    questions).
+    """
+    retriever = get_retriever(k=k, where=where)
+    if isinstance(retriever, HybridRetriever):
+        return retriever.retrieve_with_embedding(query, query_embedding)
+    return vector_search(query_embedding, k, where=where)
+
+
+def source_filter(sources: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+    """
+    Chroma `where` filter restricting retrieval to the given source files.
+    """
+    if not sources:
+        return None
+    return {"source_file": {"$in": sorted(sources)}}
 
 
 def calculate_dynamic_k(question: str, base_k: int = 4) -> int:
@@ -63,35 +596,54 @@ def calculate_dynamic_k(question: str, base_k: int = 4) -> int:
 
 def clear_collection():
     """
-    Deletes the existing 'hr_docs' collection in ChromaDB.
+    Deletes the current collection in ChromaDB. Ingestion no longer calls
+    this (full rebuilds use create_staging_collection/promote_collection).
     """
     client = get_chroma_client()
+    name = get_collection_name()
     try:
-        client.delete_collection("hr_docs")
-        print("🗑️ Deleted existing 'hr_docs' collection.")
+        client.delete_collection(name)
+        print(f"🗑️ Deleted existing '{name}' collection.")
     except Exception:
-        print("⚠️ Collection 'hr_docs' not found, nothing to delete.")
+        print(f"⚠️ Collection '{name}' not found, nothing to delete.")
+    finally:
+        reset_vectorstore()
+        bump_corpus_generation()
 
-def get_unique_documents_count() -> int:
+def get_document_names() -> List[str]:
     """
-    Returns the number of unique documents in the vector store.
+    Returns the sorted filenames of all ingested documents.
+
+    Reads the document catalog written by the ingest pipeline; only falls
+    back to scanning chunk metadata when no catalog exists yet.
     """
+    catalog = load_catalog()
+    if catalog is not None:
+        return sorted(catalog)
+
     client = get_chroma_client()
     try:
-        collection = client.get_collection("hr_docs")
+        collection = client.get_collection(get_collection_name())
         # Get all metadata
         result = collection.get(include=["metadatas"])
         metadatas = result["metadatas"]
         if not metadatas:
-            return 0
+            return []
         
-        # Count unique 'source' values
+        # Collect unique 'source_file' values
         unique_docs = set()
         for meta in metadatas:
-            if meta and "source" in meta:
-                unique_docs.add(meta["source"])
+            if meta and "source_file" in meta:
+                unique_docs.add(meta["source_file"])
         
-        return len(unique_docs)
+        return sorted(unique_docs)
     except Exception as e:
-        print(f"Error counting documents: {e}")
-        return 0
+        print(f"Error listing documents: {e}")
+        return []
+
+
+def get_unique_documents_count() -> int:
+    """
+    Returns the number of unique documents in the vector store.
+    """
+    return len(get_document_names())
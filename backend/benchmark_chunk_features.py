@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark the run_rag ranking stage with and without ingest-time chunk features.
+
+"on-the-fly" ranks candidates whose metadata has no feat_* keys, so every
+chunk is re-analyzed per request (the old behaviour). "precomputed" ranks
+the same candidates with features stored at ingest. Both paths must
+produce identical scores; the script checks that before timing.
+
+Usage:
+    python benchmark_chunk_features.py            # synthetic HR-like chunks
+    python benchmark_chunk_features.py --chroma   # chunks from the live collection
+"""
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app.rag.chain import (
+    chunk_matches_question,
+    extract_question_concepts,
+    get_chunk_terms,
+    question_has_holiday_signals,
+    score_chunk_completeness,
+)
+from app.rag.features import compute_chunk_features
+
+QUESTION = "List all mandatory holidays in October and the leave approval policy"
+K_VALUES = [4, 8, 16, 32, 64, 128, 256]
+REPEATS = 50
+
+HOLIDAY_TABLE = """HOLIDAY CALENDAR 2025 - BANGALORE & REST OF INDIA
+S.No Holidays Date Month Day
+1 New Year 01 January Wednesday
+2 Makara Sankranti 14 January Tuesday
+3 Ugadi 30 March Sunday
+4 May Day 01 May Thursday
+5 Independence Day 15 August Friday
+6 Gandhi Jayanthi 02 October Thursday
+7 Kannada Rajyotsava 01 November Saturday
+8 Christmas 25 December Thursday
+Mandate holidays are highlighted. Optional holidays can be availed with approval."""
+
+POLICY_TEXT = """Employees must apply for leave through the HR portal at least two weeks in
+advance. Leave approval is at the discretion of the reporting manager, who shall
+consider project timelines and team availability. During the probation period of
+six months from the date of joining, the notice period is thirty days. Confirmed
+employees serve a notice period of sixty days as per the separation policy."""
+
+
+def synthetic_chunks(n: int):
+    texts = []
+    for i in range(n):
+        base = HOLIDAY_TABLE if i % 3 == 0 else POLICY_TEXT
+        texts.append(f"{base}\nRef {i}")
+    return texts
+
+
+def chroma_chunks(n: int):
+    from app.rag.vectorstore import get_collection
+    collection = get_collection()
+    texts = collection.get(include=["documents"], limit=n)["documents"] or []
+    if not texts:
+        raise SystemExit("Collection is empty; run ingestion first or drop --chroma.")
+    return [texts[i % len(texts)] for i in range(n)]
+
+
+def rank(docs, question_concepts, holiday_question):
+    matching = [d for d in docs if chunk_matches_question(get_chunk_terms(d), question_concepts)] or docs
+    scored = [(d, score_chunk_completeness(d, question_concepts, holiday_question)) for d in matching]
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return [score for _, score in scored]
+
+
+def cpu_ms_per_request(docs, question_concepts, holiday_question) -> float:
+    start = time.process_time()
+    for _ in range(REPEATS):
+        rank(docs, question_concepts, holiday_question)
+    return (time.process_time() - start) * 1000 / REPEATS
+
+
+def main():
+    use_chroma = "--chroma" in sys.argv
+    question_concepts = extract_question_concepts(QUESTION)
+    holiday_question = question_has_holiday_signals(question_concepts)
+
+    print(f"Question: {QUESTION}")
+    print(f"Source:   {'chroma collection' if use_chroma else 'synthetic chunks'}")
+    print(f"{'k':>6} {'on-the-fly ms':>15} {'precomputed ms':>15} {'speedup':>9}")
+
+    for k in K_VALUES:
+        texts = chroma_chunks(k) if use_chroma else synthetic_chunks(k)
+        raw = [SimpleNamespace(page_content=t, metadata={}) for t in texts]
+        pre = [SimpleNamespace(page_content=t, metadata=compute_chunk_features(t)) for t in texts]
+
+        assert rank(raw, question_concepts, holiday_question) == rank(pre, question_concepts, holiday_question), \
+            "precomputed features changed the ranking scores"
+
+        before = cpu_ms_per_request(raw, question_concepts, holiday_question)
+        after = cpu_ms_per_request(pre, question_concepts, holiday_question)
+        print(f"{k:>6} {before:>15.3f} {after:>15.3f} {before / after if after else float('inf'):>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
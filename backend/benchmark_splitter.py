@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark the native span splitter against LangChain's RecursiveCharacterTextSplitter.
+
+Both run with CHUNK_SIZE / CHUNK_OVERLAP and the same separators over the
+text of every page in RAW_DOCS_DIR. The script first checks chunk-boundary
+parity page by page (the chunk lists must be identical), then times each
+splitter over all pages.
+
+Usage:
+    python benchmark_splitter.py               # pages of the PDFs in data/raw_docs
+    python benchmark_splitter.py --synthetic   # generated HR-like pages, no PDFs needed
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app.core.config import settings
+from app.rag.splitter import get_text_splitter, split_spans
+
+REPEATS = 5
+
+SYNTHETIC_PAGE = """LEAVE POLICY
+
+1. Annual leave
+Employees accrue 1.5 days of annual leave per month of service.  Leave must be applied for in advance.
+Unused leave of up to 15 days may be carried forward to the next calendar year.
+
+
+2. Sick leave
+S.No  Type        Days  Approval
+1     Sick leave  12    Manager
+2     Medical     30    HR
+
+Requests longer than three days need a medical certificate. """
+
+
+def pdf_pages():
+    from app.rag.loader import iter_pdf_pages, list_pdf_files
+    files = list_pdf_files()
+    if not files:
+        raise SystemExit(f"No PDFs in {settings.RAW_DOCS_DIR}; add some or use --synthetic.")
+    return [text for _, _, text in iter_pdf_pages(files)]
+
+
+def synthetic_pages(n: int = 400):
+    return [(SYNTHETIC_PAGE * (1 + i % 4)) + f"\nPage {i}" for i in range(n)]
+
+
+def native_split(text: str):
+    return [text[start:end] for start, end in split_spans(text)]
+
+
+def seconds_per_pass(split, pages) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for page in pages:
+            split(page)
+    return (time.perf_counter() - start) / REPEATS
+
+
+def main():
+    pages = synthetic_pages() if "--synthetic" in sys.argv else pdf_pages()
+    langchain_split = get_text_splitter().split_text
+    total_chars = sum(len(p) for p in pages)
+
+    print(f"Pages:    {len(pages)} ({total_chars / 1e6:.2f} M chars)")
+    print(f"Chunking: size={settings.CHUNK_SIZE} overlap={settings.CHUNK_OVERLAP}")
+
+    mismatched = 0
+    chunks = 0
+    for i, page in enumerate(pages):
+        expected = langchain_split(page)
+        chunks += len(expected)
+        if native_split(page) != expected:
+            mismatched += 1
+            if mismatched <= 3:
+                print(f"  boundary mismatch on page {i}")
+    print(f"Parity:   {len(pages) - mismatched}/{len(pages)} pages identical, {chunks} chunks")
+
+    print(f"{'splitter':>10} {'s/pass':>10} {'pages/s':>10} {'MB/s':>8}")
+    results = {}
+    for name, split in (("langchain", langchain_split), ("native", native_split)):
+        seconds = seconds_per_pass(split, pages)
+        results[name] = seconds
+        print(f"{name:>10} {seconds:>10.4f} {len(pages) / seconds:>10.0f} {total_chars / seconds / 1e6:>8.2f}")
+    print(f"Speedup:  {results['langchain'] / results['native']:.1f}x")
+
+    if mismatched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for /api/chat.
+
+Fires N chat requests with C in flight at once and, while they run, probes
+GET / every 100 ms. With the old sync endpoint each in-flight chat held one
+of Starlette's ~40 threadpool threads for the whole Gemini call, so at high
+C the probe (and every other sync route) queued behind them. With the async
+endpoint the probe latency should stay flat while chats are in flight.
+
+Usage:
+    python load_test_chat.py --concurrency 200 --requests 400
+    python load_test_chat.py --email load@test.com --password secret
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_URL = "http://127.0.0.1:8000"
+QUESTIONS = [
+    "When is Makara Sankranti in 2025?",
+    "What is the date of Ugadi festival?",
+    "How many mandatory holidays are there?",
+    "What is the notice period during probation?",
+    "List optional holidays in August.",
+]
+
+
+def get_token(email: str, password: str) -> str:
+    r = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password}, timeout=30)
+    if r.status_code == 401:
+        r = requests.post(f"{BASE_URL}/api/auth/register", json={"email": email, "password": password}, timeout=30)
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--email", default="loadtest@example.com")
+    parser.add_argument("--password", default="loadtest-password")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {get_token(args.email, args.password)}"}
+    latencies, errors = [], []
+    probe_latencies = []
+    done = threading.Event()
+
+    def chat(i: int):
+        started = time.perf_counter()
+        try:
+            r = requests.post(f"{BASE_URL}/api/chat", headers=headers,
+                              json={"query": QUESTIONS[i % len(QUESTIONS)]}, timeout=300)
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(str(e))
+
+    def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            try:
+                requests.get(f"{BASE_URL}/", timeout=60)
+                probe_latencies.append(time.perf_counter() - started)
+            except Exception:
+                pass
+            time.sleep(0.1)
+
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(chat, range(args.requests)))
+    wall = time.perf_counter() - started
+    done.set()
+    prober.join()
+
+    print(f"Requests:     {args.requests} at concurrency {args.concurrency}")
+    print(f"Succeeded:    {len(latencies)}   Failed: {len(errors)}")
+    print(f"Wall time:    {wall:.1f}s   Throughput: {len(latencies) / wall:.2f} req/s")
+    if latencies:
+        print(f"Chat latency: p50={percentile(latencies, 50):.2f}s  p95={percentile(latencies, 95):.2f}s  "
+              f"max={max(latencies):.2f}s  mean={statistics.mean(latencies):.2f}s")
+    if probe_latencies:
+        print(f"GET / probe:  p50={percentile(probe_latencies, 50) * 1000:.0f}ms  "
+              f"p95={percentile(probe_latencies, 95) * 1000:.0f}ms  max={max(probe_latencies) * 1000:.0f}ms")
+    if errors:
+        print(f"First error:  {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
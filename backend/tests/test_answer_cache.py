@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.rag import answer_cache
+from app.rag.answer_cache import SemanticAnswerCache
+from app.rag.vectorstore import bump_corpus_generation, get_corpus_generation
+
+VECTORS = {
+    "how many casual leaves": [1.0, 0.0, 0.0],
+    "casual leave days": [0.99, 0.14, 0.0],
+    "casual leave per year": [0.98, 0.0, 0.2],
+    "maternity leave": [0.0, 1.0, 0.0],
+}
+
+
+@pytest.fixture(autouse=True)
+def shared_generation(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CORPUS_GENERATION_PATH", tmp_path / "corpus_generation")
+    monkeypatch.setattr(answer_cache, "embed_query", lambda q: VECTORS[q])
+
+
+def _result(answer):
+    return {"answer": answer, "sources": [], "retrieved_chunks": 1}
+
+
+def test_paraphrase_hits_and_unrelated_question_misses():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store("how many casual leaves", [], 4, _result("12 days"))
+    hit = cache.lookup("casual leave days", [], 4)
+    assert hit["answer"] == "12 days" and hit["cache_hit"]
+    assert cache.lookup("maternity leave", [], 4) is None
+    assert cache.lookup("casual leave days", [], 8) is None  # other k
+
+
+def test_expired_best_match_does_not_hide_a_live_one():
+    cache = SemanticAnswerCache(threshold=0.95, ttl_seconds=60)
+    cache.store("casual leave days", [], 4, _result("old"))
+    cache.store("casual leave per year", [], 4, _result("live"))
+    # Age the closest entry past the TTL
+    for key, (vector, result, stored_at) in list(cache._entries.items()):
+        if result["answer"] == "old":
+            cache._entries[key] = (vector, result, stored_at - 120)
+
+    hit = cache.lookup("how many casual leaves", [], 4)
+    assert hit["answer"] == "live"
+    assert cache.stats()["size"] == 1
+
+
+def test_generation_bump_from_another_worker_invalidates():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store("how many casual leaves", [], 4, _result("12 days"))
+    assert cache.lookup("how many casual leaves", [], 4) is not None
+
+    # Another process writes the shared generation file
+    generation = get_corpus_generation()
+    time.sleep(0.01)
+    settings.CORPUS_GENERATION_PATH.write_text(str(generation + 1))
+    assert cache.lookup("how many casual leaves", [], 4) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_bump_corpus_generation_is_persistent():
+    assert get_corpus_generation() == 0
+    assert bump_corpus_generation() == 1
+    assert bump_corpus_generation() == 2
+    assert settings.CORPUS_GENERATION_PATH.read_text() == "2"
@@ -0,0 +1,57 @@
+import asyncio
+
+from langchain_core.documents import Document
+
+from app.rag.bm25 import BM25Index, HybridRetriever, reciprocal_rank_fusion, tokenize
+
+TEXTS = [
+    "Employees get 12 days of casual leave per year.",
+    "Maternity leave is 26 weeks for the first two children.",
+    "The office is closed on Independence Day.",
+]
+IDS = ["c0", "c1", "c2"]
+METAS = [{"source_file": "leave.pdf"}, {"source_file": "maternity.pdf"}, {"source_file": "holidays.pdf"}]
+
+
+class FakeEmbeddings:
+    def embed_query(self, query):
+        return [0.0]
+
+    async def aembed_query(self, query):
+        return [0.0]
+
+
+def _vector_search(order):
+    def search(query_embedding, n, where):
+        return [Document(page_content=TEXTS[i], metadata=dict(METAS[i]), id=IDS[i]) for i in order][:n]
+    return search
+
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("What is the Maternity leave?") == ["maternity", "leave"]
+
+
+def test_search_ranks_rare_terms_first_and_honours_where():
+    index = BM25Index.build(IDS, TEXTS, METAS)
+    rows = [row for row, _ in index.search("maternity leave", 3)]
+    assert rows[0] == 1 and set(rows) == {0, 1}
+    rows = [row for row, _ in index.search("maternity leave", 3, where={"source_file": "leave.pdf"})]
+    assert rows == [0]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c"]], rrf_k=60)
+    assert [doc_id for doc_id, _ in fused] == ["b", "c", "a"]
+    assert fused[0][1] == 1 / 62 + 1 / 61
+
+
+def test_async_retrieval_matches_sync():
+    retriever = HybridRetriever(
+        bm25=BM25Index.build(IDS, TEXTS, METAS), embeddings=FakeEmbeddings(),
+        vector_search=_vector_search([2, 1, 0]), k=2, candidates=3,
+    )
+    sync_docs = retriever.invoke("maternity leave")
+    async_docs = asyncio.run(retriever.ainvoke("maternity leave"))
+    assert [d.id for d in async_docs] == [d.id for d in sync_docs]
+    assert async_docs[0].id == "c1"
+    assert async_docs[0].metadata["bm25_score"] > 0
@@ -0,0 +1,57 @@
+import pytest
+
+from app.core.config import settings
+from app.rag import catalog as catalog_module
+from app.rag.catalog import (
+    diff_catalog, file_content_hash, load_catalog, make_catalog_entry, make_chunk_id, save_catalog,
+)
+
+
+@pytest.fixture(autouse=True)
+def catalog_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DOCUMENT_CATALOG_PATH", tmp_path / "document_catalog.json")
+    monkeypatch.setattr(catalog_module, "_loaded", None)
+
+
+def test_diff_sorts_files_into_added_changed_removed_unchanged():
+    catalog = {
+        "leave.pdf": make_catalog_entry("leave.pdf", "h1", 3, 10),
+        "holidays.pdf": make_catalog_entry("holidays.pdf", "h2", 1, 4),
+        "old.pdf": make_catalog_entry("old.pdf", "h3", 2, 5),
+    }
+    hashes = {"leave.pdf": "h1", "holidays.pdf": "h2-new", "travel.pdf": "h4"}
+    added, changed, removed, unchanged = diff_catalog(catalog, hashes)
+    assert added == ["travel.pdf"]
+    assert changed == ["holidays.pdf"]
+    assert removed == ["old.pdf"]
+    assert unchanged == ["leave.pdf"]
+
+
+def test_diff_against_an_empty_catalog_adds_everything():
+    assert diff_catalog({}, {"b.pdf": "x", "a.pdf": "y"}) == (["a.pdf", "b.pdf"], [], [], [])
+
+
+def test_content_hash_follows_bytes_not_name(tmp_path):
+    a, b = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    a.write_bytes(b"%PDF-1.4 same")
+    b.write_bytes(b"%PDF-1.4 same")
+    assert file_content_hash(a) == file_content_hash(b)
+    b.write_bytes(b"%PDF-1.4 edited")
+    assert file_content_hash(a) != file_content_hash(b)
+
+
+def test_chunk_ids_are_deterministic():
+    assert make_chunk_id("a.pdf", "text") == make_chunk_id("a.pdf", "text")
+    assert make_chunk_id("a.pdf", "text") != make_chunk_id("b.pdf", "text")
+    assert make_chunk_id("a.pdf", "text") != make_chunk_id("a.pdf", "text!")
+    # Repeated text in one file gets one id per occurrence
+    assert make_chunk_id("a.pdf", "text", 0) != make_chunk_id("a.pdf", "text", 1)
+
+
+def test_save_and_load_round_trip():
+    assert load_catalog() is None
+    entries = {"a.pdf": make_catalog_entry("a.pdf", "h", 2, 7)}
+    save_catalog(entries)
+    assert load_catalog() == entries
+    save_catalog({})
+    assert load_catalog() == {}
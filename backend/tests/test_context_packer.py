@@ -0,0 +1,82 @@
+from app.rag.context_packer import (
+    MIN_TRIMMED_TOKENS, estimate_tokens, pack_chunks, pack_history, trim_to_tokens,
+)
+
+
+def _text(tokens, word="leave"):
+    # estimate_tokens is chars / 4; "leave " is 6 chars
+    return ("\n".join(" ".join([word] * 10) for _ in range(tokens)))[:tokens * 4]
+
+
+def test_unlimited_budget_keeps_everything():
+    texts = [_text(100), _text(10)]
+    packed = pack_chunks(texts, [1.0, 1.0], 0)
+    assert [i for i, _, _ in packed["selected"]] == [0, 1]
+    assert packed["dropped"] == packed["trimmed"] == 0
+
+
+def test_selection_maximizes_score_per_token():
+    # The long chunk scores a little higher but costs far more per point
+    texts = [_text(300), _text(20), _text(20), _text(20)]
+    packed = pack_chunks(texts, [50.0, 40.0, 40.0, 40.0], 100)
+    assert [i for i, _, _ in packed["selected"]] == [1, 2, 3]
+    assert packed["dropped"] == 1
+
+
+def test_high_scoring_chunk_is_kept_over_cheap_low_scorers():
+    texts = [_text(100), _text(20), _text(20)]
+    packed = pack_chunks(texts, [100.0, 5.0, 5.0], 125)
+    assert [i for i, _, _ in packed["selected"]] == [0, 1]
+
+
+def test_zero_scores_keep_rank_order_instead_of_shortest_first():
+    texts = [_text(300), _text(20), _text(20), _text(20)]
+    packed = pack_chunks(texts, [0.0, 0.0, 0.0, 0.0], 340)
+    assert [i for i, _, _ in packed["selected"]] == [0, 1, 2]
+    assert not any(trimmed for _, _, trimmed in packed["selected"])
+
+    # A zero-scored chunk only fills room the scored chunks leave
+    packed = pack_chunks([_text(20), _text(200), _text(20)], [0.0, 30.0, 0.0], 225)
+    assert [i for i, _, _ in packed["selected"]] == [0, 1]
+
+
+def test_selected_chunks_come_back_in_rank_order():
+    packed = pack_chunks([_text(50), _text(10), _text(30)], [10.0, 60.0, 30.0], 1000)
+    assert [i for i, _, _ in packed["selected"]] == [0, 1, 2]
+
+
+def test_chunk_that_does_not_fit_is_trimmed():
+    texts = [_text(100), _text(400), _text(10)]
+    packed = pack_chunks(texts, [30.0, 20.0, 0.0], 300, overheads=[5, 5, 5])
+    selected = packed["selected"]
+    assert [(i, trimmed) for i, _, trimmed in selected] == [(0, False), (1, True)]
+    assert estimate_tokens(selected[1][1]) <= 300 - 105 - 5
+    assert packed["tokens_used"] <= 300
+    assert packed["dropped"] == 1 and packed["trimmed"] == 1
+
+
+def test_too_little_room_drops_instead_of_trimming():
+    texts = [_text(100), _text(400)]
+    packed = pack_chunks(texts, [10.0, 10.0], 100 + MIN_TRIMMED_TOKENS - 1)
+    assert [i for i, _, _ in packed["selected"]] == [0]
+
+
+def test_oversized_top_chunk_is_trimmed_to_the_budget():
+    packed = pack_chunks([_text(1000), _text(10)], [100.0, 0.0], 200)
+    assert [(i, trimmed) for i, _, trimmed in packed["selected"]] == [(0, True)]
+    assert packed["tokens_used"] <= 200
+
+
+def test_trim_prefers_line_boundaries():
+    text = "first line of the policy\nsecond line of the policy\nthird"
+    assert trim_to_tokens(text, 13) == "first line of the policy\nsecond line of the policy"
+    assert trim_to_tokens(text, 100) == text
+
+
+def test_pack_history_keeps_most_recent_messages_within_budget():
+    history = [{"role": "user", "content": "x" * 40} for _ in range(5)]
+    history[-1] = {"role": "assistant", "content": "latest"}
+    kept = pack_history(history, budget=30)
+    assert kept[-1]["content"] == "latest"
+    assert len(kept) == 2
+    assert pack_history(history, budget=0) == history
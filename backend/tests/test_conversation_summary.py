@@ -0,0 +1,135 @@
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.api import chat
+from app.core.config import settings
+from app.models.message import ChatMessage
+from app.models.session import ChatSession
+from app.models.user import User
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(chat, "engine", engine)
+    monkeypatch.setattr(settings, "SUMMARY_RECENT_TURNS", 2)
+    return engine
+
+
+@pytest.fixture
+def folded(monkeypatch):
+    calls = []
+
+    def summarize_conversation(previous, messages):
+        calls.append((previous, [m["content"] for m in messages]))
+        return " + ".join(filter(None, [previous] + [m["content"] for m in messages]))
+
+    monkeypatch.setattr(chat, "summarize_conversation", summarize_conversation)
+    return calls
+
+
+def _session(engine, turns: int) -> int:
+    with Session(engine) as db:
+        user = User(email="emp@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        session = ChatSession(user_id=user.id)
+        db.add(session)
+        db.commit()
+        for n in range(turns):
+            db.add(ChatMessage(session_id=session.id, role="user", content=f"q{n}"))
+            db.add(ChatMessage(session_id=session.id, role="assistant", content=f"a{n}"))
+        db.commit()
+        return session.id
+
+
+def _add(engine, session_id: int, role: str, content: str):
+    with Session(engine) as db:
+        db.add(ChatMessage(session_id=session_id, role=role, content=content))
+        db.commit()
+
+
+def _history(engine, session_id: int) -> list:
+    with Session(engine) as db:
+        return [(m["role"], m["content"]) for m in chat._summary_history(db, db.get(ChatSession, session_id))]
+
+
+def test_folds_everything_but_the_recent_turns(engine, folded):
+    session_id = _session(engine, turns=4)
+    chat._update_session_summary(session_id)
+    assert folded == [(None, ["q0", "a0", "q1", "a1"])]
+    with Session(engine) as db:
+        session = db.get(ChatSession, session_id)
+        assert session.summary == "q0 + a0 + q1 + a1"
+        last_folded = db.get(ChatMessage, session.summary_message_id)
+        assert last_folded.content == "a1"
+
+
+def test_summary_advances_only_over_new_messages(engine, folded):
+    session_id = _session(engine, turns=3)
+    chat._update_session_summary(session_id)
+    # Nothing new beyond the recent window: no LLM call
+    chat._update_session_summary(session_id)
+    assert len(folded) == 1
+
+    _add(engine, session_id, "user", "q3")
+    _add(engine, session_id, "assistant", "a3")
+    chat._update_session_summary(session_id)
+    assert folded[-1] == ("q0 + a0", ["q1", "a1"])
+    with Session(engine) as db:
+        session = db.get(ChatSession, session_id)
+        assert session.summary == "q0 + a0 + q1 + a1"
+        assert db.get(ChatMessage, session.summary_message_id).content == "a1"
+
+
+def test_short_conversations_are_not_summarized(engine, folded):
+    session_id = _session(engine, turns=2)
+    chat._update_session_summary(session_id)
+    assert folded == []
+    assert _history(engine, session_id) == [("user", "q0"), ("assistant", "a0"), ("user", "q1"), ("assistant", "a1")]
+
+
+def test_history_is_the_summary_then_uncovered_messages(engine, folded):
+    session_id = _session(engine, turns=4)
+    chat._update_session_summary(session_id)
+    _add(engine, session_id, "user", "q4")
+    assert _history(engine, session_id) == [
+        ("summary", "q0 + a0 + q1 + a1"),
+        ("user", "q2"), ("assistant", "a2"), ("user", "q3"), ("assistant", "a3"), ("user", "q4"),
+    ]
+
+
+def test_lagging_summary_keeps_the_newest_messages(engine, folded):
+    # The summary covers the first turn only (later updates failed); the
+    # prompt still gets the summary and the newest recent-window messages
+    session_id = _session(engine, turns=6)
+    with Session(engine) as db:
+        session = db.get(ChatSession, session_id)
+        first_answer = db.exec(select(ChatMessage).where(ChatMessage.content == "a0")).one()
+        session.summary, session.summary_message_id = "q0 + a0", first_answer.id
+        db.add(session)
+        db.commit()
+    _add(engine, session_id, "user", "q6")
+
+    history = _history(engine, session_id)
+    assert history[0] == ("summary", "q0 + a0")
+    assert history[1:] == [("user", "q4"), ("assistant", "a4"), ("user", "q5"), ("assistant", "a5"), ("user", "q6")]
+
+    # The update after the answer folds everything the summary skipped
+    _add(engine, session_id, "assistant", "a6")
+    chat._update_session_summary(session_id)
+    assert folded == [("q0 + a0", ["q1", "a1", "q2", "a2", "q3", "a3", "q4", "a4"])]
+
+
+def test_summary_failures_are_logged_not_raised(engine, monkeypatch):
+    session_id = _session(engine, turns=4)
+
+    def fail(previous, messages):
+        raise RuntimeError("LLM unavailable")
+
+    monkeypatch.setattr(chat, "summarize_conversation", fail)
+    chat._update_session_summary(session_id)
+    with Session(engine) as db:
+        assert db.get(ChatSession, session_id).summary_message_id is None
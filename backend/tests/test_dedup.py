@@ -0,0 +1,94 @@
+import random
+
+from app.rag.dedup import (
+    NUMBERS_KEY, SIMHASH_KEY, NearDuplicateFilter, SimHashIndex, hamming, number_fingerprint,
+    signature_hex, simhash,
+)
+
+POLICY = (
+    "Employees on probation are entitled to {days} days of casual leave in the calendar year {year}. "
+    "Leave must be applied for in advance through the HR portal and approved by the reporting manager. "
+    "Unused casual leave lapses at the end of the year and cannot be encashed or carried forward."
+)
+
+
+def _meta(text):
+    return {SIMHASH_KEY: signature_hex(text), NUMBERS_KEY: number_fingerprint(text)}
+
+
+def test_identical_text_is_a_near_duplicate():
+    text = POLICY.format(days=12, year=2024)
+    assert simhash(text) == simhash(" ".join(text.upper().split()))
+    f = NearDuplicateFilter(3)
+    f.add(text, _meta(text))
+    assert f.match(text + " ", _meta(text + " ")) == "simhash"
+
+
+def test_number_fingerprint_depends_on_digit_tokens_only():
+    assert number_fingerprint("no numbers here") == ""
+    assert number_fingerprint("12 days in 2024") == number_fingerprint("Twelve: 12 DAYS, year 2024!")
+    assert number_fingerprint("12 days in 2024") != number_fingerprint("18 days in 2024")
+    assert number_fingerprint("12 days in 2024") != number_fingerprint("12 days in 2025")
+
+
+def test_different_numbers_never_collapse():
+    old, new = POLICY.format(days=12, year=2024), POLICY.format(days=18, year=2025)
+    # However close the wording, different numbers are different policies
+    f = NearDuplicateFilter(64)
+    f.add(old, _meta(old))
+    assert f.match(new, _meta(new)) is None
+
+    index = SimHashIndex(31)
+    cluster, is_duplicate = index.assign(signature_hex(old), number_fingerprint(old))
+    assert not is_duplicate
+    cluster_new, is_duplicate = index.assign(signature_hex(new), number_fingerprint(new))
+    assert not is_duplicate
+    assert cluster_new != cluster
+
+
+def test_filter_falls_back_to_text_numbers_without_metadata():
+    old, new = POLICY.format(days=12, year=2024), POLICY.format(days=18, year=2025)
+    f = NearDuplicateFilter(64)
+    f.add(old, {SIMHASH_KEY: signature_hex(old)})
+    assert f.match(new, {SIMHASH_KEY: signature_hex(new)}) is None
+    assert f.match(old, {SIMHASH_KEY: signature_hex(old)}) == "simhash"
+
+
+def test_filter_without_signatures_matches_exact_text():
+    f = NearDuplicateFilter(3)
+    f.add("Casual  leave\nis 12 days.", None)
+    assert f.match("casual leave is 12 days.", {}) == "exact"
+    assert f.match("casual leave is 18 days.", {}) is None
+
+
+def test_clusters_do_not_chain():
+    a, b, c = 0, 0b111, 0b111111  # a~b and b~c at 3 bits, a and c 6 bits apart
+    index = SimHashIndex(3)
+    assert index.assign(f"{a:016x}", "") == (f"{a:016x}", False)
+    assert index.assign(f"{b:016x}", "") == (f"{a:016x}", True)
+    # c is compared with the representative a, not with the member b
+    assert index.assign(f"{c:016x}", "") == (f"{c:016x}", False)
+
+
+def test_seeded_index_continues_stored_clusters():
+    index = SimHashIndex.from_clusters(3, [(f"{0:016x}", "n1")])
+    assert index.assign(f"{0b11:016x}", "n1") == (f"{0:016x}", True)
+    assert index.assign(f"{0b11:016x}", "n2") == (f"{0b11:016x}", False)
+
+
+def test_banded_find_matches_brute_force():
+    rng = random.Random(7)
+    representatives = [rng.getrandbits(64) for _ in range(300)]
+    index = SimHashIndex(3)
+    for r in representatives:
+        index.add(r, "")
+    for r in representatives[:100]:
+        query = r
+        for bit in rng.sample(range(64), rng.randint(0, 5)):
+            query ^= 1 << bit
+        expected = min(representatives, key=lambda x: hamming(query, x))
+        found = index.find(query, "")
+        if hamming(query, expected) <= 3:
+            assert hamming(query, found) == hamming(query, expected)
+        else:
+            assert found is None
@@ -0,0 +1,176 @@
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import documents
+from app.core.config import settings
+from app.dependencies import get_current_user
+from app.rag import catalog, ingest_pipeline, vectorstore
+from app.rag.ingest_jobs import IngestJobRunner
+from app.rag.vectorstore import get_chunk_ids, get_collection
+
+PDF = b"%PDF-1.4 policy"
+
+
+class _Runner:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, kind, func, **params):
+        self.submitted.append((kind, func, params))
+        return type("Job", (), {"id": "job-1", "status": "queued"})()
+
+    def queue_position(self, job):
+        return 0
+
+
+@pytest.fixture(autouse=True)
+def data_dirs(tmp_path, monkeypatch):
+    chroma = tmp_path / "chroma"
+    monkeypatch.setattr(settings, "RAW_DOCS_DIR", tmp_path / "raw_docs")
+    monkeypatch.setattr(settings, "UPLOAD_STAGING_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", 1024)
+    monkeypatch.setattr(settings, "CHROMA_DIR", chroma)
+    monkeypatch.setattr(settings, "COLLECTION_POINTER_PATH", chroma / "current_collection.json")
+    monkeypatch.setattr(settings, "CORPUS_GENERATION_PATH", chroma / "corpus_generation")
+    monkeypatch.setattr(settings, "BM25_INDEX_PATH", chroma / "bm25_index.json")
+    monkeypatch.setattr(settings, "DOCUMENT_CATALOG_PATH", chroma / "document_catalog.json")
+    monkeypatch.setattr(catalog, "_loaded", None)
+    monkeypatch.setattr(vectorstore, "_client", None)
+    monkeypatch.setattr(vectorstore, "_pointer_cache", None)
+    monkeypatch.setattr(vectorstore, "_generation_cache", None)
+    vectorstore.reset_vectorstore()
+    yield
+    vectorstore.reset_vectorstore()
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    runner = _Runner()
+    monkeypatch.setattr(documents, "get_job_runner", lambda: runner)
+    return runner
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(documents.router, prefix="/api")
+    app.dependency_overrides[get_current_user] = lambda: object()
+    return TestClient(app)
+
+
+def _upload(client, filename, content=PDF):
+    return client.post("/api/documents/upload", files={"file": (filename, content, "application/pdf")})
+
+
+def _staged():
+    staging = settings.UPLOAD_STAGING_DIR
+    return sorted(p.name for p in staging.iterdir()) if staging.exists() else []
+
+
+@pytest.mark.parametrize("filename", [".hidden.pdf", "notes.txt", "policy.pdf.exe", "../", ""])
+def test_rejects_names_that_are_not_plain_pdfs(client, runner, filename):
+    assert _upload(client, filename).status_code in (400, 422)
+    assert runner.submitted == []
+    assert _staged() == []
+
+
+@pytest.mark.parametrize("filename", ["../../etc/leave.pdf", "..\\..\\leave.pdf", "dir/leave.pdf"])
+def test_path_components_are_stripped(client, runner, filename):
+    response = _upload(client, filename)
+    assert response.status_code == 202
+    assert response.json()["filename"] == "leave.pdf"
+    assert runner.submitted[0][2]["filename"] == "leave.pdf"
+
+
+def test_rejects_content_that_is_not_a_pdf(client, runner):
+    response = _upload(client, "leave.pdf", b"<html>not a pdf</html>")
+    assert response.status_code == 400
+    assert runner.submitted == [] and _staged() == []
+
+
+def test_rejects_uploads_over_the_size_limit(client, runner):
+    response = _upload(client, "leave.pdf", PDF + b"x" * 2048)
+    assert response.status_code == 413
+    assert runner.submitted == [] and _staged() == []
+
+
+def test_upload_is_staged_outside_raw_docs_until_the_job_runs(client, runner):
+    response = _upload(client, "leave.pdf")
+    assert response.status_code == 202
+    assert response.json()["bytes"] == len(PDF) and response.json()["replaced"] is False
+    assert not (settings.RAW_DOCS_DIR / "leave.pdf").exists()
+
+    kind, func, params = runner.submitted[0]
+    assert (kind, func) == ("upload", ingest_pipeline.ingest_upload)
+    assert open(params["upload_path"], "rb").read() == PDF
+    assert _staged() != []
+
+
+def test_upload_waits_for_the_running_ingest_before_replacing_the_file(client, monkeypatch):
+    settings.RAW_DOCS_DIR.mkdir(parents=True)
+    (settings.RAW_DOCS_DIR / "leave.pdf").write_bytes(b"%PDF-1.4 old")
+    job_runner = IngestJobRunner()
+    monkeypatch.setattr(documents, "get_job_runner", lambda: job_runner)
+    seen, release = [], threading.Event()
+
+    def running_ingest(on_progress):
+        release.wait(2)
+        seen.append((settings.RAW_DOCS_DIR / "leave.pdf").read_bytes())
+        return {}
+
+    monkeypatch.setattr(ingest_pipeline, "ingest_document", lambda filename, on_progress=None: {"ok": filename})
+    job_runner.submit("ingest", running_ingest)
+    response = _upload(client, "leave.pdf")
+    assert response.json()["replaced"] is True
+    release.set()
+    job = job_runner.get(response.json()["job_id"])
+    deadline = time.monotonic() + 2
+    while job.status in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.status == "succeeded"
+    assert seen == [b"%PDF-1.4 old"]
+    assert (settings.RAW_DOCS_DIR / "leave.pdf").read_bytes() == PDF
+    assert _staged() == []
+
+
+def _ids_by_text(source_file):
+    stored = get_collection().get(where={"source_file": source_file}, include=["documents"])
+    return dict(zip(stored["documents"], stored["ids"]))
+
+
+class _Scheduler:
+    def embed(self, texts, keys):
+        return [[1.0, float(len(t))] for t in texts]
+
+
+def test_ingest_document_replaces_only_that_documents_stale_chunks(monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "get_embedding_scheduler", lambda: _Scheduler())
+    monkeypatch.setattr(ingest_pipeline, "split_text", lambda text: text.split("|"))
+    pages = {}
+    monkeypatch.setattr(
+        ingest_pipeline, "iter_page_batches",
+        lambda filenames: ((f, [(pages[f], 1)], 0.1) for f in filenames),
+    )
+    settings.RAW_DOCS_DIR.mkdir(parents=True)
+    for name, text in (("leave.pdf", "casual leave|sick leave"), ("holidays.pdf", "new year|diwali")):
+        (settings.RAW_DOCS_DIR / name).write_bytes(b"%PDF-1.4 " + text.encode())
+        pages[name] = text
+    ingest_pipeline.ingest_documents()
+    holidays_before = sorted(get_chunk_ids("holidays.pdf"))
+    leave_before = _ids_by_text("leave.pdf")
+
+    (settings.RAW_DOCS_DIR / "leave.pdf").write_bytes(b"%PDF-1.4 edited")
+    pages["leave.pdf"] = "casual leave|earned leave"
+    result = ingest_pipeline.ingest_document("leave.pdf")
+
+    assert result["changed"] == ["leave.pdf"]
+    assert result["chunks_embedded"] == 1 and result["chunks_deleted"] == 1
+    assert sorted(get_chunk_ids("holidays.pdf")) == holidays_before
+    leave_after = _ids_by_text("leave.pdf")
+    assert sorted(leave_after) == ["casual leave", "earned leave"]
+    assert leave_after["casual leave"] == leave_before["casual leave"]
+    assert catalog.load_catalog()["leave.pdf"]["chunk_count"] == 2
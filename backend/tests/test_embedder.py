@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.rag.embedder import (
+    CachedQueryEmbeddings, EmbeddingScheduler, QueryEmbeddingCache, TokenBucket, is_retryable_error,
+)
+
+
+class StatusError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+class WrapperError(Exception):
+    pass
+
+
+@pytest.mark.parametrize("exc", [
+    Exception("429 Resource has been exhausted (e.g. check quota)."),
+    Exception("503 The service is currently unavailable."),
+    Exception("Deadline Exceeded"),
+    Exception("The read operation timed out"),
+    StatusError("quota", 429),
+    StatusError("backend error", 500),
+    TimeoutError(),
+    ConnectionResetError(),
+])
+def test_transient_errors_are_retried(exc):
+    assert is_retryable_error(exc)
+
+
+@pytest.mark.parametrize("exc", [
+    Exception("Request payload size exceeds the limit: 1500 tokens, 36500 bytes."),
+    Exception("Invalid argument: internal field 'title' is not supported"),
+    Exception("400 API key not valid."),
+    StatusError("bad request", 400),
+    ValueError("could not convert string to float"),
+])
+def test_permanent_errors_are_not_retried(exc):
+    assert not is_retryable_error(exc)
+
+
+def test_cause_chain_is_followed():
+    try:
+        try:
+            raise StatusError("rate limited", 429)
+        except StatusError as e:
+            raise WrapperError("Error embedding content") from e
+    except WrapperError as e:
+        assert is_retryable_error(e)
+
+
+def test_token_bucket_allows_burst_then_limits():
+    bucket = TokenBucket(rate=20.0, capacity=2)
+    started = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    # Two tokens in the burst, two more at 20/s
+    assert time.monotonic() - started >= 0.08
+
+
+def test_token_bucket_disabled_with_zero_rate():
+    bucket = TokenBucket(rate=0, capacity=1)
+    started = time.monotonic()
+    for _ in range(1000):
+        bucket.acquire()
+    assert time.monotonic() - started < 0.5
+
+
+class FlakyEmbeddings:
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return [[float(len(t))] for t in texts]
+
+
+def test_scheduler_retries_transient_errors_only():
+    embeddings = FlakyEmbeddings([StatusError("quota", 429)])
+    scheduler = EmbeddingScheduler(embeddings, batch_size=2, max_concurrency=1, backoff_base=0.001)
+    assert scheduler.embed(["a", "bb", "a"], keys=["k1", "k2", "k1"]) == [[1.0], [2.0], [1.0]]
+    assert embeddings.calls == 2
+
+    scheduler = EmbeddingScheduler(FlakyEmbeddings([StatusError("bad request", 400)]), backoff_base=0.001)
+    with pytest.raises(StatusError):
+        scheduler.embed(["a"])
+
+
+class ThreadRecordingTier:
+    """Disk tier that records which thread each call runs on."""
+
+    def __init__(self):
+        self.vectors, self.threads = {}, []
+
+    def get(self, key, max_age=0):
+        self.threads.append(threading.get_ident())
+        return self.vectors.get(key)
+
+    def set(self, key, vector):
+        self.threads.append(threading.get_ident())
+        self.vectors[key] = vector
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        return [float(len(text))]
+
+
+def test_async_query_cache_keeps_disk_io_off_the_event_loop():
+    tier, embeddings = ThreadRecordingTier(), CountingEmbeddings()
+    cached = CachedQueryEmbeddings(embeddings, QueryEmbeddingCache(disk_tier=tier), "model")
+    restarted = CachedQueryEmbeddings(embeddings, QueryEmbeddingCache(disk_tier=tier), "model")
+
+    async def run():
+        assert await cached.aembed_query("Leave policy") == [12.0]  # miss: disk get + set
+        assert await cached.aembed_query("leave  POLICY") == [12.0]  # memory hit: no disk I/O
+        assert await restarted.aembed_query("leave policy") == [12.0]  # disk hit
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert embeddings.calls == 1
+    assert len(tier.threads) == 3 and loop_thread not in tier.threads
+    assert (cached.cache.misses, cached.cache.hits, restarted.cache.disk_hits) == (1, 1, 1)
@@ -0,0 +1,51 @@
+from app.rag.embedder import EmbeddingScheduler, SqliteEmbeddingTier, content_key
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(t)), 0.5] for t in texts]
+
+
+def test_store_round_trip_and_persistence(tmp_path):
+    path = str(tmp_path / "store.db")
+    store = SqliteEmbeddingTier(path, table="document_embeddings")
+    store.set_many({"k1": [1.0, 2.0], "k2": [0.5, 0.25]})
+    assert store.get_many(["k1", "k2", "missing"]) == {"k1": [1.0, 2.0], "k2": [0.5, 0.25]}
+
+    reopened = SqliteEmbeddingTier(path, table="document_embeddings")
+    assert reopened.get("k1") == [1.0, 2.0]
+    assert reopened.get("missing") is None
+
+
+def test_get_many_spans_several_queries(tmp_path):
+    store = SqliteEmbeddingTier(str(tmp_path / "store.db"))
+    store.set_many({f"k{i}": [float(i)] for i in range(1200)})
+    found = store.get_many([f"k{i}" for i in range(1200)])
+    assert len(found) == 1200 and found["k1199"] == [1199.0]
+
+
+def test_content_key_depends_on_model_and_text():
+    assert content_key("m1", "text") == content_key("m1", "text")
+    assert content_key("m1", "text") != content_key("m2", "text")
+    assert content_key("m1", "text") != content_key("m1", "text ")
+
+
+def test_scheduler_embeds_only_what_the_store_is_missing(tmp_path):
+    store = SqliteEmbeddingTier(str(tmp_path / "store.db"), table="document_embeddings")
+    texts = ["alpha", "beta", "alpha", "gamma"]
+    keys = [content_key("m", t) for t in texts]
+
+    first = CountingEmbeddings()
+    vectors = EmbeddingScheduler(first, batch_size=2, store=store).embed(texts, keys)
+    assert first.texts == ["alpha", "beta", "gamma"]  # duplicate text embedded once
+    assert vectors[0] == vectors[2] == [5.0, 0.5]
+
+    # A rerun (e.g. after an interrupted ingest) reuses every stored vector
+    second = CountingEmbeddings()
+    rerun = EmbeddingScheduler(second, store=store).embed(texts + ["delta"], keys + [content_key("m", "delta")])
+    assert rerun[:4] == vectors
+    assert second.texts == ["delta"]
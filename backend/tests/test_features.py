@@ -0,0 +1,42 @@
+from app.rag.features import (
+    FEATURE_VERSION, analyze_chunk_structure, compute_chunk_features, concept_terms,
+    features_from_metadata, get_chunk_features,
+)
+
+HOLIDAY_TABLE = """HOLIDAY LIST 2025
+S.No  Date        Holiday
+1     14-01-2025  Makara Sankranti
+2     30-03-2025  Ugadi
+Employees may choose two optional holidays in January or March."""
+
+
+def test_structure_of_a_holiday_table():
+    metrics = analyze_chunk_structure(HOLIDAY_TABLE)
+    assert metrics["non_empty_lines"] == 5
+    assert metrics["numbered_entries"] == 2
+    assert metrics["table_headers"] == 1
+    assert metrics["data_rows"] == 3
+    assert metrics["has_table_columns"]
+
+
+def test_features_are_chroma_metadata_values():
+    features = compute_chunk_features(HOLIDAY_TABLE)
+    assert features["feat_version"] == FEATURE_VERSION
+    assert features["feat_has_dates"] and features["feat_has_table_columns"]
+    assert features["feat_terms"].split() == sorted(concept_terms(HOLIDAY_TABLE))
+    assert all(isinstance(v, (str, int, bool)) for v in features.values())
+
+
+def test_concept_terms_skip_short_words_stopwords_and_numbers():
+    assert concept_terms("The leave policy from 2025 is for all employees") == {"leave", "policy", "employees"}
+
+
+def test_stored_features_are_used_only_for_the_current_version():
+    stored = {**compute_chunk_features("other text"), "source_file": "a.pdf"}
+    assert features_from_metadata(stored) is stored
+    assert get_chunk_features(HOLIDAY_TABLE, stored) is stored
+
+    stale = {**stored, "feat_version": FEATURE_VERSION - 1}
+    assert features_from_metadata(stale) is None
+    assert get_chunk_features(HOLIDAY_TABLE, stale) == compute_chunk_features(HOLIDAY_TABLE)
+    assert get_chunk_features(HOLIDAY_TABLE, None) == compute_chunk_features(HOLIDAY_TABLE)
@@ -0,0 +1,83 @@
+import pytest
+
+from app.rag import flat_index
+from app.rag.flat_index import (
+    SNAPSHOT_PREFIX, FlatVectorIndex, current_snapshot, load_flat_index, metadata_matches,
+)
+
+
+def test_empty_corpus_builds_an_empty_index(tmp_path):
+    index = FlatVectorIndex.build(tmp_path, ids=[], texts=[], metadatas=[], embeddings=[])
+    assert len(index) == 0
+    assert index.search([0.1, 0.2], 4) == []
+    assert len(load_flat_index(tmp_path)) == 0
+
+
+def test_search_returns_nearest_rows_and_applies_where(tmp_path):
+    index = FlatVectorIndex.build(
+        tmp_path,
+        ids=["a", "b", "c"],
+        texts=["alpha", "beta", "gamma"],
+        metadatas=[{"source_file": "x.pdf"}, {"source_file": "y.pdf"}, {"source_file": "x.pdf"}],
+        embeddings=[[1.0, 0.0], [0.0, 2.0], [1.0, 1.0]],
+    )
+    assert [row for row, _ in index.search([1.0, 0.1], 2)] == [0, 2]
+    assert [row for row, _ in index.search([0.0, 1.0], 3, where={"source_file": "x.pdf"})] == [2, 0]
+    doc = index.document(1, 0.5)
+    assert (doc.id, doc.page_content, doc.metadata["score"]) == ("b", "beta", 0.5)
+
+
+def test_metadata_matches_supports_eq_and_in():
+    meta = {"source_file": "leave.pdf", "page": 3}
+    assert metadata_matches(meta, None)
+    assert metadata_matches(meta, {"source_file": "leave.pdf"})
+    assert metadata_matches(meta, {"source_file": {"$in": ["a.pdf", "leave.pdf"]}})
+    assert metadata_matches(meta, {"page": {"$eq": 3}})
+    assert not metadata_matches(meta, {"source_file": {"$in": ["a.pdf"]}})
+    assert not metadata_matches(None, {"source_file": "leave.pdf"})
+
+
+def _build(directory, texts):
+    return FlatVectorIndex.build(
+        directory,
+        ids=[f"id-{t}" for t in texts],
+        texts=texts,
+        metadatas=[{"text": t} for t in texts],
+        embeddings=[[float(i + 1), 1.0] for i in range(len(texts))],
+    )
+
+
+def test_same_size_rebuild_swaps_vectors_and_metadata_together(tmp_path):
+    old = _build(tmp_path, ["leave", "holiday"])
+    assert load_flat_index(tmp_path) is not None
+    _build(tmp_path, ["leave", "notice"])
+    index = load_flat_index(tmp_path)
+    assert index is not old
+    assert index.texts == ["leave", "notice"]
+    assert [index.document(row).metadata["text"] for row in range(2)] == index.texts
+    # A reader holding the old snapshot keeps a consistent view of it
+    assert old.texts == ["leave", "holiday"] and old.matrix.shape == (2, 2)
+
+
+def test_interrupted_build_leaves_the_live_snapshot_in_place(tmp_path, monkeypatch):
+    _build(tmp_path, ["leave", "holiday"])
+    live = current_snapshot(tmp_path)
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(flat_index.os, "replace", fail)
+    with pytest.raises(OSError):
+        _build(tmp_path, ["leave", "notice"])
+    monkeypatch.undo()
+    assert current_snapshot(tmp_path) == live
+    assert load_flat_index(tmp_path).texts == ["leave", "holiday"]
+
+
+def test_build_keeps_only_the_current_and_previous_snapshots(tmp_path):
+    for n in range(4):
+        _build(tmp_path, [f"chunk {n}"])
+    snapshots = sorted(p.name for p in tmp_path.iterdir() if p.name.startswith(SNAPSHOT_PREFIX))
+    assert len(snapshots) == 2
+    assert current_snapshot(tmp_path) in snapshots
+    assert load_flat_index(tmp_path).texts == ["chunk 3"]
@@ -0,0 +1,65 @@
+import threading
+import time
+
+from app.rag.ingest_jobs import IngestJobRunner
+
+
+def _wait(job, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while job.status in ("queued", "running"):
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        time.sleep(0.01)
+    return job.snapshot()
+
+
+def test_jobs_run_one_at_a_time_in_submission_order():
+    runner = IngestJobRunner()
+    release = threading.Event()
+    order, running = [], []
+
+    def ingest(on_progress, name):
+        running.append(name)
+        assert len(running) == 1
+        if name == "first":
+            release.wait(2)
+        order.append(name)
+        running.remove(name)
+        return {"status": "success", "name": name}
+
+    first = runner.submit("ingest", ingest, name="first")
+    second = runner.submit("ingest", ingest, name="second")
+    assert runner.queue_position(second) == 1
+    release.set()
+    assert _wait(second)["result"] == {"status": "success", "name": "second"}
+    assert order == ["first", "second"]
+    assert first.status == "succeeded"
+
+
+def test_progress_and_failure_are_reported():
+    runner = IngestJobRunner()
+
+    def ingest(on_progress):
+        on_progress(stage="embedding", chunks_created=10, bytes_total=100, bytes_done=50)
+        raise RuntimeError("quota exhausted")
+
+    job = runner.submit("ingest", ingest)
+    snapshot = _wait(job)
+    assert snapshot["status"] == "failed"
+    assert snapshot["error"] == "quota exhausted"
+    assert snapshot["stage"] == "failed"
+    assert snapshot["progress"]["chunks_created"] == 10
+    assert snapshot["finished_at"] is not None
+
+    # A failed job does not stop the worker
+    ok = runner.submit("upload", lambda on_progress: {"status": "success"})
+    assert _wait(ok)["status"] == "succeeded"
+
+
+def test_history_is_bounded_and_newest_first():
+    runner = IngestJobRunner(history=2)
+    jobs = []
+    for i in range(4):
+        jobs.append(runner.submit("ingest", lambda on_progress: {}))
+        _wait(jobs[-1])
+    assert [j.id for j in runner.list()] == [jobs[3].id, jobs[2].id]
+    assert runner.get(jobs[0].id) is None
@@ -0,0 +1,114 @@
+import itertools
+import threading
+
+import pytest
+
+from app.rag import ingest_pipeline
+from app.rag.catalog import make_chunk_id
+from app.rag.ingest_pipeline import batch_stage, chunk_stage, embed_stage, threaded
+
+
+def test_threaded_yields_everything_in_order():
+    assert list(threaded(range(100), maxsize=3)) == list(range(100))
+
+
+def test_threaded_reraises_producer_errors():
+    def produce():
+        yield 1
+        raise ValueError("parse failed")
+
+    items = threaded(produce(), maxsize=2)
+    assert next(items) == 1
+    with pytest.raises(ValueError, match="parse failed"):
+        next(items)
+
+
+def test_threaded_producer_stays_bounded_and_stops_with_the_consumer():
+    produced = []
+    done = threading.Event()
+
+    def produce():
+        try:
+            for i in itertools.count():
+                produced.append(i)
+                yield i
+        finally:
+            done.set()
+
+    items = threaded(produce(), maxsize=2)
+    assert [next(items) for _ in range(5)] == [0, 1, 2, 3, 4]
+    # At most the queue plus one blocked item ahead of the consumer
+    assert len(produced) <= 5 + 2 + 1
+    items.close()
+    assert done.wait(2)
+
+
+def test_chunk_stage_numbers_chunks_per_file_across_batches(monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "split_text", lambda text: text.split("|"))
+    batches = [
+        ("a.pdf", [("a1|a2", 1)], None),
+        ("a.pdf", [("a3", 2)], 0.5),
+        ("b.pdf", [("b1", 1)], 0.1),
+    ]
+    records = list(chunk_stage(batches))
+    chunks = [(r[1], r[3], r[4]["chunk_index"], r[4]["page_no"]) for r in records if r[0] == "chunk"]
+    assert chunks == [("a.pdf", "a1", 0, 1), ("a.pdf", "a2", 1, 1), ("a.pdf", "a3", 2, 2), ("b.pdf", "b1", 0, 1)]
+    assert [r for r in records if r[0] == "end"] == [("end", "a.pdf", 2, 0.5), ("end", "b.pdf", 1, 0.1)]
+    assert [r[0] for r in records] == ["chunk", "chunk", "chunk", "end", "chunk", "end"]
+
+
+def _chunk_ids(monkeypatch, pages):
+    monkeypatch.setattr(ingest_pipeline, "split_text", lambda text: text.split("|"))
+    records = [r for r in chunk_stage([("a.pdf", pages, 0.1)]) if r[0] == "chunk"]
+    return {r[3]: r[2] for r in records}, [r[4]["chunk_index"] for r in records]
+
+
+def test_inserting_a_paragraph_on_page_one_keeps_later_chunk_ids(monkeypatch):
+    before, _ = _chunk_ids(monkeypatch, [("intro|leave", 1), ("holidays|notice", 2)])
+    after, positions = _chunk_ids(monkeypatch, [("intro|new paragraph|leave", 1), ("holidays|notice", 2)])
+    assert positions == [0, 1, 2, 3, 4]
+    assert set(after) - set(before) == {"new paragraph"}
+    assert all(after[text] == before[text] for text in before)
+
+
+def test_repeated_chunk_text_is_counted_across_page_batches(monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "split_text", lambda text: text.split("|"))
+    batches = [("a.pdf", [("footer|body", 1)], None), ("a.pdf", [("footer", 2)], 0.1), ("b.pdf", [("footer", 1)], 0.1)]
+    ids = [(r[1], r[2]) for r in chunk_stage(batches) if r[0] == "chunk" and r[3] == "footer"]
+    assert ids == [
+        ("a.pdf", make_chunk_id("a.pdf", "footer", 0)),
+        ("a.pdf", make_chunk_id("a.pdf", "footer", 1)),
+        ("b.pdf", make_chunk_id("b.pdf", "footer", 0)),
+    ]
+
+
+def test_batch_stage_releases_end_after_the_batch_with_the_last_chunk():
+    records = [("chunk", "a.pdf", "a0"), ("chunk", "a.pdf", "a1"), ("end", "a.pdf", 1, 0.1),
+               ("chunk", "b.pdf", "b0"), ("end", "b.pdf", 1, 0.1)]
+    out = list(batch_stage(records, batch_size=2))
+    assert out == [
+        ("batch", [records[0], records[1]]),
+        records[2],
+        ("batch", [records[3]]),
+        records[4],
+    ]
+
+    out = list(batch_stage(records, batch_size=3))
+    assert out == [("batch", [records[0], records[1], records[3]]), records[2], records[4]]
+
+
+def test_embed_stage_skips_chunks_already_stored(monkeypatch):
+    class Scheduler:
+        def __init__(self):
+            self.texts = []
+
+        def embed(self, texts, keys):
+            self.texts.extend(texts)
+            return [[float(len(t))] for t in texts]
+
+    scheduler = Scheduler()
+    monkeypatch.setattr(ingest_pipeline, "get_embedding_scheduler", lambda: scheduler)
+    records = [("chunk", "a.pdf", "id0", "kept", {}), ("chunk", "a.pdf", "id1", "new text", {})]
+    out = list(embed_stage([("batch", records), ("end", "a.pdf", 1, 0.1)], {"a.pdf": {"id0"}}))
+    assert out == [("batch", records, [None, [8.0]]), ("end", "a.pdf", 1, 0.1)]
+    assert scheduler.texts == ["new text"]
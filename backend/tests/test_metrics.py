@@ -0,0 +1,55 @@
+import asyncio
+
+from app.core.metrics import Registry, timed_stage
+
+
+def test_counter_renders_labelled_values():
+    registry = Registry()
+    counter = registry.counter("hr_bot_test_total", "Test counter.", labels=("outcome",))
+    counter.inc(outcome="kept")
+    counter.inc(2, outcome="kept")
+    counter.inc(outcome="dropped")
+    text = registry.render()
+    assert "# TYPE hr_bot_test_total counter" in text
+    assert 'hr_bot_test_total{outcome="kept"} 3.0' in text
+    assert 'hr_bot_test_total{outcome="dropped"} 1.0' in text
+
+
+def test_histogram_buckets_are_cumulative_and_upper_inclusive():
+    registry = Registry()
+    histogram = registry.histogram("hr_bot_test_seconds", "Test histogram.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    lines = registry.render().splitlines()
+    assert 'hr_bot_test_seconds_bucket{le="0.1"} 2.0' in lines
+    assert 'hr_bot_test_seconds_bucket{le="1.0"} 3.0' in lines
+    assert 'hr_bot_test_seconds_bucket{le="+Inf"} 4.0' in lines
+    assert "hr_bot_test_seconds_count 4.0" in lines
+    assert "hr_bot_test_seconds_sum 2.65" in lines
+
+
+def test_collectors_are_rendered_and_failures_skipped():
+    registry = Registry()
+    registry.register_collector(lambda: [("hr_bot_pool_reuses", "gauge", "Reuses.", {}, 7)])
+
+    def broken():
+        raise RuntimeError("stats unavailable")
+
+    registry.register_collector(broken)
+    text = registry.render()
+    assert "# TYPE hr_bot_pool_reuses gauge" in text
+    assert "hr_bot_pool_reuses 7" in text
+
+
+def test_timed_stage_wraps_sync_and_async_functions():
+    @timed_stage("test_sync")
+    def plan(x):
+        return x + 1
+
+    @timed_stage("test_async")
+    async def retrieve(x):
+        return x * 2
+
+    assert plan(1) == 2
+    assert asyncio.run(retrieve(3)) == 6
+    assert plan.__name__ == "plan" and retrieve.__name__ == "retrieve"
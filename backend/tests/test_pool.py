@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from app.core import llm
+from app.core.config import settings
+from app.rag import embedder, vectorstore
+
+
+class DummyEmbeddings:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CHROMA_DIR", tmp_path / "chroma")
+    monkeypatch.setattr(settings, "EMBEDDING_STORE_PATH", tmp_path / "embeddings.db")
+    monkeypatch.setattr(settings, "QUERY_EMBEDDING_CACHE_PATH", "")
+    monkeypatch.setattr(llm, "GoogleGenerativeAIEmbeddings", DummyEmbeddings)
+    monkeypatch.setattr(vectorstore, "_client", None)
+    llm.reset_models()
+    yield
+    llm.reset_models()
+
+
+def test_reset_models_rebuilds_the_cached_embedder():
+    first = embedder.get_embedder()
+    assert embedder.get_embedder() is first
+    llm.reset_models()
+    second = embedder.get_embedder()
+    assert second is not first
+    assert second.embeddings is llm.get_embedding_model()
+
+
+def test_reuse_counter_is_exact_under_concurrency():
+    vectorstore.get_chroma_client()
+    before = vectorstore.get_pool_stats()["reuses"]
+
+    def reuse():
+        for _ in range(2000):
+            vectorstore.get_chroma_client()
+
+    threads = [threading.Thread(target=reuse) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert vectorstore.get_pool_stats()["reuses"] - before == 8 * 2000
@@ -0,0 +1,65 @@
+from langchain_core.documents import Document
+
+from app.rag.chain import QUERY_CONCEPTS, decompose_query, detect_query_concepts, merge_subquery_results
+
+
+def _doc(source, n, text=None):
+    return Document(page_content=text or f"{source} chunk {n}", metadata={"source_file": source})
+
+
+def test_concepts_match_whole_words_only():
+    assert detect_query_concepts("Is it mandatory to come to office on hybrid days?") == ["hybrid_work"]
+    assert detect_query_concepts("I noticed my leave balance is wrong, is WFH optional?") == ["hybrid_work"]
+    assert detect_query_concepts("What is the notice period if I resign?") == ["separation"]
+    assert detect_query_concepts("How do I exit vim?") == ["separation"]
+    assert detect_query_concepts("Is the exit interview mandatory?") == ["separation"]
+    assert detect_query_concepts("What is the dress code?") == []
+
+
+def test_mandatory_optional_and_months_need_holiday_context():
+    assert detect_query_concepts("How many optional leaves do I get?") == ["holiday_calendar"]
+    assert detect_query_concepts("List the mandatory holidays") == ["holiday_calendar"]
+    assert detect_query_concepts("Is office open on Dec 25?") == ["holiday_calendar"]
+    assert detect_query_concepts("Is 15th of August off?") == ["holiday_calendar"]
+    assert detect_query_concepts("Is the training mandatory in March?") == []
+
+
+def test_multi_concept_questions_keep_table_order():
+    question = "I joined in November and want to resign, and can I WFH around the holidays?"
+    assert detect_query_concepts(question) == ["probation", "separation", "holiday_calendar", "hybrid_work"]
+
+
+def test_decompose_needs_two_concepts():
+    assert decompose_query("What is the probation period?") == []
+    question = "Can I work from home during my notice period?"
+    assert decompose_query(question) == [
+        f"{question} {QUERY_CONCEPTS['separation'][1]}",
+        f"{question} {QUERY_CONCEPTS['hybrid_work'][1]}",
+    ]
+
+
+def test_merge_round_robins_across_sub_queries():
+    results = [[_doc("a.pdf", i) for i in range(3)], [_doc("b.pdf", i) for i in range(3)]]
+    merged = merge_subquery_results(results, doc_quota=10, max_chunks=4)
+    assert [d.page_content for d in merged] == ["a.pdf chunk 0", "b.pdf chunk 0", "a.pdf chunk 1", "b.pdf chunk 1"]
+
+
+def test_merge_caps_chunks_per_document():
+    # Both sub-queries lean on a.pdf; the quota leaves room for b.pdf
+    results = [[_doc("a.pdf", i) for i in range(5)], [_doc("a.pdf", 9)] + [_doc("b.pdf", i) for i in range(3)]]
+    merged = merge_subquery_results(results, doc_quota=2, max_chunks=10)
+    sources = [d.metadata["source_file"] for d in merged]
+    assert sources == ["a.pdf", "a.pdf", "b.pdf", "b.pdf"]
+
+
+def test_merge_skips_duplicates_and_respects_max_chunks():
+    shared = _doc("a.pdf", 0)
+    results = [[shared, _doc("a.pdf", 1)], [_doc("a.pdf", 0, text="A.pdf  CHUNK 0"), _doc("b.pdf", 0)]]
+    merged = merge_subquery_results(results, doc_quota=10, max_chunks=3)
+    assert [d.page_content for d in merged] == ["a.pdf chunk 0", "b.pdf chunk 0", "a.pdf chunk 1"]
+    assert len(merge_subquery_results(results, doc_quota=10, max_chunks=1)) == 1
+
+
+def test_merge_stops_when_every_list_is_exhausted():
+    assert merge_subquery_results([[], [_doc("a.pdf", 0)]], doc_quota=1, max_chunks=5) == [_doc("a.pdf", 0)]
+    assert merge_subquery_results([], doc_quota=1, max_chunks=5) == []
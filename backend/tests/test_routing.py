@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.rag import chain
+from app.rag.chain import arouted_search, filtered_results_look_weak, plan_query, route_sources, routed_search
+from app.rag.vectorstore import source_filter
+
+DOCUMENTS = ["Holiday_Calendar_2025.pdf", "Hybrid_Work_Policy.pdf", "Probation_Policy.pdf", "Separation_Policy.pdf"]
+
+
+@pytest.fixture(autouse=True)
+def documents(monkeypatch):
+    names = list(DOCUMENTS)
+    monkeypatch.setattr(chain, "get_document_names", lambda: names)
+    return names
+
+
+def _doc(text, source="Probation_Policy.pdf"):
+    return Document(page_content=text, metadata={"source_file": source})
+
+
+class _Search:
+    """Records the `where` filters it is called with."""
+
+    def __init__(self, filtered, unfiltered):
+        self.results = {True: filtered, False: unfiltered}
+        self.calls = []
+
+    def __call__(self, where):
+        self.calls.append(where)
+        return self.results[where is not None]
+
+
+def test_routes_concepts_to_matching_files():
+    assert route_sources(["probation"]) == ["Probation_Policy.pdf"]
+    assert route_sources(["holiday_calendar", "hybrid_work"]) == ["Holiday_Calendar_2025.pdf", "Hybrid_Work_Policy.pdf"]
+    assert route_sources([]) == []
+    assert route_sources(["unknown_concept"]) == []
+
+
+def test_every_file_matching_disables_the_filter(documents):
+    documents[:] = ["Probation_Policy.pdf", "Probation_FAQ.pdf"]
+    assert route_sources(["probation"]) == []
+
+
+def test_no_file_matching_disables_the_filter(documents):
+    documents[:] = ["Leave_Policy.pdf"]
+    assert route_sources(["probation"]) == []
+
+
+def test_source_filter():
+    assert source_filter([]) is None
+    assert source_filter(["b.pdf", "a.pdf"]) == {"source_file": {"$in": ["a.pdf", "b.pdf"]}}
+
+
+def test_weak_results_are_too_few_or_off_topic(monkeypatch):
+    monkeypatch.setattr(settings, "ROUTING_MIN_RESULTS", 2)
+    query = "How long is the probation period?"
+    on_topic = [_doc("The probation period lasts six months."), _doc("Probation may be extended once.")]
+    assert not filtered_results_look_weak(query, on_topic, k=4)
+    assert filtered_results_look_weak(query, on_topic[:1], k=4)
+    assert filtered_results_look_weak(query, [_doc("Office canteen timings."), _doc("Parking rules.")], k=4)
+    # k below ROUTING_MIN_RESULTS lowers the bar
+    assert not filtered_results_look_weak(query, on_topic[:1], k=1)
+
+
+def test_strong_routed_result_is_used(monkeypatch):
+    monkeypatch.setattr(settings, "ROUTING_MIN_RESULTS", 2)
+    filtered = [_doc("The probation period lasts six months."), _doc("Probation may be extended once.")]
+    search = _Search(filtered, [_doc("global")])
+    assert routed_search(search, "What is the probation period?", 4, ["Probation_Policy.pdf"]) == filtered
+    assert search.calls == [source_filter(["Probation_Policy.pdf"])]
+
+
+def test_routed_miss_falls_back_to_global_search(monkeypatch):
+    monkeypatch.setattr(settings, "ROUTING_MIN_RESULTS", 2)
+    unfiltered = [_doc("The probation period lasts six months.", "Handbook.pdf")]
+    search = _Search([], unfiltered)
+    assert routed_search(search, "What is the probation period?", 4, ["Probation_Policy.pdf"]) == unfiltered
+    assert search.calls == [source_filter(["Probation_Policy.pdf"]), None]
+
+
+def test_no_sources_searches_globally_once():
+    search = _Search([_doc("filtered")], [_doc("global")])
+    assert routed_search(search, "anything", 4, []) == [_doc("global")]
+    assert search.calls == [None]
+
+
+def test_async_routed_miss_falls_back(monkeypatch):
+    monkeypatch.setattr(settings, "ROUTING_MIN_RESULTS", 2)
+    search = _Search([_doc("Parking rules.")], [_doc("global")])
+
+    async def asearch(where):
+        return search(where)
+
+    docs = asyncio.run(arouted_search(asearch, "What is the probation period?", 4, ["Probation_Policy.pdf"]))
+    assert docs == [_doc("global")]
+    assert search.calls == [source_filter(["Probation_Policy.pdf"]), None]
+
+
+def test_plan_routes_only_when_enabled(monkeypatch):
+    question = "What is the probation period?"
+    monkeypatch.setattr(settings, "RETRIEVAL_ROUTING", False)
+    assert plan_query(question)["sources"] == []
+    monkeypatch.setattr(settings, "RETRIEVAL_ROUTING", True)
+    assert plan_query(question)["sources"] == ["Probation_Policy.pdf"]
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.rag.splitter import SEPARATORS, split_spans
+
+PAGE = """LEAVE POLICY
+
+1. Annual leave
+Employees accrue 1.5 days of annual leave per month of service.  Leave must be applied for in advance.
+Unused leave of up to 15 days may be carried forward to the next calendar year.
+
+
+2. Sick leave
+S.No  Type        Days  Approval
+1     Sick leave  12    Manager
+2     Medical     30    HR
+
+Requests longer than three days need a medical certificate. """
+
+
+def _langchain(text, size, overlap):
+    return RecursiveCharacterTextSplitter(
+        chunk_size=size, chunk_overlap=overlap, separators=SEPARATORS,
+    ).split_text(text)
+
+
+def _native(text, size, overlap):
+    return [text[start:end] for start, end in split_spans(text, size, overlap)]
+
+
+@pytest.mark.parametrize("size,overlap", [(1000, 150), (200, 40), (60, 10), (25, 0)])
+def test_matches_langchain_on_a_policy_page(size, overlap):
+    assert _native(PAGE * 3, size, overlap) == _langchain(PAGE * 3, size, overlap)
+
+
+def test_matches_langchain_on_random_text():
+    rng = random.Random(24)
+    alphabet = ["a", "b", " ", " ", ".", ". ", "\n", "\n\n", "\n\n\n", "word", "12"]
+    for _ in range(500):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 300)))
+        size = rng.randint(5, 80)
+        overlap = rng.randint(0, size - 1)
+        assert _native(text, size, overlap) == _langchain(text, size, overlap), (text, size, overlap)
+
+
+def test_spans_are_offsets_into_the_text():
+    spans = split_spans(PAGE, 120, 20)
+    assert spans and all(0 <= start < end <= len(PAGE) for start, end in spans)
+    assert [s for s, _ in spans] == sorted(s for s, _ in spans)
+    assert split_spans("", 100, 10) == [] and split_spans("   \n\n ", 100, 10) == []
@@ -0,0 +1,171 @@
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.rag import catalog, ingest_pipeline, vectorstore
+from app.rag.vectorstore import (
+    COLLECTION_NAME, collect_retired_collections, create_staging_collection, get_bm25_index, get_chunk_ids,
+    get_chroma_client, get_collection, get_collection_name, get_flat_index, promote_collection,
+    rebuild_bm25_index, rebuild_flat_index, update_chunk_positions, upsert_chunks, vector_search,
+)
+
+
+class _NoTimer:
+    # promote_collection() schedules a GC; tests run it explicitly instead
+    def __init__(self, *args, **kwargs):
+        self.daemon = True
+
+    def start(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def chroma_dir(tmp_path, monkeypatch):
+    chroma = tmp_path / "chroma"
+    monkeypatch.setattr(settings, "CHROMA_DIR", chroma)
+    monkeypatch.setattr(settings, "COLLECTION_POINTER_PATH", chroma / "current_collection.json")
+    monkeypatch.setattr(settings, "CORPUS_GENERATION_PATH", chroma / "corpus_generation")
+    monkeypatch.setattr(settings, "BM25_INDEX_PATH", chroma / "bm25_index.json")
+    monkeypatch.setattr(settings, "FLAT_INDEX_DIR", tmp_path / "flat_index")
+    monkeypatch.setattr(vectorstore, "_client", None)
+    monkeypatch.setattr(vectorstore, "_pointer_cache", None)
+    monkeypatch.setattr(vectorstore, "_generation_cache", None)
+    monkeypatch.setattr(vectorstore.threading, "Timer", _NoTimer)
+    vectorstore.reset_vectorstore()
+    yield chroma
+    vectorstore.reset_vectorstore()
+
+
+def _meta(source, page_no, chunk_index, **extra):
+    return {"source_file": source, "page_no": page_no, "chunk_index": chunk_index, **extra}
+
+
+def test_update_chunk_positions_moves_only_what_moved():
+    upsert_chunks(
+        ["id0", "id1"], ["intro", "leave"],
+        [_meta("a.pdf", 1, 0, dup_cluster="c0"), _meta("a.pdf", 1, 1, dup_cluster="c1")],
+        [[1.0, 0.0], [0.0, 1.0]],
+    )
+    moved = update_chunk_positions(["id0", "id1"], [_meta("a.pdf", 1, 0), _meta("a.pdf", 2, 3)])
+    assert moved == 1
+    stored = get_collection().get(ids=["id0", "id1"], include=["metadatas"])
+    metas = dict(zip(stored["ids"], stored["metadatas"]))
+    assert metas["id1"] == _meta("a.pdf", 2, 3, dup_cluster="c1")
+    assert metas["id0"] == _meta("a.pdf", 1, 0, dup_cluster="c0")
+    assert sorted(get_chunk_ids("a.pdf")) == ["id0", "id1"]
+    assert update_chunk_positions([], []) == 0
+
+
+def _store(text, vector, collection_name=None, source="a.pdf"):
+    upsert_chunks([text], [text], [_meta(source, 1, 0)], [vector], collection_name)
+
+
+def test_queries_read_the_old_collection_until_promote():
+    _store("old policy", [1.0, 0.0])
+    staging = create_staging_collection()
+    assert staging == f"{COLLECTION_NAME}_v1"
+    _store("new policy", [1.0, 0.0], staging)
+    assert get_collection_name() == COLLECTION_NAME
+    assert [d.id for d in vector_search([1.0, 0.0], 5)] == ["old policy"]
+
+    promote_collection(staging)
+    assert get_collection_name() == staging
+    assert [d.id for d in vector_search([1.0, 0.0], 5)] == ["new policy"]
+
+
+def test_promote_switches_bm25_and_flat_index_files_with_the_collection(monkeypatch):
+    monkeypatch.setattr(settings, "RETRIEVAL_BACKEND", "flat")
+    _store("old policy", [1.0, 0.0])
+    rebuild_bm25_index()
+    rebuild_flat_index()
+    staging = create_staging_collection()
+    _store("new policy", [0.0, 1.0], staging)
+    rebuild_bm25_index(staging)
+    rebuild_flat_index(staging)
+    assert get_bm25_index().texts == get_flat_index().texts == ["old policy"]
+
+    promote_collection(staging)
+    assert get_bm25_index().texts == get_flat_index().texts == ["new policy"]
+
+
+def test_gc_deletes_retired_collections_only_after_the_grace_period(monkeypatch):
+    monkeypatch.setattr(settings, "COLLECTION_GC_GRACE_SECONDS", 300)
+    _store("old policy", [1.0, 0.0])
+    rebuild_bm25_index()
+    staging = create_staging_collection()
+    _store("new policy", [1.0, 0.0], staging)
+    promote_collection(staging)
+    old_bm25 = vectorstore._bm25_index_path(COLLECTION_NAME)
+
+    assert collect_retired_collections() == []
+    assert COLLECTION_NAME in [c.name for c in get_chroma_client().list_collections()]
+    assert old_bm25.exists()
+
+    monkeypatch.setattr(settings, "COLLECTION_GC_GRACE_SECONDS", 0)
+    assert collect_retired_collections() == [COLLECTION_NAME]
+    assert COLLECTION_NAME not in [c.name for c in get_chroma_client().list_collections()]
+    assert not old_bm25.exists()
+    assert vectorstore._read_pointer()["retired"] == []
+    assert get_collection_name() == staging
+
+
+class _Scheduler:
+    def embed(self, texts, keys):
+        return [[1.0, float(len(t))] for t in texts]
+
+
+@pytest.fixture
+def raw_docs(tmp_path, monkeypatch):
+    raw = tmp_path / "raw_docs"
+    raw.mkdir()
+    for name in ("a.pdf", "b.pdf"):
+        (raw / name).write_bytes(b"%PDF-1.4 " + name.encode())
+    monkeypatch.setattr(settings, "RAW_DOCS_DIR", raw)
+    monkeypatch.setattr(settings, "DOCUMENT_CATALOG_PATH", tmp_path / "chroma" / "document_catalog.json")
+    monkeypatch.setattr(catalog, "_loaded", None)
+    monkeypatch.setattr(ingest_pipeline, "get_embedding_scheduler", lambda: _Scheduler())
+    return raw
+
+
+def _pages(fail_after=None):
+    def iter_page_batches(filenames):
+        for n, filename in enumerate(filenames):
+            if n == fail_after:
+                raise RuntimeError("worker crashed")
+            yield filename, [(f"Policy text of {filename}.", 1)], 0.1
+    return iter_page_batches
+
+
+def test_interrupted_rebuild_leaves_the_live_collection_and_catalog(raw_docs, monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "iter_page_batches", _pages())
+    assert ingest_pipeline.ingest_documents(full=True)["status"] == "success"
+    live = get_collection_name()
+    catalog_before = settings.DOCUMENT_CATALOG_PATH.read_text()
+    ids_before = sorted(get_collection().get(include=[])["ids"])
+    assert len(ids_before) == 2
+
+    (raw_docs / "a.pdf").write_bytes(b"%PDF-1.4 edited")
+    monkeypatch.setattr(ingest_pipeline, "iter_page_batches", _pages(fail_after=1))
+    with pytest.raises(RuntimeError, match="worker crashed"):
+        ingest_pipeline.ingest_documents(full=True)
+    assert get_collection_name() == live
+    assert settings.DOCUMENT_CATALOG_PATH.read_text() == catalog_before
+    assert sorted(get_collection().get(include=[])["ids"]) == ids_before
+
+    # The next rebuild starts its staging collection from scratch
+    monkeypatch.setattr(ingest_pipeline, "iter_page_batches", _pages())
+    assert ingest_pipeline.ingest_documents(full=True)["status"] == "success"
+    assert get_collection_name() != live
+    assert get_collection().count() == 2
+    entries = json.loads(settings.DOCUMENT_CATALOG_PATH.read_text())["documents"]
+    assert [e["filename"] for e in entries] == ["a.pdf", "b.pdf"]
+
+
+def test_pointer_written_by_another_worker_is_picked_up(chroma_dir):
+    assert get_collection_name() == COLLECTION_NAME
+    chroma_dir.mkdir(parents=True, exist_ok=True)
+    pointer = {"collection": f"{COLLECTION_NAME}_v7", "version": 7, "retired": []}
+    settings.COLLECTION_POINTER_PATH.write_text(json.dumps(pointer))
+    assert get_collection_name() == f"{COLLECTION_NAME}_v7"
+    assert create_staging_collection() == f"{COLLECTION_NAME}_v8"